@@ -77,6 +77,11 @@
 #define PBS_PYTHON_V1_MODULE "pbs.v1"
 #endif
 
+/* The below is the pbs.v1 module profiling the runs of the hook scripts */
+#ifndef PBS_PYTHON_V1_PROFILE_MODULE
+#define PBS_PYTHON_V1_PROFILE_MODULE "pbs.v1._profile"
+#endif
+
 /* this is the dictionary containing all the types for the embedded interp */
 #define   PBS_PYTHON_V1_TYPES_DICTIONARY   "EXPORTED_TYPES_DICT"
 
@@ -75,6 +75,8 @@ static PyObject *
 _pbs_python_compile_file(const char *file_name,
 	const char *compiled_code_file_name);
 extern int pbs_python_setup_namespace_dict(PyObject *globals);
+static void
+pbs_python_hook_profile(char *func);
 
 #endif      /* PYTHON */
 
@@ -777,6 +779,7 @@ pbs_python_run_code_in_namespace(struct python_interpreter_data *interp_data,
 	orig_pid = getpid();
 
 	PyErr_Clear(); /* clear any exceptions before starting code */
+	pbs_python_hook_profile("_hook_begin");
 	/* precompile strings of code to bytecode objects */
 	retval = PyEval_EvalCode((PyObject *)py_script->py_code_obj,
 		pdict, pdict);
@@ -785,6 +788,8 @@ pbs_python_run_code_in_namespace(struct python_interpreter_data *interp_data,
 	if (orig_pid != getpid())
 		exit(0);
 
+	pbs_python_hook_profile("_hook_end");
+
 	/* check for exception */
 	if (PyErr_Occurred()) {
 		if (PyErr_ExceptionMatches(PyExc_KeyboardInterrupt)) {
@@ -836,6 +841,38 @@ pbs_python_run_code_in_namespace(struct python_interpreter_data *interp_data,
 
 #ifdef PYTHON               /*  === BEGIN ALL FUNCTIONS REQUIRING PYTHON HEADERS === */
 
+/**
+ * @brief
+ *	Calls the function 'func' of the pbs.v1 profiling module, which
+ *	records the run of a hook script when hook profiling is enabled.
+ *	Any pending Python exception, like the SystemExit raised by the
+ *	accept() or reject() of the hook script, is kept across the call.
+ *
+ * @param[in]	func - name of the function to call
+ *
+ * @return	void
+ *
+ */
+static void
+pbs_python_hook_profile(char *func)
+{
+	PyObject *ptype;
+	PyObject *pvalue;
+	PyObject *ptraceback;
+	PyObject *py_mod;
+	PyObject *py_ret;
+
+	PyErr_Fetch(&ptype, &pvalue, &ptraceback);
+	py_mod = PyImport_ImportModule(PBS_PYTHON_V1_PROFILE_MODULE);
+	if (py_mod != NULL) {
+		py_ret = PyObject_CallMethod(py_mod, func, NULL);
+		Py_XDECREF(py_ret);
+		Py_DECREF(py_mod);
+	}
+	PyErr_Clear(); /* profiling must not fail the hook */
+	PyErr_Restore(ptype, pvalue, ptraceback);
+}
+
 /**
  * @brief
  *	only compile the python script.
@@ -56,3 +56,7 @@ try:
     from ._pmi_types import *
 except:
     pass
+
+#: opt-in profiling of the hooks, instruments the types imported above
+from . import _profile
+_profile._setup()
@@ -45,6 +45,9 @@ All Python based types mapping to PBS attribute types.
 """
 
 _ATTRIBUTES_KEY_NAME = 'attributes'
+#: optional class level map of the lowercase attribute names to their names,
+#: for classes whose attribute names are case insensitive
+_ATTRIBUTES_LOWER_KEY_NAME = '_attributes_lower'
 
 __all__ = ['_generic_attr',
            'size',
@@ -99,6 +102,7 @@ __all__ = ['_generic_attr',
 import _pbs_v1
 import sys
 import math
+import weakref
 _size = _pbs_v1.svr_types._size
 _LOG = _pbs_v1.logmsg
 _IS_SETTABLE = _pbs_v1.is_attrib_val_settable
@@ -114,7 +118,10 @@ class PbsAttributeDescriptor():
       - Add the attribute name to the dictionary 'attributes' on the instance if
         it exists.
       - Since a Descriptor is a class level object, to maintain unique values
-        across instances, we maintain an internal dictionary.
+        across instances, the value is kept in the instance dictionary of the
+        object under a key that can not clash with an attribute name, so that
+        it is released along with the object. Objects without an instance
+        dictionary are kept in an internal dictionary of weak references.
     """
 
     def __init__(self, cls, name, default_value, value_type=None, resc_attr=None, is_entity=0):
@@ -149,9 +156,14 @@ class PbsAttributeDescriptor():
         #: Mapping type.
 
         __attributes = getattr(cls, _ATTRIBUTES_KEY_NAME)
+        __lower = getattr(cls, _ATTRIBUTES_LOWER_KEY_NAME, None)
+        if __lower is not None and name not in __attributes:
+            #: the last registered of the names differing only by case wins
+            __lower[name.lower()] = name
         __attributes[name] = None
         #: now we need to maintain a unique value for each object
-        self.__per_instance = {}
+        self._key = '.' + name
+        self.__per_instance = weakref.WeakKeyDictionary()
 
     #: m(__init__)
 
@@ -170,11 +182,20 @@ class PbsAttributeDescriptor():
         #  caused pbs_resource to be instantiated every time. Probably due to
         #  _get_default_value() getting evaluatd every time.
 
-        if obj not in self.__per_instance:
-            v = self._get_default_value()
-            self.__per_instance[obj] = v
+        try:
+            values = obj.__dict__
+        except AttributeError:
+            values = self.__per_instance
+            key = obj
+        else:
+            key = self._key
 
-        return self.__per_instance[obj]
+        try:
+            return values[key]
+        except KeyError:
+            v = self._get_default_value()
+            values[key] = v
+            return v
     #: m(__get__)
 
     def __set__(self, obj, value):
@@ -216,9 +237,19 @@ class PbsAttributeDescriptor():
             else:
                 set_value = self._value_type[0](value)
         #:
-        self.__per_instance[obj] = set_value
+        self._set_instance_value(obj, set_value)
     #: m(__set__)
 
+    def _set_instance_value(self, obj, value):
+        """
+        Store the value of the attribute for obj
+        """
+        try:
+            obj.__dict__[self._key] = value
+        except AttributeError:
+            self.__per_instance[obj] = value
+    #: m(_set_instance_value)
+
     def _set_resc_atttr(self, resc_attr, is_entity=0):
         """
         """
@@ -231,7 +262,7 @@ class PbsAttributeDescriptor():
     def __delete__(self, obj):
         """__delete__, we just set the attribute value to None"""
 
-        self.__per_instance[obj] = None
+        self._set_instance_value(obj, None)
     #: m(__delete__)
 
     def _get_default_value(self):
@@ -256,6 +287,23 @@ class PbsAttributeDescriptor():
 #: End Class PbsAttributeDescriptor
 
 
+def _hook_names_add(obj, dict_name, name):
+    """
+    Add name to the names recorded for obj under dict_name, such as
+    _attributes_hook_set. The C side looks the names up as
+    obj.<dict_name>[obj], this dictionary is kept on obj itself instead
+    of the class level one so that it is released along with obj
+    rather than accumulating over the hook events.
+    """
+    d = obj.__dict__.get(dict_name)
+    if d is None:
+        d = {obj: {}}
+        obj.__dict__[dict_name] = d
+    # using a dictionary value as easier to search for keys
+    d[obj][name] = None
+#: m(_hook_names_add)
+
+
 class PbsReadOnlyDescriptor():
     """This class wraps a generic read only data descriptor. This is a class
     level descriptor.
@@ -937,6 +985,70 @@ class acl(_generic_attr):
         super().__init__(value)
 
 
+#: parsed forms of the select and exec_vnode values, keyed by the value
+#: string, as the same values are seen over and over by hooks. Emptied when
+#: holding _PARSE_CACHE_MAX values.
+_parse_cache = {}
+_PARSE_CACHE_MAX = 4096
+
+
+def _cached_parse(kind, value, parse):
+    """
+    Return parse(value) for the string value, caching the result under
+    (kind, value). The results must not be modified.
+    """
+    key = (kind, value)
+    try:
+        return _parse_cache[key]
+    except KeyError:
+        pass
+    if len(_parse_cache) >= _PARSE_CACHE_MAX:
+        _parse_cache.clear()
+    rv = parse(value)
+    _parse_cache[key] = rv
+    return rv
+#: m(_cached_parse)
+
+
+def _parse_select(value):
+    """
+    Split a select value into a tuple of (<chunk_ct>, <rest>) per
+    plus-separated spec, where <rest> is what follows <chunk_ct> in the
+    spec. A spec without <chunk_ct> counts as 1 chunk.
+    """
+    rv = []
+    for chunk in value.split("+"):
+        first = chunk.split(":", 1)[0]
+        if first.isdigit():
+            rv.append((int(first), chunk[len(first):]))
+        elif first:
+            rv.append((1, ":" + chunk))
+        else:
+            rv.append((1, chunk))
+    return tuple(rv)
+#: m(_parse_select)
+
+
+def _parse_exec_vnode(value):
+    """
+    Split an exec_vnode value into a tuple of
+    (<vnode name>, ((<res>, <value string>), ...)) per chunk.
+    """
+    rv = []
+    for v in value.split("+"):
+        vnode_name = None
+        rescs = []
+        for c in v.strip("(").strip(")").split(":"):
+            if c.find("=") == -1:
+                vnode_name = sys.intern(c)
+            else:
+                rs = c.split("=", 1)
+                rescs.append((sys.intern(rs[0]), rs[1]))
+        rv.append((vnode_name, tuple(rescs)))
+    return tuple(rv)
+#: m(_parse_exec_vnode)
+
+
 class select(_generic_attr):
     """
     This represents the select resource specification when submitting a job.
@@ -1046,63 +1158,40 @@ class select(_generic_attr):
             raise ValueError("bad increment specs")
 
         ret_str = ""
-        i = 0  # index to each chunk in the + separated spec
-        for chunk in str(self).split("+"):
+        # index to each chunk in the + separated spec
+        specs = _cached_parse("select", str(self), _parse_select)
+        for i, (chunk_ct, rest) in enumerate(specs):
             if i != 0:
                 ret_str += '+'
-            j = 0  # index to items within a chunk separated by ':'
-            for subchunk in chunk.split(":"):
-                c_str = subchunk
-                if j == 0:
-                    # given <chunk_ct>:<res1>=<val1>:<res2>=<val2> or
-                    # <res1>=<val1>:<res2>:<val2> (without <chunk_ct>),
-                    # here we're looking at the first field:
-                    # subchunk=<chunk_ct> or subchunk=<res1>=<val1>
-                    save_str = None
-                    if not subchunk.isdigit():
-                        # detected a first field that is not
-                        # a <chunk_ct>, so default to 1
-                        subchunk = "1"
-                        save_str = c_str
-                    chunk_ct = int(subchunk)
-
-                    if i == 0:
-                        chunk_ct -= 1  # don't touch the first chunk which lands in MS
-
-                    if chunk_ct <= 0:
-                        num = 0
-                    elif increment:
-                        num = chunk_ct + increment
-                    elif percent_inc:
-                        num = int(math.ceil(chunk_ct * percent_inc))
-                    elif increment_dict is not None and i in increment_dict:
-                        if isinstance(increment_dict[i], (int, int)):
-                            inc = increment_dict[i]
-                            num = chunk_ct + inc
-                        elif isinstance(increment_dict[i], str):
-                            if increment_dict[i].endswith('%'):
-                                p_inc = float(
-                                    increment_dict[i][:-1]) / 100 + 1.0
-                                num = int(math.ceil(chunk_ct * p_inc))
-                            else:
-                                inc = int(increment_dict[i])
-                                num = chunk_ct + inc
-                    else:
-                        raise ValueError("bad increment specs")
-
-                    if (i == 0):
-                        num += 1  # put back the decremented count
 
-                    if save_str:
-                        c_str = "%s:%s" % (num, save_str)
+            if i == 0:
+                chunk_ct -= 1  # don't touch the first chunk which lands in MS
+
+            if chunk_ct <= 0:
+                num = 0
+            elif increment:
+                num = chunk_ct + increment
+            elif percent_inc:
+                num = int(math.ceil(chunk_ct * percent_inc))
+            elif increment_dict is not None and i in increment_dict:
+                if isinstance(increment_dict[i], (int, int)):
+                    inc = increment_dict[i]
+                    num = chunk_ct + inc
+                elif isinstance(increment_dict[i], str):
+                    if increment_dict[i].endswith('%'):
+                        p_inc = float(
+                            increment_dict[i][:-1]) / 100 + 1.0
+                        num = int(math.ceil(chunk_ct * p_inc))
                     else:
-                        c_str = "%s" % (num)
-                else:
-                    ret_str += ":"
-                ret_str += c_str
-                j += 1
+                        inc = int(increment_dict[i])
+                        num = chunk_ct + inc
+            else:
+                raise ValueError("bad increment specs")
+
+            if (i == 0):
+                num += 1  # put back the decremented count
 
-            i += 1
+            ret_str += "%s%s" % (num, rest)
 
         return select(ret_str)
 
@@ -1547,6 +1636,7 @@ class pbs_resource():
 
     __resources = PbsReadOnlyDescriptor('__resources', {})
     attributes = __resources
+    _attributes_lower = {}
     _attributes_hook_set = {}
     _attributes_unknown = {}
 
@@ -1583,10 +1673,10 @@ class pbs_resource():
 
         d = pbs_resource.attributes.copy()
 
-        if self in pbs_resource._attributes_unknown:
+        if self in self._attributes_unknown:
             # update pbs_resource list of attribute names to contain the
             # "unknown" names as well.
-            d.update(pbs_resource._attributes_unknown[self])
+            d.update(self._attributes_unknown[self])
 
         for resc in d:
             if resc == '_name' or resc == '_has_value':
@@ -1624,6 +1714,8 @@ class pbs_resource():
     def __contains__(self, resname):
         """__contains__"""
 
+        if resname in pbs_resource.attributes:
+            return True
         return hasattr(self, resname)
     #: m(__contains__)
 
@@ -1645,17 +1737,11 @@ class pbs_resource():
 
             # resource names in PBS are case insensitive,
             # so do caseless matching here.
-            found = False
-            namel = nameo.lower()
-            for resc in pbs_resource.attributes:
-                rescl = resc.lower()
-                if namel == rescl:
-                    # Need to use the matched name stored in PBS Python resource
-                    # table, to avoid resource ambiguity later on.
-                    name = resc
-                    found = True
-
-            if not found:
+            # Need to use the matched name stored in PBS Python resource
+            # table, to avoid resource ambiguity later on.
+            name = pbs_resource._attributes_lower.get(nameo.lower())
+            if name is None:
+                name = nameo
 
                 if _pbs_v1.in_python_mode():
                     # if attribute name not found,and executing inside Python
@@ -1668,15 +1754,11 @@ class pbs_resource():
                     # we're in a mom hook, so no longer raising an exception here since if
                     # it's an unknown resource, we can now tell server to
                     # automatically add a custom resource.
-                    if self not in self._attributes_unknown:
-                        self._attributes_unknown[self] = {}
                     # add the current attribute name to the "unknown" list
-                    self._attributes_unknown[self].update({name: None})
+                    _hook_names_add(self, '_attributes_unknown', name)
                 else:
-                    if self not in self._attributes_unknown:
-                        self._attributes_unknown[self] = {}
                     # add the current attribute name to the "unknown" list
-                    self._attributes_unknown[self].update({name: None})
+                    _hook_names_add(self, '_attributes_unknown', name)
 
         super().__setattr__(name, value)
 
@@ -1687,10 +1769,7 @@ class pbs_resource():
         # if 'walltime' or 'mem' has been assigned a value within the hook
         # script, or been unset.
         if _pbs_v1.in_python_mode():
-            if self not in self._attributes_hook_set:
-                self._attributes_hook_set[self] = {}
-            # using a dictionary value as easier to search for keys
-            self._attributes_hook_set[self].update({name: None})
+            _hook_names_add(self, '_attributes_hook_set', name)
     #: m(__setattr__)
 
     def keys(self):
@@ -1724,15 +1803,24 @@ class vchunk():
     def __init__(self, achunk):
         """__init__"""
 
-        ch = achunk.split(":")
+        if isinstance(achunk, tuple):
+            # an already parsed chunk, see exec_vnode.chunk_tuples
+            vnode_name, rescs = achunk
+        else:
+            vnode_name = None
+            rescs = []
+            for c in achunk.split(":"):
+                if c.find("=") == -1:
+                    vnode_name = c
+                else:
+                    rescs.append(c.split("=", 1))
+        if vnode_name is not None:
+            self.vnode_name = vnode_name
         self.chunk_resources = pbs_resource("Resource_List")
-        for c in ch:
-            if c.find("=") == -1:
-                self.vnode_name = c
-            else:
-                rs = c.split("=", 1)
-                descr = getattr(pbs_resource, rs[0])
-                self.chunk_resources[rs[0]] = descr._value_type[0](rs[1])
+        for r, v in rescs:
+            descr = getattr(pbs_resource,
+                            pbs_resource._attributes_lower.get(r.lower(), r))
+            self.chunk_resources[r] = descr._value_type[0](v)
     #: m(__init__)
 
 
@@ -1752,15 +1840,33 @@ class exec_vnode(_generic_attr):
             ev.chunks[1].vnode_name = 'vnodeC'
             ev.chunks[1].vnode_resources = {  'mem' : pbs.size('Z') }
 
+            The chunks are only parsed when first accessed. Hooks that only
+            read them can use ev.chunk_tuples instead, a tuple of
+            (vnode_name, ((resource, value string), ...)) per chunk:
+            ev.chunk_tuples[0] = ('vnodeA', (('ncpus', 'N'), ('mem', 'X')))
+
     """
     _derived_types = (_generic_attr,)
 
     def __init__(self, value):
         _pbs_v1.validate_input("job", "exec_vnode", value)
         super().__init__(value)
-        self.chunks = list()
-        vals = value.split("+")
-        i = 0
-        for v in vals:
-            self.chunks.append(vchunk(v.strip("(").strip(")")))
+        self._chunks = None
+
+    @property
+    def chunk_tuples(self):
+        """the parsed chunks as tuples, shared and read-only"""
+        return _cached_parse("exec_vnode", str(self._value),
+                             _parse_exec_vnode)
+
+    @property
+    def chunks(self):
+        """the list of pbs.vchunk of the exec_vnode, parsed on first use"""
+        if self._chunks is None:
+            self._chunks = [vchunk(c) for c in self.chunk_tuples]
+        return self._chunks
+
+    @chunks.setter
+    def chunks(self, value):
+        self._chunks = value
 #: --------         EXPORTED TYPES DICTIONARY                      ---------
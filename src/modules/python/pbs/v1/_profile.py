@@ -0,0 +1,251 @@
+# coding: utf-8
+"""
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+"""
+__doc__ = """
+Opt-in profiling of the hook scripts run by the embedded interpreter.
+
+Profiling is enabled by setting PBS_HOOK_PROFILE to a true value (1, true,
+yes) in the environment of the daemon running the hooks. The runs of the
+hook scripts are then timed, in wall and CPU time, and the calls to the
+hot paths of the pbs.v1 types (_event.accept and reject, the attribute
+descriptors __get__ and __set__, _IS_SETTABLE, pbs_resource.__str__) and
+to the functions of the _pbs_v1 C module made while they run are counted
+and timed. The call times are inclusive and include the profiling
+overhead, which is why profiling is off by default.
+
+The results are accumulated per hook and event type, across the runs and
+processes, in the JSON summary file <PBS_HOME>/hook_profile/<hook>.json:
+
+    {"hook": <hook name>,
+     "events": {<event type>: {"runs": <number of runs>,
+                               "wall": <total seconds>,
+                               "max_wall": <seconds of the longest run>,
+                               "cpu": <total seconds>,
+                               "calls": {<path>: [<count>, <seconds>]},
+                               "c_calls": <count of _pbs_v1 calls>,
+                               "c_time": <seconds in _pbs_v1 calls>}}}
+
+where the paths of the _pbs_v1 functions are prefixed with '_pbs_v1.'.
+The file is locked while being updated, tools aggregating the summaries
+can lock it with fcntl.lockf to read a complete summary.
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+import types
+
+import _pbs_v1
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#: environment variable enabling the profiling of the hooks
+PROFILE_ENV = "PBS_HOOK_PROFILE"
+#: directory of PBS_HOME holding the per hook summary files
+PROFILE_DIR = "hook_profile"
+#: prefix of the paths of the _pbs_v1 functions
+C_PREFIX = "_pbs_v1."
+
+enabled = os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+#: the event types of the hooks
+_EVENT_TYPES = frozenset((
+    "queuejob", "modifyjob", "resvsub", "movejob", "runjob", "management",
+    "modifyvnode", "provision", "resv_end", "execjob_begin",
+    "execjob_prologue", "execjob_epilogue", "execjob_preterm", "execjob_end",
+    "execjob_launch", "exechost_periodic", "exechost_startup",
+    "execjob_attach", "execjob_resize", "execjob_abort",
+    "execjob_postsuspend", "execjob_preresume", "periodic"))
+
+#: the _pbs_v1 functions used here, kept uninstrumented
+_c_event = _pbs_v1.event
+_c_get_pbs_conf = _pbs_v1.get_pbs_conf
+_c_logmsg = _pbs_v1.logmsg
+
+#: the calls made during the running hook, <path>: [<count>, <seconds>]
+_calls = {}
+#: (<wall>, <cpu>) start times of the running hook, None if not running
+_start = None
+#: names of the event types, by value
+_event_names = {}
+
+
+def _timed(path, func):
+    """
+    Returns a wrapper of func counting and timing its calls as 'path'
+    """
+    timer = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        t = timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            t = timer() - t
+            c = _calls.get(path)
+            if c is None:
+                _calls[path] = [1, t]
+            else:
+                c[0] += 1
+                c[1] += t
+    return wrapper
+#: m(_timed)
+
+
+def _setup():
+    """
+    Instruments the pbs.v1 types and the _pbs_v1 functions if profiling
+    is enabled. Called once the pbs.v1 package is imported, before its
+    names are imported into the pbs package.
+    """
+    if not enabled:
+        return
+    from . import _base_types, _svr_types
+
+    for cls, name, path in (
+            (_svr_types._event, "accept", "_event.accept"),
+            (_svr_types._event, "reject", "_event.reject"),
+            (_base_types.PbsAttributeDescriptor, "__get__",
+             "PbsAttributeDescriptor.__get__"),
+            (_base_types.PbsAttributeDescriptor, "__set__",
+             "PbsAttributeDescriptor.__set__"),
+            (_base_types.pbs_resource, "__str__", "pbs_resource.__str__")):
+        setattr(cls, name, _timed(path, cls.__dict__[name]))
+    _base_types._IS_SETTABLE = _timed("_IS_SETTABLE",
+                                      _base_types._IS_SETTABLE)
+
+    # the _pbs_v1 functions are replaced wherever they were imported
+    wrappers = {}
+    for name, value in vars(_pbs_v1).items():
+        if isinstance(value, types.BuiltinFunctionType):
+            wrappers[id(value)] = (value, _timed(C_PREFIX + name, value))
+        elif name.isupper() and isinstance(value, int) and \
+                name.lower() in _EVENT_TYPES:
+            _event_names[value] = name.lower()
+    modules = [_pbs_v1] + [m for n, m in list(sys.modules.items())
+                           if m is not None and
+                           (n == "pbs" or n.startswith("pbs."))]
+    for m in modules:
+        for name, value in list(vars(m).items()):
+            w = wrappers.get(id(value))
+            if w is not None and w[0] is value:
+                setattr(m, name, w[1])
+#: m(_setup)
+
+
+def _hook_begin():
+    """
+    Called by the embedded interpreter before running a hook script
+    """
+    global _calls, _start
+    if not enabled:
+        return
+    _calls = {}
+    _start = (time.perf_counter(), time.process_time())
+#: m(_hook_begin)
+
+
+def _hook_end():
+    """
+    Called by the embedded interpreter after running a hook script, adds
+    the run to the summary file of the hook
+    """
+    global _calls, _start
+    if not enabled or _start is None:
+        return
+    wall = time.perf_counter() - _start[0]
+    cpu = time.process_time() - _start[1]
+    calls = _calls
+    _calls = {}
+    _start = None
+    try:
+        e = _c_event()
+        hook = e.hook_name
+        if not hook:
+            return
+        event = _event_names.get(e.type, str(e.type))
+        _save(hook, event, wall, cpu, calls)
+    except Exception as exc:
+        _c_logmsg(_pbs_v1.LOG_DEBUG,
+                  "hook profile: unable to save the profile: %s" % (exc,))
+#: m(_hook_end)
+
+
+def _save(hook, event, wall, cpu, calls):
+    """
+    Adds a run of the hook for the event type to the summary file of
+    the hook
+    """
+    path = os.path.join(_c_get_pbs_conf()["PBS_HOME"], PROFILE_DIR)
+    if not os.path.isdir(path):
+        os.makedirs(path, 0o755, exist_ok=True)
+    with open(os.path.join(path, hook + ".json"), "a+") as f:
+        if fcntl is not None:
+            fcntl.lockf(f, fcntl.LOCK_EX)
+        f.seek(0)
+        data = f.read()
+        summary = json.loads(data) if data else {}
+        summary["hook"] = hook
+        s = summary.setdefault("events", {}).setdefault(event, {
+            "runs": 0, "wall": 0.0, "max_wall": 0.0, "cpu": 0.0,
+            "calls": {}, "c_calls": 0, "c_time": 0.0})
+        s["runs"] += 1
+        s["wall"] += wall
+        s["max_wall"] = max(s["max_wall"], wall)
+        s["cpu"] += cpu
+        for p, (n, t) in calls.items():
+            c = s["calls"].setdefault(p, [0, 0.0])
+            c[0] += n
+            c[1] += t
+            if p.startswith(C_PREFIX):
+                s["c_calls"] += n
+                s["c_time"] += t
+        f.seek(0)
+        f.truncate()
+        json.dump(summary, f, indent=1, sort_keys=True)
+#: m(_save)
@@ -47,7 +47,8 @@ This module captures all the python types representing the PBS Server objects
 (server,queue,job,resv, etc.)
 """
 from ._base_types import (PbsAttributeDescriptor, PbsReadOnlyDescriptor,
-                          pbs_resource, pbs_bool, _LOG,
+                          pbs_resource, pbs_bool, _LOG, _hook_names_add,
+                          job_state,
                           )
 import _pbs_v1
 from _pbs_v1 import (_event_accept, _event_reject,
@@ -337,10 +338,7 @@ class _job():
         # script, or been unset.
 
         if _pbs_v1.in_python_mode():
-            if self not in self._attributes_hook_set:
-                self._attributes_hook_set[self] = {}
-            # using a dictionary value as easier to search for keys
-            self._attributes_hook_set[self].update({name: None})
+            _hook_names_add(self, '_attributes_hook_set', name)
 
     #: m(__setattr__)
 
@@ -456,10 +454,7 @@ class _vnode():
         # script, or been unset.
 
         if _pbs_v1.in_python_mode() and (name != "_connect_server"):
-            if self not in self._attributes_hook_set:
-                self._attributes_hook_set[self] = {}
-            # using a dictionary value as easier to search for keys
-            self._attributes_hook_set[self].update({name: None})
+            _hook_names_add(self, '_attributes_hook_set', name)
             _pbs_v1.mark_vnode_set(self.name, name, str(value))
 
     #: m(__seattr__)
@@ -548,10 +543,7 @@ class _resv():
         # the hook script, or been unset.
 
         if _pbs_v1.in_python_mode():
-            if self not in self._attributes_hook_set:
-                self._attributes_hook_set[self] = {}
-            # using a dictionary value as easier to search for keys
-            self._attributes_hook_set[self].update({name: None})
+            _hook_names_add(self, '_attributes_hook_set', name)
     #: m(__setattr__)
 
 
@@ -626,11 +618,14 @@ class _queue():
             return _pbs_v1.get_job(jobid, self.name)
     #: m(job)
 
-    def jobs(self):
+    def jobs(self, attribs=None, select=None, page_size=None):
         """
             Returns an iterator that loops over the list of jobs on this queue.
+            The attributes obtained, selection criteria and page size
+            of the iterator can be given, see pbs_iter.
         """
-        return pbs_iter("jobs", "",  self.name, self._connect_server)
+        return pbs_iter("jobs", "",  self.name, self._connect_server,
+                        attribs=attribs, select=select, page_size=page_size)
     #: m(jobs)
 
 #: C(_queue)
@@ -766,22 +761,29 @@ class _server():
                             ignore_fin, username)
         #: m(jobs_nas)
     else:
-        def jobs(self):
+        def jobs(self, attribs=None, select=None, page_size=None):
             """
             Returns an iterator that loops over the list of jobs
             on this server.
+            The attributes obtained, selection criteria and page size
+            of the iterator can be given, see pbs_iter.
             """
 
-            return pbs_iter("jobs", "",  "", self._connect_server)
+            return pbs_iter("jobs", "",  "", self._connect_server,
+                            attribs=attribs, select=select,
+                            page_size=page_size)
         #: m(jobs)
 
-    def vnodes(self):
+    def vnodes(self, attribs=None, select=None, page_size=None):
         """
         Returns an iterator that loops over the list of vnodes
         on this server.
+        The attributes obtained, selection criteria and page size
+        of the iterator can be given, see pbs_iter.
         """
 
-        return pbs_iter("vnodes", "",  "", self._connect_server)
+        return pbs_iter("vnodes", "",  "", self._connect_server,
+                        attribs=attribs, select=select, page_size=page_size)
     #: m(vnodes)
 
     def queues(self):
@@ -791,12 +793,15 @@ class _server():
         return pbs_iter("queues", "",  "", self._connect_server)
     #: m(queues)
 
-    def resvs(self):
+    def resvs(self, attribs=None, select=None, page_size=None):
         """
         Returns an iterator that loops over the list of reservations on this
         server.
+        The attributes obtained, selection criteria and page size
+        of the iterator can be given, see pbs_iter.
         """
-        return pbs_iter("resvs", "", "", self._connect_server)
+        return pbs_iter("resvs", "", "", self._connect_server,
+                        attribs=attribs, select=select, page_size=page_size)
     #: m(resvs)
 
     def scheduler_restart_cycle(self):
@@ -954,6 +959,100 @@ _event.freq = PbsAttributeDescriptor(_event, 'freq', None, (int,))
 #                       PBS Iterator Type
 #:-------------------------------------------------------------------------
 
+#: comparison operators of the pbs_iter selection criteria
+_SELECT_OPS = {
+    "eq": lambda v, c: v == c or str(v) == str(c),
+    "ne": lambda v, c: not (v == c or str(v) == str(c)),
+    "lt": lambda v, c: v < c,
+    "le": lambda v, c: v <= c,
+    "gt": lambda v, c: v > c,
+    "ge": lambda v, c: v >= c,
+}
+
+#: operators of the criteria jobs are selected by the server with, as it
+#: has jobs lacking an attribute or resource satisfy "lt", "le" and "ne"
+#: where _matches does not
+_SERVER_SELECT_OPS = ("eq", "ge", "gt")
+
+#: an attribute that is cheap to stat, to list the names of the objects
+_NAME_ATTRIBUTE = {
+    "jobs": "job_state",
+    "queues": "queue_type",
+    "vnodes": "state",
+    "resvs": "reserve_state",
+}
+
+
+def _split_criterion(value):
+    """
+    Returns the (<op>, <value>) of a pbs_iter selection criterion,
+    which is either a value to be equal to, or an (<op>, <value>) tuple
+    where <op> is one of "eq", "ne", "lt", "le", "gt", "ge".
+    """
+    if isinstance(value, tuple):
+        op, value = value
+        if op not in _SELECT_OPS:
+            raise BadAttributeValueError(
+                "bad selection operator '%s'" % (op,))
+        return op, value
+    return "eq", value
+
+
+#: the job states as the server prints them
+_JOB_STATE_LETTERS = "TQHWREXBSUMF"
+
+
+def _server_value(name, value):
+    """
+    Returns the string form in which the server knows the value of the
+    job attribute 'name', e.g. "R" for pbs.JOB_STATE_RUNNING
+    """
+    if name == "job_state" and isinstance(value, int):
+        for ltr in _JOB_STATE_LETTERS:
+            if job_state(ltr) == value:
+                return ltr
+        raise BadAttributeValueError(
+            "bad job_state value '%s'" % (value,))
+    return str(value)
+
+
+def _make_attrl(names, opl=False):
+    """
+    Returns the attrl, or attropl, list of names, where each name is
+    either an attribute name or a (<name>, <op>, <value>) tuple in the
+    case of an attropl. Resources are given as <attribute>.<resource>
+    """
+    head = None
+    prev = None
+    for n in names:
+        if opl:
+            n, op, v = n
+            a = attropl()
+            a.op = globals()[op.upper()]
+            a.value = str(v)
+        else:
+            a = attrl()
+        if "." in n:
+            a.name, a.resource = n.split(".", 1)
+        else:
+            a.name = n
+        a.next = None
+        if prev is None:
+            head = a
+        else:
+            prev.next = a
+        prev = a
+    return head
+
+
+def _batch_status_names(bs):
+    """Returns the names of the objects of a batch status list"""
+    names = []
+    while bs:
+        names.append(bs.name)
+        bs = bs.next
+    return names
+
 
 class pbs_iter():
     """
@@ -968,6 +1067,29 @@ class pbs_iter():
                 a list of jobs on <queue_name>@<server_name>
 
     connect_server Name of the pbs server to get various stats.
+
+    attribs        Optional list of the attribute names to obtain, such as
+                   ["state", "resources_available.ncpus"]. Only applies
+                   to pbs_python mode, where the other attributes are not
+                   transferred and are left unset on the objects.
+    select         Optional dictionary of selection criteria, the objects
+                   returned are those whose attributes all match, e.g.
+                   {"state": pbs.ND_FREE,
+                    "resources_available.ncpus": ("ge", 8)}
+                   where a value is either to be equal to, or a tuple of
+                   one of the "eq", "ne", "lt", "le", "gt", "ge" operators
+                   and a value. In pbs_python mode, jobs are selected by
+                   the server on their "eq", "ge" and "gt" criteria, a
+                   job_state constant being sent as its letter. An
+                   unset attribute or resource never matches. An unknown
+                   attribute, or a value that does not compare with the
+                   attribute, raises BadAttributeValueError.
+    page_size      Optional, in pbs_python mode only the names of the
+                   objects are obtained first, the objects being stat'ed
+                   page_size at a time as they are iterated over, so that
+                   hooks only fetch the objects they use. The server can
+                   only stat several jobs at once, other objects are
+                   stat'ed one by one.
     """
     # NAS localmod 014
     if NAS_mod != None and NAS_mod != 0:
@@ -980,8 +1102,10 @@ class pbs_iter():
 
         def __init__(self, pbs_obj_name, pbs_filter1, pbs_filter2,
                      connect_server=None, pbs_ignore_fin=None,
-                     pbs_username=None):
+                     pbs_username=None, attribs=None, select=None,
+                     page_size=None):
 
+            self._set_selection(attribs, select, page_size)
             self._caller = _pbs_v1.get_python_daemon_name()
             if self._caller == "pbs_python":
 
@@ -1024,12 +1148,8 @@ class pbs_iter():
                     pbs_disconnect(self.con)
                     self.con = -1
                     return None
-                elif(self.type == "queues"):
-                    self.bs = pbs_statque(self.con, None, None, None)
-                elif(self.type == "vnodes"):
-                    self.bs = pbs_statvnode(self.con, None, None, None)
-                elif(self.type == "resvs"):
-                    self.bs = pbs_statresv(self.con, None, None, None)
+                elif(self.type in ("queues", "vnodes", "resvs")):
+                    self.bs = self._stat(None)
                 else:
                     _pbs_v1.logmsg(_pbs_v1.LOG_DEBUG,
                                    "pbs_iter/init: Bad object iterator type %s"
@@ -1061,8 +1181,10 @@ class pbs_iter():
                     self.ignore_fin, self.filter_user)
     else:
         def __init__(self, pbs_obj_name, pbs_filter1,
-                     pbs_filter2, connect_server=None):
+                     pbs_filter2, connect_server=None, attribs=None,
+                     select=None, page_size=None):
 
+            self._set_selection(attribs, select, page_size)
             self._caller = _pbs_v1.get_python_daemon_name()
             if self._caller == "pbs_python":
 
@@ -1099,13 +1221,9 @@ class pbs_iter():
                     return None
 
                 if(self.type == "jobs"):
-                    self.bs = pbs_statjob(self.con, pbs_filter2, None, None)
-                elif(self.type == "queues"):
-                    self.bs = pbs_statque(self.con, None, None, None)
-                elif(self.type == "vnodes"):
-                    self.bs = pbs_statvnode(self.con, None, None, None)
-                elif(self.type == "resvs"):
-                    self.bs = pbs_statresv(self.con, None, None, None)
+                    self.bs = self._stat(pbs_filter2)
+                elif(self.type in ("queues", "vnodes", "resvs")):
+                    self.bs = self._stat(None)
                 else:
                     _pbs_v1.logmsg(_pbs_v1.LOG_DEBUG,
                                    "pbs_iter/init: Bad object iterator type %s"
@@ -1123,13 +1241,133 @@ class pbs_iter():
                 _pbs_v1.iter_nextfunc(
                     self, 1, pbs_obj_name, pbs_filter1, pbs_filter2)
 
+    def _set_selection(self, attribs, select, page_size):
+        """
+        Keeps the attributes, selection criteria and page size of the
+        iterator, see the class description
+        """
+        self._attribs = attribs
+        self._select = []
+        if select:
+            for n, v in select.items():
+                op, v = _split_criterion(v)
+                self._select.append((n, op, v))
+        # the criteria checked by _matches, those the server did not
+        # select the objects with
+        self._checked = self._select
+        self._page_size = page_size
+        self._ids = []
+    #: m(_set_selection)
+
+    def _stat(self, id):
+        """
+        Stat the objects of the iterator in pbs_python mode, 'id' being
+        the queue of the jobs if any. Only the requested attributes are
+        obtained and jobs are selected by the server on the criteria it
+        evaluates as _matches does. With a page size,
+        only the names of the objects are obtained, and the first page
+        is stat'ed.
+        """
+        names = None
+        if self._attribs is not None:
+            names = list(self._attribs)
+            for n, _, _ in self._select:
+                if n not in names:
+                    names.append(n)
+            self._attrl = _make_attrl(names)
+        else:
+            self._attrl = None
+        attrl = self._attrl
+        if self._page_size:
+            attrl = _make_attrl([_NAME_ATTRIBUTE[self.type]])
+
+        crit = []
+        if self.type == "jobs":
+            crit = [(n, op, _server_value(n, v))
+                    for n, op, v in self._select
+                    if op in _SERVER_SELECT_OPS]
+        if crit:
+            if id:
+                crit.append((ATTR_queue, "eq", id))
+            bs = pbs_selstat(self.con, _make_attrl(crit, opl=True),
+                             attrl, None)
+            self._checked = [c for c in self._select
+                             if c[1] not in _SERVER_SELECT_OPS]
+        elif self.type == "jobs":
+            bs = pbs_statjob(self.con, id, attrl, None)
+        elif self.type == "queues":
+            bs = pbs_statque(self.con, None, attrl, None)
+        elif self.type == "vnodes":
+            bs = pbs_statvnode(self.con, None, attrl, None)
+        else:
+            bs = pbs_statresv(self.con, None, attrl, None)
+
+        if not self._page_size:
+            return bs
+        self._ids = _batch_status_names(bs)
+        return self._next_page()
+    #: m(_stat)
+
+    def _next_page(self):
+        """
+        Stat the next page of objects in pbs_python mode, returns None
+        once all the pages have been stat'ed
+        """
+        bs = None
+        while bs is None and self._ids:
+            if self.type == "jobs":
+                page = self._ids[:self._page_size]
+                del self._ids[:self._page_size]
+                bs = pbs_statjob(self.con, ",".join(page), self._attrl,
+                                 None)
+            else:
+                name = self._ids.pop(0)
+                if self.type == "queues":
+                    bs = pbs_statque(self.con, name, self._attrl, None)
+                elif self.type == "vnodes":
+                    bs = pbs_statvnode(self.con, name, self._attrl, None)
+                else:
+                    bs = pbs_statresv(self.con, name, self._attrl, None)
+        return bs
+    #: m(_next_page)
+
+    def _matches(self, obj):
+        """
+        Returns True if the object satisfies the selection criteria, an
+        unset attribute or resource never does. Raises
+        BadAttributeValueError on an unknown attribute or a value that
+        does not compare with the attribute.
+        """
+        for n, op, c in self._checked:
+            try:
+                if "." in n:
+                    a, r = n.split(".", 1)
+                    v = getattr(obj, a)
+                    if v is not None:
+                        v = v[r]
+                else:
+                    v = getattr(obj, n)
+                if v is None:
+                    return False
+                if isinstance(c, str) and not isinstance(v, str):
+                    c = v.__class__(c)
+                if not _SELECT_OPS[op](v, c):
+                    return False
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise BadAttributeValueError(
+                    "bad selection criterion '%s': %s" % (n, e))
+        return True
+    #: m(_matches)
+
     def __iter__(self):
         return self
 
     # NAS localmod 014
     if NAS_mod != None and NAS_mod != 0:
-        def __next__(self):
+        def _next_obj(self):
             if self._caller == "pbs_python":
+                if getattr(self, "bs", None) is None and self._ids:
+                    self.bs = self._next_page()
                 if not hasattr(self, "bs") or self.bs == None:
                     if not _pbs_v1.use_static_data():
                         pbs_disconnect(self.con)
@@ -1275,8 +1513,10 @@ class pbs_iter():
                                              self.filter2, self.ignore_fin,
                                              self.filter_user)
     else:
-        def __next__(self):
+        def _next_obj(self):
             if self._caller == "pbs_python":
+                if getattr(self, "bs", None) is None and self._ids:
+                    self.bs = self._next_page()
                 if not hasattr(self, "bs") or self.bs == None:
                     if not _pbs_v1.use_static_data():
                         pbs_disconnect(self.con)
@@ -1414,6 +1654,12 @@ class pbs_iter():
                 # argument 0 below tells C function we're inside next
                 return _pbs_v1.iter_nextfunc(self, 0, self.obj_name,
                                              self.filter1, self.filter2)
+
+    def __next__(self):
+        while True:
+            obj = self._next_obj()
+            if self._matches(obj):
+                return obj
 #: C(pbs_iter)
 
 #:------------------------------------------------------------------------
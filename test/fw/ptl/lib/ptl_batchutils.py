@@ -50,6 +50,7 @@ import string
 import sys
 import time
 from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
 from distutils.version import LooseVersion
 
 from ptl.lib.pbs_api_to_cli import api_to_cli
@@ -77,6 +78,10 @@ class BatchUtils(object):
     subjob_tag = re.compile(r"(?P<jobid>[\d]+)\[(?P<subjobid>[0-9]+)\]*" +
                             r"[.]*[(?P<server>.*)]*")
 
+    # attributes that JSON outputs as objects but the text output as a
+    # comma separated list of <name>=<value>
+    json_list_attrs = ('Variable_List',)
+
     pbsobjname_re = re.compile(r"^(?P<tag>[\w\d][\d\w\s]*:?[\s]+)" +
                                r"*(?P<name>[\w@\.\d\[\]-]+)$")
     pbsobjattrval_re = re.compile(r"""
@@ -428,18 +433,31 @@ class BatchUtils(object):
         :param attribs: Attributes
         :returns: File converted to a batch dictlist format
         """
+        return list(self.iter_file_dictlist(fpath, attribs, id))
+
+    def iter_file_dictlist(self, fpath=None, attribs=None, id=None):
+        """
+        Generator of the objects of a file in batch dictlist format,
+        the file is read one line at a time. See iter_dictlist
+
+        :param fpath: File to be converted
+        :type fpath: str
+        :param attribs: Attributes
+        :param id: Optional, id of the object to convert
+        """
         if fpath is None:
-            return []
+            return
 
         try:
-            with open(fpath, 'r') as f:
-                lines = f.readlines()
+            f = open(fpath, 'r')
         except Exception as e:
             self.logger.error('error converting list of dictionaries to ' +
                               'file ' + str(e))
-            return []
+            return
 
-        return self.convert_to_dictlist(lines, attribs, id=id)
+        with f:
+            for d in self.iter_dictlist(f, attribs, id=id):
+                yield d
 
     def file_to_vnodedef(self, fpath=None):
         """
@@ -648,48 +666,85 @@ class BatchUtils(object):
                          objects.
         :returns: Record list converted into dictlist format
         """
+        return list(self.iter_dictlist(l, attribs, mergelines, id,
+                                       obj_type))
+
+    @staticmethod
+    def merge_lines(lines):
+        """
+        Generator of the lines of a qstat output with the lines that
+        qstat breaks a long value over merged into one.
+
+        A line that starts with a tab continues the previous line, and
+        so do the lines that do not start with a space that follow it,
+        up to the next blank line.
 
+        :param lines: lines to merge
+        :type lines: iterable
+        """
+        line = None
+        continued = False
+        for l in lines:
+            if l.startswith('\t'):
+                if line is None:
+                    line = ''
+                line = line.strip('\r\n\t') + l.strip('\r\n\t')
+                continued = True
+            elif continued and not l.startswith(' ') and l.strip():
+                line = line + l
+            else:
+                if line is not None:
+                    yield line
+                line = l
+                continued = False
+        if line is not None:
+            yield line
+
+    def iter_dictlist(self, lines, attribs=None, mergelines=True, id=None,
+                      obj_type=None):
+        """
+        Generator of the objects of a qstat, pbsnodes or pbs_rstat
+        output, in dictlist format, one object at a time.
+
+        The attributes not in attribs are not kept and, when an id is
+        given, the attributes of other objects are not parsed and the
+        parse ends after the object of that id.
+
+        :param lines: lines to convert, e.g., an opened file
+        :type lines: iterable
+        :param attribs: Optional, attributes to keep
+        :param mergelines: merge qstat broken lines into one
+        :param id: Optional, id of the object to convert
+        :param obj_type: The type of object to query, one of the *
+                         objects.
+        """
         if mergelines:
-            lines = []
-            count = 1
-            for i in range(len(l)):
-                if l[i].startswith('\t'):
-                    _e = len(lines) - 1
-                    lines[_e] = lines[_e].strip('\r\n\t') + \
-                        l[i].strip('\r\n\t')
-                elif (not l[i].startswith(' ') and i > count and
-                      l[i - count].startswith('\t')):
-                    _e = len(lines) - count
-                    lines[_e] = lines[_e] + l[i]
-                    if ((i + 1) < len(l) and not
-                            l[i + 1].startswith(('\t', ' '))):
-                        count += 1
-                    else:
-                        count = 1
-                else:
-                    lines.append(l[i])
-        else:
-            lines = l
+            lines = self.merge_lines(lines)
 
-        objlist = []
         d = {}
+        # values repeat across objects, share a single string for each
+        values = {}
+        # skip the attributes of objects that are not the one requested
+        skip = id is not None
 
         for l in lines:
             strip_line = l.strip()
             m = self.pbsobjname_re.match(strip_line)
             if m:
-                if len(d.keys()) > 1:
-                    if id is None or (id is not None and d['id'] == id):
-                        objlist.append(d.copy())
+                if len(d.keys()) > 1 and not skip:
+                    yield d
+                    if id is not None:
+                        return
                 d = {}
                 d['id'] = m.group('name')
+                skip = id is not None and d['id'] != id
                 _t = m.group('tag')
                 if _t == 'Resv ID: ':
                     d[_t.replace(': ', '')] = d['id']
-            else:
+            elif not skip:
                 m = self.pbsobjattrval_re.match(strip_line)
                 if m:
-                    attr = m.group('attribute')
+                    attr = sys.intern(m.group('attribute'))
                     # Revisit this after having separate VNODE class
                     if (attribs is None or attr.lower() in attribs or
                             attr in attribs or (obj_type == MGR_OBJ_NODE and
@@ -697,12 +752,86 @@ class BatchUtils(object):
                         if attr in d:
                             d[attr] = d[attr] + "," + m.group('value')
                         else:
-                            d[attr] = m.group('value')
+                            value = m.group('value')
+                            d[attr] = values.setdefault(value, value)
         # add the last element
-        if len(d.keys()) > 1:
-            if id is None or (id is not None and d['id'] == id):
-                objlist.append(d.copy())
+        if len(d.keys()) > 1 and not skip:
+            yield d
+
+    def convert_json_to_dictlist(self, out, attribs=None, id=None,
+                                 obj_type=None):
+        """
+        Convert the JSON output of ``qstat -f -F json`` or
+        ``pbsnodes -av -F json`` into the dictlist format of
+        convert_to_dictlist.
+
+        Nested resources are flattened to ``<attribute>.<resource>``,
+        Variable_List is joined back into its ``<name>=<value>`` list,
+        with the commas of the values escaped again, and numbers are
+        kept as printed, as they are in the text output.
+        The JSON output of pbsnodes does not hold the zero
+        resources_assigned nor the slots of the jobs of the nodes,
+        that of the text output does.
+
+        :param out: The JSON output, as a string or array of lines
+        :type out: str or List
+        :param attribs: Optional, attributes to keep
+        :param id: Optional, id of the object to keep
+        :param obj_type: The type of object to query, one of the *
+                         objects.
+        :returns: Record list converted into dictlist format
+        :raises ValueError: if the output is not valid JSON
+        """
+        if isinstance(out, list):
+            out = '\n'.join(out)
+        # numbers are kept as printed, e.g., 1.50 is not to become 1.5
+        data = json.loads(out, strict=False, parse_float=str,
+                          parse_int=str)
+        if not isinstance(data, dict):
+            raise ValueError('unexpected JSON output')
+
+        def _str(value):
+            if isinstance(value, list):
+                return ', '.join([str(v) for v in value])
+            return str(value)
 
+        def _keep(a):
+            return (attribs is None or a.lower() in attribs or a in attribs or
+                    (obj_type == MGR_OBJ_NODE and a == 'Mom'))
+
+        objlist = []
+        # values repeat across objects, share a single string for each
+        values = {}
+        # besides scalars like the timestamp, the top level holds the
+        # objects by name, e.g., "Jobs", "Queue", "Server" or "nodes"
+        for objs in data.values():
+            if not isinstance(objs, dict):
+                continue
+            for name, attrs in objs.items():
+                if id is not None and name != id:
+                    continue
+                d = {'id': name}
+                for attr, value in attrs.items():
+                    if type(value) is str:
+                        if attribs is None or _keep(attr):
+                            d[attr] = values.setdefault(value, value)
+                    elif type(value) is not dict:
+                        if attribs is None or _keep(attr):
+                            d[attr] = _str(value)
+                    elif attr in self.json_list_attrs:
+                        if attribs is None or _keep(attr):
+                            d[attr] = ','.join(
+                                [k + '=' + _str(v).replace(',', '\\,')
+                                 for k, v in value.items()])
+                    else:
+                        for k, v in value.items():
+                            a = sys.intern(attr + '.' + k)
+                            if attribs is None or _keep(a):
+                                if type(v) is not str:
+                                    v = _str(v)
+                                d[a] = values.setdefault(v, v)
+                if len(d.keys()) > 1:
+                    objlist.append(d)
         return objlist
 
     def convert_to_batch(self, l, mergelines=True):
@@ -1612,3 +1741,254 @@ class PbsBatchStatus(list):
         for l in self.__bs:
             rv += [self.__bu.batch_status_as_dict_to_str(l)]
         return "\n".join(rv)
+
+
+class _RecordLayout(object):
+
+    """
+    Attribute names shared by the batch status records that have the
+    same attributes in the same order, with the position of each
+    attribute in the records' values
+    """
+
+    __slots__ = ('keys', 'index', 'transitions')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = dict([(k, i) for i, k in enumerate(keys)])
+        # layout reached by adding an attribute to this layout
+        self.transitions = {}
+
+    def add(self, key):
+        """
+        The layout of a record once the attribute key is added to it
+        """
+        layout = self.transitions.get(key)
+        if layout is None:
+            layout = BatchStatusRecord.get_layout(self.keys + (key,))
+            self.transitions[key] = layout
+        return layout
+
+
+class BatchStatusRecord(MutableMapping):
+
+    """
+    Compact representation of a batch status entry, with the access
+    of a dictionary.
+
+    The attribute names are interned and held once in a layout shared
+    by all the records that have the same attributes, each record
+    only holds its list of values.
+
+    :param bs: Optional, attributes of the record
+    :type bs: Dictionary or List of (name, value)
+    """
+
+    __slots__ = ('_layout', '_values')
+
+    # layouts by attribute names, cleared when reaching max_layouts,
+    # records keep a reference to their own layout
+    _layouts = {}
+    max_layouts = 4096
+
+    def __init__(self, bs=None):
+        if bs is None:
+            bs = {}
+        if isinstance(bs, BatchStatusRecord):
+            self._layout = bs._layout
+            self._values = list(bs._values)
+            return
+        if not isinstance(bs, Mapping):
+            bs = OrderedDict(bs)
+        self._layout = self.get_layout(tuple(bs.keys()))
+        self._values = list(bs.values())
+
+    @classmethod
+    def get_layout(cls, keys):
+        """
+        The shared layout of the records with the given attributes
+
+        :param keys: Attribute names, in order
+        :type keys: tuple
+        """
+        layout = cls._layouts.get(keys)
+        if layout is None:
+            if len(cls._layouts) >= cls.max_layouts:
+                cls._layouts.clear()
+            keys = tuple([sys.intern(k) if type(k) is str else k
+                          for k in keys])
+            layout = _RecordLayout(keys)
+            cls._layouts[keys] = layout
+        return layout
+
+    def __getitem__(self, key):
+        return self._values[self._layout.index[key]]
+
+    def __setitem__(self, key, value):
+        i = self._layout.index.get(key)
+        if i is None:
+            self._layout = self._layout.add(key)
+            self._values.append(value)
+        else:
+            self._values[i] = value
+
+    def __delitem__(self, key):
+        i = self._layout.index[key]
+        keys = self._layout.keys
+        self._layout = self.get_layout(keys[:i] + keys[i + 1:])
+        del self._values[i]
+
+    def __contains__(self, key):
+        return key in self._layout.index
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key, default=None):
+        i = self._layout.index.get(key)
+        if i is None:
+            return default
+        return self._values[i]
+
+    def items(self):
+        return list(zip(self._layout.keys, self._values))
+
+    def update(self, *args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], Mapping):
+            for k, v in args[0].items():
+                self[k] = v
+            if kwargs:
+                MutableMapping.update(self, **kwargs)
+        else:
+            MutableMapping.update(self, *args, **kwargs)
+
+    def copy(self):
+        return BatchStatusRecord(self)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        new = BatchStatusRecord()
+        new._layout = self._layout
+        new._values = copy.deepcopy(self._values, memo)
+        return new
+
+    def __reduce__(self):
+        return (BatchStatusRecord, (self.items(),))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class _PendingObject(object):
+
+    """
+    Batch status of an object that is created on first access
+    """
+
+    __slots__ = ('obj_type', 'bs')
+
+    def __init__(self, obj_type, bs):
+        self.obj_type = obj_type
+        self.bs = bs
+
+    def __repr__(self):
+        return '<pending ' + str(self.bs.get('id')) + '>'
+
+
+class LazyObjectDict(dict):
+
+    """
+    Dictionary of PTL objects by id, to which objects can be added
+    as a batch status and are only created when first accessed.
+
+    Membership, length and keys do not create any object, accessing
+    a value creates it through the loader.
+
+    :param loader: Called with the object type and a list of the
+                   batch status of one object to create the object
+                   and add it to this dictionary, see
+                   Wrappers.update_attributes
+    :type loader: callable
+    """
+
+    def __init__(self, loader, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.loader = loader
+
+    def defer(self, obj_type, bs, overwrite=False):
+        """
+        Add or update the batch status of an object that is yet to
+        be created
+
+        :param obj_type: The type of object
+        :param bs: Dictionary representation of the batch status
+        :type bs: Dictionary
+        :param overwrite: If True, replace the batch status rather
+                          than update it
+        :type overwrite: bool
+        :returns: False if the object already exists, in which case it
+                  must be updated directly, True otherwise
+        """
+        pending = dict.get(self, bs['id'])
+        if pending is None:
+            dict.__setitem__(self, bs['id'],
+                             _PendingObject(obj_type, BatchStatusRecord(bs)))
+        elif not isinstance(pending, _PendingObject):
+            return False
+        elif overwrite:
+            pending.bs = BatchStatusRecord(bs)
+        else:
+            pending.bs.update(bs)
+        return True
+
+    def is_pending(self, key):
+        """
+        True if the object of the given id is yet to be created
+        """
+        return isinstance(dict.get(self, key), _PendingObject)
+
+    def _load(self, key, value):
+        if isinstance(value, _PendingObject):
+            dict.__delitem__(self, key)
+            self.loader(value.obj_type, [value.bs])
+            value = dict.__getitem__(self, key)
+        return value
+
+    def __getitem__(self, key):
+        return self._load(key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        # overriding iteration makes copies like dict(d) go through
+        # keys and __getitem__, which creates the pending objects
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+        return [self[k] for k in list(self.keys())]
+
+    def items(self):
+        return [(k, self[k]) for k in list(self.keys())]
+
+    def pop(self, key, *args):
+        if key in self:
+            value = self[key]
+            dict.__delitem__(self, key)
+            return value
+        return dict.pop(self, key, *args)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self):
+        return dict(self.items())
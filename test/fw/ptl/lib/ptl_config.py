@@ -77,6 +77,9 @@ class PtlConfig(object):
             'PTL_MAX_ATTEMPTS': 180,
             'PTL_ATTEMPT_INTERVAL': 0.5,
             'PTL_UPDATE_ATTRIBUTES': True,
+            'PTL_LOG_INDEX': True,
+            'PTL_MAX_PARALLEL': 1,
+            'PTL_SSH_CONTROL_PERSIST': 0,
         }
         self.handlers = {
             'PTL_SUDO_CMD': DshUtils.set_sudo_cmd,
@@ -84,7 +87,10 @@ class PtlConfig(object):
             'PTL_CP_CMD': DshUtils.set_copy_cmd,
             'PTL_MAX_ATTEMPTS': PBSObject.set_max_attempts,
             'PTL_ATTEMPT_INTERVAL': PBSObject.set_attempt_interval,
-            'PTL_UPDATE_ATTRIBUTES': PBSObject.set_update_attributes
+            'PTL_UPDATE_ATTRIBUTES': PBSObject.set_update_attributes,
+            'PTL_LOG_INDEX': PBSObject.set_log_index,
+            'PTL_MAX_PARALLEL': DshUtils.set_max_parallel,
+            'PTL_SSH_CONTROL_PERSIST': DshUtils.set_ssh_control_persist
         }
         if conf is None:
             conf = os.environ.get('PTL_CONF_FILE', '/etc/ptl.conf')
@@ -89,6 +89,9 @@ PBS_HOOK = MGR_OBJ_PBS_HOOK
 
 (PTL_COUNTER, PTL_FILTER) = [0, 1]
 
+# populate objects off of a status on first access, see Wrappers.status
+PTL_LAZY = 'lazy'
+
 PTL_STR_TO_OP = {
     '<': LT,
     '<=': LE,
@@ -51,12 +51,14 @@ from ptl.utils.pbs_testusers import (ROOT_USER, TEST_USER, PbsUser,
                                      DAEMON_SERVICE_USER)
 from ptl.lib.ptl_error import PbsManagerError
 from ptl.lib.ptl_object import PBSObject
+from ptl.lib.ptl_resourceresv import ResourceResv
+from ptl.lib.ptl_types import PbsAttribute
 from ptl.lib.ptl_constants import (ATTR_resv_start, ATTR_job,
                                    ATTR_resv_end, ATTR_resv_duration,
                                    ATTR_count, ATTR_rescassn, ATTR_qtype,
                                    ATTR_enable, ATTR_start, ATTR_total,
                                    MGR_CMD_SET, MGR_CMD_UNSET, MGR_OBJ_QUEUE,
-                                   QUEUE)
+                                   QUEUE, RESOURCES_AVAILABLE)
 
 
 class Resource(PBSObject):
@@ -413,6 +415,383 @@ class EquivClass(PBSObject):
         return s
 
 
+class EquivClassIndex(object):
+
+    """
+    Index of the equivalence classes of a set of objects, that can be
+    updated with the objects that changed rather than rebuilt
+
+    The decoded attribute values of each object are cached, so that
+    updating an object only decodes the values that changed, and
+    resource totals are computed from the cache.
+
+    :param attrib: attributes to build equivalence classes out of
+    :type attrib: list
+    :param op: set to RESOURCES_AVAILABLE uses the dynamic
+               amount of resources available, i.e., available -
+               assigned, otherwise uses static amount of
+               resources available
+    :param show_zero_resources: If False, objects for which one of
+                                the attributes is 0 are left out
+    :type show_zero_resources: bool
+    :param bslist: Optional, list of dictionary representation
+                   of a batch status to index
+    :type bslist: List
+    """
+
+    # default op of totals, the op of the index, as None requests the
+    # static amounts
+    _index_op = object()
+
+    def __init__(self, attrib, op=RESOURCES_AVAILABLE,
+                 show_zero_resources=True, bslist=None):
+        if isinstance(attrib, str):
+            attrib = attrib.split(',')
+        self.attrib = list(attrib)
+        self.op = op
+        self.show_zero_resources = show_zero_resources
+        # id -> {attribute: (raw value, decoded value)}
+        self._values = {}
+        # id -> class key
+        self._keys = {}
+        # class key -> (attributes, {id: None})
+        self._classes = {}
+        if bslist:
+            self.update(bslist)
+
+    def assigned_attribs(self):
+        """
+        The resources_assigned attributes that go with the
+        resources_available attributes of the index
+        """
+        return ['resources_assigned.' + a[len('resources_available.'):]
+                for a in self.attrib
+                if a.startswith('resources_available.')]
+
+    def _decode(self, oid, bs):
+        cache = self._values.get(oid, {})
+        values = {}
+        for a in self.attrib + self.assigned_attribs():
+            if a not in bs:
+                continue
+            raw = bs[a]
+            if a in cache and cache[a][0] == raw:
+                values[a] = cache[a]
+            else:
+                values[a] = (raw, PbsAttribute.decode_value(raw))
+        self._values[oid] = values
+        return values
+
+    def _amount(self, a, values, op):
+        amt = values[a][1]
+        val = a.replace('resources_available.', '')
+        assigned = 'resources_assigned.' + val
+        if op == RESOURCES_AVAILABLE and assigned in values:
+            amt = int(amt) - int(values[assigned][1])
+        # this case where amt goes negative is not a bug, it
+        # may happen when computing whats_available due to the
+        # fact that the computation is subtractive, it does
+        # add back resources when jobs/reservations end but
+        # is only concerned with what is available now for
+        # a given duration, that is why in the case where
+        # amount goes negative we set it to 0
+        if amt < 0:
+            amt = 0
+        return amt
+
+    def _key(self, values):
+        cls = ()
+        attrs = {}
+        for a in self.attrib:
+            if a not in values:
+                continue
+            if a.startswith('resources_available.'):
+                val = a.replace('resources_available.', '')
+                amt = self._amount(a, values, self.op)
+            else:
+                val = a
+                amt = values[a][1]
+            if amt == 0 and not self.show_zero_resources:
+                return None
+            # Build the key of the equivalence class
+            cls += (val + '=' + str(amt),)
+            attrs[val] = amt
+        if len(cls) == 0:
+            return None
+        return (cls, attrs)
+
+    def _discard(self, oid):
+        key = self._keys.pop(oid, None)
+        if key is not None:
+            ids = self._classes[key][1]
+            del ids[oid]
+            if not ids:
+                del self._classes[key]
+
+    def update(self, bslist):
+        """
+        Add or update objects in the index
+
+        :param bslist: list of dictionary representation of a batch
+                       status of the objects that changed
+        :type bslist: List
+        """
+        for bs in bslist:
+            oid = bs['id']
+            k = self._key(self._decode(oid, bs))
+            key = None if k is None else k[0]
+            if oid in self._keys and self._keys[oid] == key:
+                continue
+            self._discard(oid)
+            if key is None:
+                continue
+            self._keys[oid] = key
+            if key not in self._classes:
+                self._classes[key] = (k[1], {})
+            self._classes[key][1][oid] = None
+
+    def remove(self, ids):
+        """
+        Remove objects from the index
+
+        :param ids: identifiers of the objects to remove
+        :type ids: List
+        """
+        for oid in ids:
+            self._discard(oid)
+            self._values.pop(oid, None)
+
+    def classes(self):
+        """
+        The equivalence classes of the indexed objects
+
+        :returns: List of EquivClass
+        """
+        return [EquivClass(key, attrs, list(ids))
+                for key, (attrs, ids) in self._classes.items()]
+
+    def counts(self):
+        """
+        The number of objects in each equivalence class
+
+        :returns: Dictionary of class key to number of objects
+        """
+        return dict([(key, len(ids))
+                     for key, (_, ids) in self._classes.items()])
+
+    def totals(self, op=_index_op):
+        """
+        Totals of the numeric resources_available attributes of the
+        objects in the equivalence classes, memory in kb
+
+        :param op: RESOURCES_AVAILABLE to total available - assigned,
+                   otherwise, e.g. None, totals the static amount.
+                   Defaults to the index's op
+        :returns: Dictionary of resource name to total
+        """
+        if op is self._index_op:
+            op = self.op
+        totals = {}
+        for oid in self._keys:
+            values = self._values[oid]
+            for a in self.attrib:
+                if (not a.startswith('resources_available.') or
+                        a not in values):
+                    continue
+                try:
+                    amt = self._amount(a, values, op)
+                    if isinstance(amt, bool):
+                        continue
+                    amt = amt + 0
+                except (TypeError, ValueError):
+                    continue
+                val = a.replace('resources_available.', '')
+                totals[val] = totals.get(val, 0) + amt
+        return totals
+
+
+class NodeResourceMatrix(object):
+
+    """
+    Node by resource matrix of the amounts of consumable resources
+    available and assigned, built once from a node status
+
+    Rows are nodes, and each resource is a column of integer amounts,
+    so that utilization is computed from sums over the rows. Running
+    jobs are added in one pass, with their requested amounts and hosts
+    kept to compute the utilization of an entity, and allocations made
+    with ``allocate`` change the amounts available of a node.
+
+    :param nodes: Nodes as a list of dictionary representation of a
+                  batch status, or a dictionary of node objects
+    :type nodes: List or Dictionary
+    :param resources: Names of the resources, defaults to ncpus and mem
+    :type resources: List or None
+    :param jobs: Optional, jobs to add, see add_jobs
+    :type jobs: List or None
+    """
+
+    unschedulable_states = ('down', 'unavailable', 'unknown', 'Stale')
+
+    def __init__(self, nodes, resources=None, jobs=None):
+        if resources is None:
+            resources = ['ncpus', 'mem']
+        self.resources = list(resources)
+        if isinstance(nodes, dict):
+            nodes = [dict(n.attributes, id=name)
+                     for name, n in nodes.items()]
+        self.attributes = nodes
+        self.ids = [n['id'] for n in nodes]
+        self.rows = dict([(nid, i) for i, nid in enumerate(self.ids)])
+        self.schedulable = []
+        self.has_jobs = []
+        # resource -> per node amount, None when not an integer
+        self.avail = dict([(r, []) for r in self.resources])
+        self.assigned = dict([(r, []) for r in self.resources])
+        self.jobs = []
+        self._decoded = {}
+        for node in nodes:
+            nstate = node.get('state', '')
+            self.schedulable.append(
+                not any([s in nstate for s in self.unschedulable_states]))
+            self.has_jobs.append('jobs' in node)
+            for r in self.resources:
+                self.avail[r].append(
+                    self._int(node.get('resources_available.' + r)))
+                self.assigned[r].append(
+                    self._int(node.get('resources_assigned.' + r)))
+        if jobs is not None:
+            self.add_jobs(jobs)
+
+    def _int(self, value):
+        """
+        Decoded integer value of an attribute, None if the value is
+        not an integer. Decoded values are cached as the same values
+        repeat across nodes
+        """
+        if value is None:
+            return None
+        try:
+            val = self._decoded[value]
+        except (KeyError, TypeError):
+            val = PbsAttribute.decode_value(value)
+            if not isinstance(val, int) or isinstance(val, bool):
+                val = None
+            try:
+                self._decoded[value] = val
+            except TypeError:
+                pass
+        return val
+
+    def add_jobs(self, jobs):
+        """
+        Add the running jobs out of a list of dictionary
+        representation of a batch status of jobs. The hosts of a job
+        are only parsed when the job matches an entity
+        """
+        for job in jobs:
+            if 'job_state' in job and job['job_state'] != 'R':
+                continue
+            requested = {}
+            for r in self.resources:
+                if 'Resource_List.' + r in job:
+                    requested[r] = self._int(job['Resource_List.' + r])
+            self.jobs.append((job, requested, job.get('exec_host')))
+
+    @staticmethod
+    def parse_exec_vnode(execvnode):
+        """
+        Parse an exec_vnode or resv_nodes string
+
+        :returns: List of chunks, each chunk a dictionary of vnode
+                  name to dictionary of resources
+        """
+        chunks = []
+        for chunk in execvnode.split(')'):
+            chunk = chunk.lstrip('+(')
+            if not chunk:
+                continue
+            d = {}
+            for vchunk in chunk.split('+'):
+                entities = vchunk.split(':')
+                d[entities[0]] = dict([e.split('=', 1)
+                                       for e in entities[1:]])
+            chunks.append(d)
+        return chunks
+
+    def allocate(self, vnode, resources):
+        """
+        Take an allocation out of the resources available of a node.
+        Only integer amounts are allocated
+
+        :param vnode: The node name
+        :type vnode: str
+        :param resources: Dictionary of resource name to amount
+        :type resources: Dictionary
+        """
+        row = self.rows[vnode]
+        for rsc, value in resources.items():
+            if rsc not in self.avail:
+                continue
+            if isinstance(value, int) or value.isdigit():
+                if self.avail[rsc][row] is not None:
+                    self.avail[rsc][row] -= int(value)
+
+    def snapshot(self, vnode):
+        """
+        Dictionary representation of a node with its current amounts
+        of resources available
+        """
+        row = self.rows[vnode]
+        node = dict(self.attributes[row])
+        for r in self.resources:
+            if self.avail[r][row] is not None:
+                node['resources_available.' + r] = self.avail[r][row]
+        return node
+
+    def utilization(self, entity=None):
+        """
+        Utilization of the resources, see Server.utilization
+
+        :param entity: An optional dictionary of entities to
+                       compute utilization of
+        :type entity: Dictionary
+        :returns: Dictionary of resource name to [assigned, available]
+                  and 'nodes' to [used nodes, schedulable nodes]
+        """
+        rows = [i for i, s in enumerate(self.schedulable) if s]
+        utilization = {}
+        if entity:
+            resassigned = dict([(r, 0) for r in self.resources])
+            nodes_set = set()
+            for job, requested, exec_host in self.jobs:
+                for k, v in entity.items():
+                    if k not in job or job[k] != v:
+                        break
+                else:
+                    for r, amt in requested.items():
+                        if amt is not None:
+                            resassigned[r] += amt
+                    if exec_host is not None:
+                        nodes_set.update(ResourceResv.get_hosts(exec_host))
+            usednodes = len([i for i in rows if self.ids[i] in nodes_set])
+        else:
+            resassigned = {}
+            usednodes = len([i for i in rows if self.has_jobs[i]])
+        for r in self.resources:
+            avail = self.avail[r]
+            resavail = sum([avail[i] for i in rows if avail[i] is not None])
+            if not entity:
+                assigned = self.assigned[r]
+                resassigned[r] = sum([assigned[i] for i in rows
+                                      if avail[i] is not None and
+                                      assigned[i] is not None])
+            if resavail > 0:
+                utilization[r] = [resassigned[r], resavail]
+        utilization['nodes'] = [usednodes, len(rows)]
+        return utilization
+
+
 class Holidays():
     """
     Descriptive calss for Holiday file.
@@ -69,7 +69,10 @@ class PBSObject(object):
 
     update_attributes: the default on whether Object attributes
     should be updated using a list of dictionaries. Defaults
-    to True
+    to True, set to ``PTL_LAZY`` to update them on first access
+
+    log_index: whether log_match reads the logs incrementally and
+    searches them from memory. Defaults to True
 
     :param name: The name associated to the object
     :type name: str
@@ -89,6 +92,7 @@ class PBSObject(object):
         'max_attempts': 60,
         'attempt_interval': 0.5,
         'update_attributes': True,
+        'log_index': True,
     }
 
     def __init__(self, name, attrs={}, defaults={}):
@@ -107,12 +111,26 @@ class PBSObject(object):
         Set update attributes
         """
         cls.logger.info('setting update attributes ' + str(val))
-        if val or (val.isdigit() and int(val) == 1) or val[0] in ('t', 'T'):
+        if val == PTL_LAZY:
+            val = PTL_LAZY
+        elif val is True or val in ('1', 'True', 'true', 't', 'T'):
             val = True
         else:
             val = False
         cls.ptl_conf['update_attributes'] = val
 
+    @classmethod
+    def set_log_index(cls, val):
+        """
+        Set log index
+        """
+        cls.logger.info('setting log index ' + str(val))
+        if val is True or val in ('1', 'True', 'true', 't', 'T'):
+            val = True
+        else:
+            val = False
+        cls.ptl_conf['log_index'] = val
+
     @classmethod
     def set_max_attempts(cls, val):
         """
@@ -43,6 +43,7 @@ import base64
 import copy
 import datetime
 import grp
+import heapq
 import json
 import logging
 import os
@@ -77,7 +78,8 @@ from ptl.lib.ptl_error import (PbsStatusError, PbsSubmitError,
 from ptl.lib.ptl_types import PbsAttribute
 from ptl.lib.ptl_constants import *
 from ptl.lib.ptl_entities import (Hook, Queue, Entity, Limit,
-                                  EquivClass, Resource)
+                                  EquivClass, EquivClassIndex,
+                                  NodeResourceMatrix, Resource)
 from ptl.lib.ptl_sched import Scheduler
 from ptl.lib.ptl_mom import MoM, get_mom_obj
 from ptl.lib.ptl_service import PBSService, PBSInitServices
@@ -448,7 +450,7 @@ class Server(Wrappers):
             if len(hooks) > 0:
                 self.manager(MGR_CMD_SET, MGR_OBJ_HOOK, a, hooks)
         if revertqueues:
-            self.status(QUEUE, level=logging.DEBUG)
+            self.status(QUEUE, level=logging.DEBUG, objects=True)
             queues = []
             for (qname, qobj) in self.queues.items():
                 # skip reservation queues. This syntax for Python 2.4
@@ -1294,11 +1296,13 @@ class Server(Wrappers):
             pass
         st = time.time()
         if len(job_ids) > 100:
-            for host, pids in host_pid_map.items():
+            def _kill(host):
+                pids = host_pid_map[host]
                 chunks = [pids[i:i + 5000] for i in range(0, len(pids), 5000)]
                 for chunk in chunks:
                     self.du.run_cmd(host, ['kill', '-9'] + chunk,
                                     runas=ROOT_USER, logerr=False)
+            self.du.foreach_host(list(host_pid_map), _kill)
             if running_jobs:
                 last_running_job = running_jobs[-1]
                 _msg = last_running_job + ';'
@@ -1406,6 +1410,25 @@ class Server(Wrappers):
                            ``{'dbname':...,'user':...,'port':...}``
         :type db_access: str or dictionary
         """
+        index = self.equivalence_class_index(obj_type, attrib, bslist, op,
+                                             show_zero_resources, db_access,
+                                             resolve_indirectness)
+        if index is None:
+            return {}
+        return index.classes()
+
+    def equivalence_class_index(self, obj_type=None, attrib={}, bslist=None,
+                                op=RESOURCES_AVAILABLE,
+                                show_zero_resources=True, db_access=None,
+                                resolve_indirectness=False):
+        """
+        Build an index of equivalence classes, that can be updated
+        with the objects that changed and reports class counts and
+        resource totals without querying the objects again. See
+        equivalence_classes for the description of the parameters
+
+        :returns: EquivClassIndex or None if there is nothing to index
+        """
 
         if attrib is None:
             attrib = {}
@@ -1420,83 +1443,33 @@ class Server(Wrappers):
             elif obj_type == RESV:
                 attrib = ['Resource_List.select']
             else:
-                return {}
+                return None
 
+        if isinstance(attrib, str):
+            attrib = attrib.split(',')
+
+        index = EquivClassIndex(attrib, op, show_zero_resources)
         if bslist is None and obj_type is not None:
-            # To get the resources_assigned we must stat the entire object so
-            # bypass the specific attributes that would filter out assigned
+            # To get the resources_assigned, query them along with the
+            # resources_available they go with
             if op == RESOURCES_AVAILABLE:
-                bslist = self.status(obj_type, None, level=logging.DEBUG,
-                                     db_access=db_access,
-                                     resolve_indirectness=resolve_indirectness)
-            else:
-                bslist = self.status(obj_type, attrib, level=logging.DEBUG,
-                                     db_access=db_access,
-                                     resolve_indirectness=resolve_indirectness)
+                attrib = list(attrib) + index.assigned_attribs()
+            bslist = self.status(obj_type, attrib, level=logging.DEBUG,
+                                 db_access=db_access,
+                                 resolve_indirectness=resolve_indirectness,
+                                 objects=False)
 
         if bslist is None or len(bslist) == 0:
-            return {}
+            return None
 
         # automatically convert an objectlist into a batch status dict list
         # for ease of use.
         if not isinstance(bslist[0], dict):
             bslist = self.utils.objlist_to_dictlist(bslist)
 
-        if isinstance(attrib, str):
-            attrib = attrib.split(',')
-
         self.logger.debug("building equivalence class")
-        equiv = {}
-        for bs in bslist:
-            cls = ()
-            skip_cls = False
-            # attrs will be part of the EquivClass object
-            attrs = {}
-            # Filter the batch attributes by the attribs requested
-            for a in attrib:
-                if a in bs:
-                    amt = PbsAttribute.decode_value(bs[a])
-                    if a.startswith('resources_available.'):
-                        val = a.replace('resources_available.', '')
-                        if (op == RESOURCES_AVAILABLE and
-                                'resources_assigned.' + val in bs):
-                            amt = (int(amt) - int(PbsAttribute.decode_value(
-                                   bs['resources_assigned.' + val])))
-                        # this case where amt goes negative is not a bug, it
-                        # may happen when computing whats_available due to the
-                        # fact that the computation is subtractive, it does
-                        # add back resources when jobs/reservations end but
-                        # is only concerned with what is available now for
-                        # a given duration, that is why in the case where
-                        # amount goes negative we set it to 0
-                        if amt < 0:
-                            amt = 0
-
-                        # TODO: not a failproof way to catch a memory type
-                        # but PbsTypeSize should return the right value if
-                        # it fails to parse it as a valid memory value
-                        if a.endswith('mem'):
-                            try:
-                                amt = PbsTypeSize().encode(amt)
-                            except Exception:
-                                # we guessed the type incorrectly
-                                pass
-                    else:
-                        val = a
-                    if amt == 0 and not show_zero_resources:
-                        skip_cls = True
-                        break
-                    # Build the key of the equivalence class
-                    cls += (val + '=' + str(amt),)
-                    attrs[val] = amt
-            # Now that we are done with this object, add it to an equiv class
-            if len(cls) > 0 and not skip_cls:
-                if cls in equiv:
-                    equiv[cls].add_entity(bs['id'])
-                else:
-                    equiv[cls] = EquivClass(cls, attrs, [bs['id']])
-
-        return list(equiv.values())
+        index.update(bslist)
+        return index
 
     def show_equivalence_classes(self, eq=None, obj_type=None, attrib={},
                                  bslist=None, op=RESOURCES_AVAILABLE,
@@ -1542,100 +1515,76 @@ class Server(Wrappers):
                       'resources_available.mem', 'state']
 
         if resvs is None:
-            self.status(RESV)
+            self.status(RESV, objects=True)
             resvs = self.reservations
 
         if jobs is None:
-            self.status(JOB)
+            self.status(JOB, objects=True)
             jobs = self.jobs
 
         if nodes is None:
-            self.status(NODE)
+            self.status(NODE, objects=True)
             nodes = self.nodes
 
         nodes_id = list(nodes.keys())
         avail_nodes_by_time = {}
-
-        def alloc_resource(self, node, resources):
-            # helper function. Must work on a scratch copy of nodes otherwise
-            # resources_available will get corrupted
-            for rsc, value in resources.items():
-                if isinstance(value, int) or value.isdigit():
-                    avail = node.attributes['resources_available.' + rsc]
-                    nvalue = int(avail) - int(value)
-                    node.attributes['resources_available.' + rsc] = nvalue
+        rescs = [a.replace('resources_available.', '') for a in attrib
+                 if a.startswith('resources_available.')]
+        # Allocations are made on a matrix of the nodes' resources, the
+        # nodes themselves are left untouched
+        matrix = NodeResourceMatrix(nodes, rescs)
+
+        def alloc_resource(tm, n, resc):
+            if tm not in avail_nodes_by_time:
+                avail_nodes_by_time[tm] = []
+            avail_nodes_by_time[tm].append(matrix.snapshot(n))
+            if nodes[n].attributes['sharing'] in ('default_excl',
+                                                  'force_excl'):
+                nodes_id.remove(n)
+            else:
+                matrix.allocate(n, resc)
 
         # Account for reservations
         for resv in resvs.values():
-            resvnodes = resv.execvnode('resv_nodes')
-            if resvnodes:
+            if 'resv_nodes' in resv.attributes:
                 starttime = self.utils.convert_stime_to_seconds(
                     resv.attributes['reserve_start'])
-                for node in resvnodes:
+                tm = int(starttime) - int(self.ctime)
+                for node in matrix.parse_exec_vnode(
+                        resv.attributes['resv_nodes']):
                     for n, resc in node.items():
-                        tm = int(starttime) - int(self.ctime)
                         if tm < 0 or n not in nodes_id:
                             continue
-                        if tm not in avail_nodes_by_time:
-                            avail_nodes_by_time[tm] = []
-                        if nodes[n].attributes['sharing'] in ('default_excl',
-                                                              'force_excl'):
-                            avail_nodes_by_time[tm].append(nodes[n])
-                            try:
-                                nodes_id.remove(n)
-                            except Exception:
-                                pass
-                        else:
-                            ncopy = copy.copy(nodes[n])
-                            ncopy.attributes = copy.deepcopy(
-                                nodes[n].attributes)
-                            avail_nodes_by_time[tm].append(ncopy)
-                            self.alloc_resource(nodes[n], resc)
+                        alloc_resource(tm, n, resc)
 
         # go on to look at the calendar of scheduled jobs to run and set
         # the node availability according to when the job is estimated to
         # start on the node
-        for job in self.jobs.values():
+        for job in jobs.values():
             if (job.attributes['job_state'] != 'R' and
                     'estimated.exec_vnode' in job.attributes):
-                estimatednodes = job.execvnode('estimated.exec_vnode')
-                if estimatednodes:
-                    st = job.attributes['estimated.start_time']
-                    # Tweak for nas format of estimated time that has
-                    # num seconds from epoch followed by datetime
-                    if st.split()[0].isdigit():
-                        starttime = st.split()[0]
-                    else:
-                        starttime = self.utils.convert_stime_to_seconds(st)
-                    for node in estimatednodes:
-                        for n, resc in node.items():
-                            tm = int(starttime) - int(self.ctime)
-                            if (tm < 0 or n not in nodes_id or
-                                    nodes[n].state != 'free'):
-                                continue
-                            if tm not in avail_nodes_by_time:
-                                avail_nodes_by_time[tm] = []
-                            if (nodes[n].attributes['sharing'] in
-                                    ('default_excl', 'force_excl')):
-                                avail_nodes_by_time[tm].append(nodes[n])
-                                try:
-                                    nodes_id.remove(n)
-                                except Exception:
-                                    pass
-                            else:
-                                ncopy = copy.copy(nodes[n])
-                                ncopy.attributes = copy.deepcopy(
-                                    nodes[n].attributes)
-                                avail_nodes_by_time[tm].append(ncopy)
-                                self.alloc_resource(nodes[n], resc)
+                st = job.attributes['estimated.start_time']
+                # Tweak for nas format of estimated time that has
+                # num seconds from epoch followed by datetime
+                if st.split()[0].isdigit():
+                    starttime = st.split()[0]
+                else:
+                    starttime = self.utils.convert_stime_to_seconds(st)
+                tm = int(starttime) - int(self.ctime)
+                for node in matrix.parse_exec_vnode(
+                        job.attributes['estimated.exec_vnode']):
+                    for n, resc in node.items():
+                        if (tm < 0 or n not in nodes_id or
+                                nodes[n].state != 'free'):
+                            continue
+                        alloc_resource(tm, n, resc)
 
         # remaining nodes are free "forever"
         for node in nodes_id:
-            if self.nodes[node].state == 'free':
+            if nodes[node].state == 'free':
                 if 'infinity' not in avail_nodes_by_time:
-                    avail_nodes_by_time['infinity'] = [nodes[node]]
-                else:
-                    avail_nodes_by_time['infinity'].append(nodes[node])
+                    avail_nodes_by_time['infinity'] = []
+                avail_nodes_by_time['infinity'].append(matrix.snapshot(node))
 
         # if there is a dedicated time, move the availaility time up to that
         # time as necessary
@@ -1690,7 +1639,8 @@ class Server(Wrappers):
             for eq_cl in eq_classes:
                 print(("%24s\t%s" % (str(k), str(eq_cl))))
 
-    def utilization(self, resources=None, nodes=None, jobs=None, entity={}):
+    def utilization(self, resources=None, nodes=None, jobs=None, entity={},
+                    matrix=None):
         """
         Return utilization of consumable resources on a set of
         nodes
@@ -1707,100 +1657,33 @@ class Server(Wrappers):
                        compute utilization of,
                        ``e.g. {'user':u1, 'group':g1, 'project'=p1}``
         :type entity: Dictionary
+        :param matrix: Optional, a NodeResourceMatrix built with
+                       the jobs and resources, to compute utilization
+                       from instead of nodes and jobs, e.g. to
+                       compute the utilization of many entities
+        :type matrix: NodeResourceMatrix
         The utilization is returned as a dictionary of percentage
         utilization for each resource.
         Non-consumable resources are silently ignored.
         """
-        if nodes is None:
-            nodes = self.status(NODE)
-
-        if jobs is None:
-            jobs = self.status(JOB)
+        if matrix is None:
+            if nodes is None:
+                nodes = self.status(NODE, objects=False)
 
-        if resources is None:
-            rescs = ['ncpus', 'mem']
-        else:
-            rescs = resources
-
-        utilization = {}
-        resavail = {}
-        resassigned = {}
-        usednodes = 0
-        totnodes = 0
-        nodes_set = set()
-
-        for res in rescs:
-            resavail[res] = 0
-            resassigned[res] = 0
-
-        # If an entity is specified utilization must be collected from the
-        # Jobs usage, otherwise we can get the information directly from
-        # the nodes.
-        if len(entity) > 0 and jobs is not None:
-            for job in jobs:
-                if 'job_state' in job and job['job_state'] != 'R':
-                    continue
-                entity_match = True
-                for k, v in entity.items():
-                    if k not in job or job[k] != v:
-                        entity_match = False
-                        break
-                if entity_match:
-                    for res in rescs:
-                        r = 'Resource_List.' + res
-                        if r in job:
-                            tmpr = int(PbsAttribute.decode_value(job[r]))
-                            resassigned[res] += tmpr
-                    if 'exec_host' in job:
-                        hosts = ResourceResv.get_hosts(job['exec_host'])
-                        nodes_set |= set(hosts)
-
-        for node in nodes:
-            # skip nodes in non-schedulable state
-            nstate = node['state']
-            if ('down' in nstate or 'unavailable' in nstate or
-                    'unknown' in nstate or 'Stale' in nstate):
-                continue
+            # Jobs are only needed to compute the utilization of an entity
+            if len(entity) > 0:
+                if jobs is None:
+                    jobs = self.status(JOB, objects=False)
+            else:
+                jobs = None
 
-            totnodes += 1
+            matrix = NodeResourceMatrix(nodes, resources, jobs)
 
-            # If an entity utilization was requested, all used nodes were
-            # already filtered into the nodes_set specific to that entity, we
-            # simply add them up. If no entity was requested, it suffices to
-            # have the node have a jobs attribute to count it towards total
-            # used nodes
-            if len(entity) > 0:
-                if node['id'] in nodes_set:
-                    usednodes += 1
-            elif 'jobs' in node:
-                usednodes += 1
-
-            for res in rescs:
-                avail = 'resources_available.' + res
-                if avail in node:
-                    val = PbsAttribute.decode_value(node[avail])
-                    if isinstance(val, int):
-                        resavail[res] += val
-
-                        # When entity matching all resources assigned are
-                        # accounted for by the job usage
-                        if len(entity) == 0:
-                            assigned = 'resources_assigned.' + res
-                            if assigned in node:
-                                val = PbsAttribute.decode_value(
-                                    node[assigned])
-                                if isinstance(val, int):
-                                    resassigned[res] += val
-
-        for res in rescs:
-            if res in resavail:
-                if res in resassigned:
-                    if resavail[res] > 0:
-                        utilization[res] = [resassigned[res], resavail[res]]
+        utilization = matrix.utilization(entity)
 
         # Only report nodes utilization if no specific resources were requested
-        if resources is None:
-            utilization['nodes'] = [usednodes, totnodes]
+        if resources is not None:
+            del utilization['nodes']
 
         return utilization
 
@@ -2157,7 +2040,8 @@ class Server(Wrappers):
                                  % (ret['err']))
 
     def evaluate_formula(self, jobid=None, formula=None, full=True,
-                         include_running_jobs=False, exclude_subjobs=True):
+                         include_running_jobs=False, exclude_subjobs=True,
+                         top=None):
         """
         Evaluate the job sort formula
         :param jobid: If set, evaluate the formula for the given
@@ -2186,6 +2070,14 @@ class Server(Wrappers):
         :param exclude_subjobs: If True, only report formula of
                                 parent job array
         :type exclude_subjobs: bool
+        :param top: If set, only return the top jobs with the
+                    highest formula values, ordered from highest
+                    to lowest
+        :type top: int or None
+
+        .. note:: The formula is compiled once, queue priorities
+                  are queried once for all queues and the fairshare
+                  tree is queried once for all entities.
         """
         _f_builtins = ['queue_priority', 'job_priority', 'eligible_time',
                        'fair_share_perc']
@@ -2196,31 +2088,62 @@ class Server(Wrappers):
             else:
                 return None
 
-        template_formula = self.utils._make_template_formula(formula)
+        template_formula = string.Template(
+            self.utils._make_template_formula(formula))
+        try:
+            code = compile(formula.strip(), '<job_sort_formula>', 'eval')
+        except SyntaxError:
+            code = None
         # to split up the formula into keywords, first convert all possible
         # operators into spaces and split the string.
         # TODO: The list of operators may need to be expanded
         T = formula.maketrans('()%+*/-', ' ' * 7)
         fres = formula.translate(T).split()
         if jobid:
-            d = self.status(JOB, id=jobid, extend='t')
+            jobs = self.status(JOB, id=jobid, extend='t',
+                               objects=False)
         else:
-            d = self.status(JOB, extend='t')
+            jobs = self.status(JOB, extend='t', objects=False)
         ret = {}
-        for job in d:
-            if not include_running_jobs and job['job_state'] != 'Q':
-                continue
+        if not include_running_jobs:
+            jobs = [job for job in jobs if job['job_state'] == 'Q']
+        if not jobs:
+            return ret
+
+        qprios = {}
+        if 'queue_priority' in fres:
+            for q in self.status(QUEUE, 'Priority', objects=False):
+                if 'Priority' in q:
+                    qprios[q['id']] = int(q['Priority'])
+        fs_percs = {}
+        entity = None
+        if 'fair_share_perc' in fres:
+            if self.schedulers[self.dflt_sched_name] is None:
+                self.schedulers[self.dflt_sched_name] = Scheduler(
+                    server=self)
+            sched = self.schedulers[self.dflt_sched_name]
+            if 'fairshare_entity' not in sched.sched_config:
+                self.logger.error(self.logprefix +
+                                  ' no fairshare entity in sched config')
+                return ret
+            entity = sched.sched_config['fairshare_entity']
+            try:
+                tree = sched.query_fairshare()
+            except PbsFairshareError:
+                tree = None
+            if tree is not None:
+                for node in tree.nodes.values():
+                    if 'TREEROOT' in node.perc:
+                        fs_percs[node.name] = node.perc['TREEROOT'] / 100
+
+        for job in jobs:
             f_value = {}
             # initialize the formula values to 0
             for res in fres:
                 f_value[res] = 0
             if 'queue_priority' in fres:
-                queue = self.status(JOB, 'queue', id=job['id'])[0]['queue']
-                d = self.status(QUEUE, 'Priority', id=queue)
-                if d and 'Priority' in d[0]:
-                    qprio = int(d[0]['Priority'])
-                    qprio = int(d[0]['Priority'])
-                    f_value['queue_priority'] = qprio
+                if job.get('queue') in qprios:
+                    f_value['queue_priority'] = qprios[job['queue']]
                 else:
                     continue
             if 'job_priority' in fres:
@@ -2233,49 +2156,36 @@ class Server(Wrappers):
                 if 'eligible_time' in job:
                     f_value['eligible_time'] = self.utils.convert_duration(
                         job['eligible_time'])
-            if 'fair_share_perc' in fres:
-                if self.schedulers[self.dflt_sched_name] is None:
-                    self.schedulers[self.dflt_sched_name] = Scheduler(
-                        server=self)
-
-                if 'fairshare_entity' in self.schedulers[
-                    self.dflt_sched_name
-                ].sched_config:
-                    entity = self.schedulers[
-                        self.dflt_sched_name
-                    ].sched_config['fairshare_entity']
-                else:
-                    self.logger.error(self.logprefix +
-                                      ' no fairshare entity in sched config')
-                    continue
+            if entity is not None:
                 if entity not in job:
                     self.logger.error(self.logprefix +
                                       ' job does not have property ' + entity)
                     continue
-                try:
-                    fs_info = self.schedulers[
-                        self.dflt_sched_name
-                    ].query_fairshare(
-                        name=job[entity])
-                    if fs_info is not None and 'TREEROOT' in fs_info.perc:
-                        f_value['fair_share_perc'] = \
-                            (fs_info.perc['TREEROOT'] / 100)
-                except PbsFairshareError:
-                    f_value['fair_share_perc'] = 0
+                f_value['fair_share_perc'] = fs_percs.get(job[entity], 0)
 
             for job_res, val in job.items():
-                val = PbsAttribute.decode_value(val)
                 if job_res.startswith('Resource_List.'):
-                    job_res = job_res.replace('Resource_List.', '')
+                    job_res = job_res[len('Resource_List.'):]
                 if job_res in fres and job_res not in _f_builtins:
-                    f_value[job_res] = val
-            tf = string.Template(template_formula)
-            tfstr = tf.safe_substitute(f_value)
-            if (jobid is not None or not exclude_subjobs or
-                    (exclude_subjobs and not self.utils.is_subjob(job['id']))):
+                    f_value[job_res] = PbsAttribute.decode_value(val)
+            if (jobid is None and exclude_subjobs and
+                    self.utils.is_subjob(job['id'])):
+                continue
+            tfstr = template_formula.safe_substitute(f_value)
+            # Only finite non-negative numbers are sure to evaluate the
+            # same as their string form in the expression, any other value
+            # goes through the substituted expression
+            if code is not None and all(
+                    type(v) in (int, float) and 0 <= v < float('inf')
+                    for v in f_value.values()):
+                ret[job['id']] = (tfstr, eval(code, {}, f_value))
+            else:
                 ret[job['id']] = (tfstr, eval(tfstr))
         if not full and jobid is not None and jobid in ret:
-            return ret[job['id']][1]
+            return ret[jobid][1]
+        if top is not None:
+            ret = dict(heapq.nlargest(top, ret.items(),
+                                      key=lambda x: x[1][1]))
         return ret
 
     def _parse_limits(self, container=None, dictlist=None, id=None,
@@ -2301,7 +2211,7 @@ class Server(Wrappers):
             return {}
 
         if dictlist is None:
-            d = self.status(container, db_access=db_access)
+            d = self.status(container, db_access=db_access, objects=False)
         else:
             d = dictlist
 
@@ -2441,125 +2351,128 @@ class Server(Wrappers):
 
             return tmp
 
-        def calc_usage(jobs, attr, name=None, resource=None):
+        # job attribute identifying the entity of each entity type
+        entity_attr = {'u': 'euser', 'o': 'euser', 'g': 'egroup',
+                       'p': 'project'}
+
+        def usage_key(lim):
             """
-            Calculate the usage for the entity
-            :param attr: Job attribute
-            :param name: Entity name
-            :type name: str or None
-            :param resource: PBS resource
-            :type resource: str or None
-            :returns: The usage
+            Key of the usage a limit is checked against: the queue of a
+            queue limit or None for a server limit, the job attribute
+            of the entity and the resource or None to count jobs
             """
-            usage = {}
-            # initialize usage of the named entity
-            if name is not None and name not in ('PBS_GENERIC', 'PBS_ALL'):
-                usage[name] = 0
+            queue = None
+            if lim.container == QUEUE:
+                queue = lim.container_id
+            return (queue, entity_attr[lim.entity.type], lim.resource or None)
+
+        def aggregate_usage(jobs, keys):
+            """
+            Aggregate the usage of every entity for all usage keys in
+            a single scan of the running jobs
+            :param jobs: list of dictionary representation of jobs
+            :param keys: usage keys, see usage_key
+            :returns: Dictionary of usage key to dictionary of entity
+                      name to usage
+            """
+            usage = dict([(k, {}) for k in keys])
+            queue_keys = {}
+            for k in keys:
+                queue_keys.setdefault(k[0], []).append(k)
+            resources = set([k[2] for k in keys if k[2]])
+            # only the jobs of the requested entity are accounted for
+            filter_attr = None
+            if ename is not None and etype in ('u', 'g', 'p'):
+                filter_attr = entity_attr[etype]
             for j in jobs:
-                entity = j[attr]
-                if entity not in usage:
-                    if resource:
-                        usage[entity] = int(
-                            PbsAttribute.decode_value(
-                                j['Resource_List.' + resource]))
-                    else:
-                        usage[entity] = 1
-                else:
-                    if resource:
-                        usage[entity] += int(
-                            PbsAttribute.decode_value(
-                                j['Resource_List.' + resource]))
-                    else:
-                        usage[entity] += 1
+                if (j.get('job_state') != 'R' or
+                        str(j.get('substate')) != '42'):
+                    continue
+                if ('euser' not in j or 'egroup' not in j or
+                        'project' not in j):
+                    continue
+                if filter_attr is not None and j[filter_attr] != ename:
+                    continue
+                # amount each usage key is incremented by, jobs that do
+                # not request a resource do not count against its limits
+                amounts = {None: 1}
+                for r in resources:
+                    val = j.get('Resource_List.' + r)
+                    if val is None:
+                        continue
+                    amt = PbsAttribute.decode_value(val)
+                    if isinstance(amt, (int, float)) and amt > 0:
+                        amounts[r] = int(amt)
+                jkeys = queue_keys.get(None, [])
+                if j.get('queue') is not None:
+                    jkeys = jkeys + queue_keys.get(j['queue'], [])
+                for k in jkeys:
+                    if k[2] not in amounts:
+                        continue
+                    u = usage[k]
+                    name = j[k[1]]
+                    u[name] = u.get(name, 0) + amounts[k[2]]
             return usage
 
         self.parse_all_limits(server, queues, db_access)
         entities_p = self.entities.values()
 
-        linfo = []
-        cache = {}
-
-        if jobs is None:
-            jobs = self.status(JOB)
-
+        limits = []
         for entity in sorted(entities_p, key=lambda e: e.name):
             for lim in entity.limits:
-                _t = entity.type
                 # skip non-matching entity types. We can't skip the entity
                 # name due to proper handling of the PBS_GENERIC limits
                 # we also can't skip overall limits
-                if (_t != 'o') and (etype is not None and etype != _t):
+                if ((entity.type != 'o') and
+                        (etype is not None and etype != entity.type)):
                     continue
+                limits.append((entity, lim, usage_key(lim)))
 
-                _n = entity.name
-
-                a = {}
-                if lim.container == QUEUE and lim.container_id is not None:
-                    a['queue'] = (EQ, lim.container_id)
+        if jobs is None:
+            attribs = ['queue', 'job_state', 'substate', 'euser', 'egroup',
+                       'project']
+            for _, lim, _ in limits:
                 if lim.resource:
-                    resource = 'Resource_List.' + lim.resource
-                    a[resource] = (GT, 0)
-                a['job_state'] = (EQ, 'R')
-                a['substate'] = (EQ, 42)
-                if etype == 'u' and ename is not None:
-                    a['euser'] = (EQ, ename)
-                else:
-                    a['euser'] = (SET, '')
-                if etype == 'g' and ename is not None:
-                    a['egroup'] = (EQ, ename)
-                else:
-                    a['egroup'] = (SET, '')
-                if etype == 'p' and ename is not None:
-                    a['project'] = (EQ, ename)
-                else:
-                    a['project'] = (SET, '')
-
-                # optimization: cache filtered results
-                d = None
-                for v in cache.keys():
-                    if cmp(a, eval(v)) == 0:
-                        d = cache[v]
-                        break
-                if d is None:
-                    d = self.filter(JOB, a, bslist=jobs, attrop=PTL_AND,
-                                    idonly=False, db_access=db_access)
-                    cache[str(a)] = d
-                if not d or 'job_state=R' not in d:
-                    # in the absence of jobs, display limits defined with usage
-                    # of 0
-                    if ename is not None:
-                        _u = {ename: 0}
-                    else:
-                        _u = {_n: 0}
+                    attribs.append('Resource_List.' + lim.resource)
+            jobs = self.status(JOB, attribs, db_access=db_access,
+                               objects=False)
+
+        usage = aggregate_usage(jobs, set([k for _, _, k in limits]))
+
+        linfo = []
+        for entity, lim, key in limits:
+            _t = entity.type
+            _n = entity.name
+            if not usage[key]:
+                # in the absence of jobs, display limits defined with usage
+                # of 0
+                if ename is not None:
+                    _u = {ename: 0}
                 else:
-                    if _t in ('u', 'o'):
-                        _u = calc_usage(
-                            d['job_state=R'], 'euser', _n, lim.resource)
-                        # an overall limit applies across all running jobs
-                        if _t == 'o':
-                            all_used = sum(_u.values())
-                            for k in _u.keys():
-                                _u[k] = all_used
-                    elif _t == 'g':
-                        _u = calc_usage(
-                            d['job_state=R'], 'egroup', _n, lim.resource)
-                    elif _t == 'p':
-                        _u = calc_usage(
-                            d['job_state=R'], 'project', _n, lim.resource)
-
-                for k, used in _u.items():
-                    if not over or (int(used) > int(lim.value)):
-                        if ename is not None and k != ename:
-                            continue
-                        if _n in ('PBS_GENERIC', 'PBS_ALL'):
-                            if k not in ('PBS_GENERIC', 'PBS_ALL'):
-                                k += '/' + _n
-                        elif _n != k:
-                            continue
-                        tmp_linfo = create_linfo(lim, _t, k, used)
-                        linfo.append(tmp_linfo)
-                del a
-        del cache
+                    _u = {_n: 0}
+            else:
+                _u = {}
+                # initialize usage of the named entity
+                if _n not in ('PBS_GENERIC', 'PBS_ALL'):
+                    _u[_n] = 0
+                _u.update(usage[key])
+                # an overall limit applies across all running jobs
+                if _t == 'o':
+                    all_used = sum(_u.values())
+                    for k in _u.keys():
+                        _u[k] = all_used
+
+            for k, used in _u.items():
+                if not over or (int(used) > int(lim.value)):
+                    if ename is not None and k != ename:
+                        continue
+                    if _n in ('PBS_GENERIC', 'PBS_ALL'):
+                        if k not in ('PBS_GENERIC', 'PBS_ALL'):
+                            k += '/' + _n
+                    elif _n != k:
+                        continue
+                    tmp_linfo = create_linfo(lim, _t, k, used)
+                    linfo.append(tmp_linfo)
         return linfo
 
     def __insert_jobs_in_db(self, jobs, hostname=None):
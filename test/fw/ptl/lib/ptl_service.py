@@ -531,6 +531,7 @@ class PBSService(PBSObject):
         self.launcher = None
         self.dyn_created_files = []
         self.saved_config = {}
+        self.log_tailers = {}
 
         PBSObject.__init__(self, name, attrs, defaults)
 
@@ -962,21 +963,7 @@ class PBSService(PBSObject):
                 dayend = time.strftime("%Y%m%d", time.localtime(endtime))
                 firstday_obj = datetime.datetime.strptime(daystart, '%Y%m%d')
                 lastday_obj = datetime.datetime.strptime(dayend, '%Y%m%d')
-                if logtype == 'accounting':
-                    logdir = os.path.join(self.pbs_conf['PBS_HOME'],
-                                          'server_priv', 'accounting')
-                    sudo = True
-                elif ((self.__class__.__name__ == "Scheduler") and
-                        'sched_log' in self.attributes):
-                    # if setup is multi-sched then get logdir from
-                    # its attributes
-                    logdir = self.attributes['sched_log']
-                else:
-                    logval = self._instance_to_logpath(logtype)
-                    if logval is None:
-                        m = 'Invalid logtype'
-                        raise PtlLogMatchError(rv=False, rc=-1, msg=m)
-                    logdir = os.path.join(self.pbs_conf['PBS_HOME'], logval)
+                logdir, sudo = self._get_logdir(logtype)
                 while firstday_obj <= lastday_obj:
                     day = firstday_obj.strftime("%Y%m%d")
                     filename = os.path.join(logdir, day)
@@ -1009,6 +996,125 @@ class PBSService(PBSObject):
 
         return lines
 
+    def _get_logdir(self, logtype):
+        """
+        Return the directory holding the logs of the given logtype, and
+        whether privileges are needed to read them
+
+        :param logtype: The entity requested, an instance of a
+                        Scheduler, Server or MoM object, or the
+                        string 'accounting'
+        :type logtype: str or object
+        :returns: tuple of (log directory, sudo)
+        :raises PtlLogMatchError: if the logtype is invalid
+        """
+        if logtype == 'accounting':
+            return (os.path.join(self.pbs_conf['PBS_HOME'], 'server_priv',
+                                 'accounting'), True)
+        if ((self.__class__.__name__ == "Scheduler") and
+                'sched_log' in self.attributes):
+            # if setup is multi-sched then get logdir from
+            # its attributes
+            return (self.attributes['sched_log'], False)
+        logval = self._instance_to_logpath(logtype)
+        if logval is None:
+            m = 'Invalid logtype'
+            raise PtlLogMatchError(rv=False, rc=-1, msg=m)
+        return (os.path.join(self.pbs_conf['PBS_HOME'], logval), False)
+
+    def log_records(self, logtype, id=None, n=50, tail=True, starttime=None,
+                    endtime=None, host=None):
+        """
+        Return the (timestamp, line) records of a PBS log file, which
+        can be one of ``server``, ``scheduler``, ``MoM``, or
+        ``accounting``. This is the indexed counterpart of log_lines,
+        the log files are read incrementally through a PBSLogTailer
+        per (host, log file) so that only the lines appended since the
+        previous call are transferred. A log file is first read from
+        its end, only as far back as needed, and the lines older than
+        those returned are not kept in memory.
+
+        :param logtype: The entity requested, an instance of a
+                        Scheduler, Server or MoM object, or the
+                        string 'accounting'
+        :type logtype: str or object
+        :param id: If set, only the records of the object with this
+                   id are returned
+        :type id: str or None
+        :param n: One of 'ALL' of the number of lines to
+                  process/display, defaults to 50.
+        :type n: str or int
+        :param tail: if True, parse log from the end to the start,
+                     otherwise parse from the start to the end.
+                     Defaults to True.
+        :type tail: bool
+        :param starttime: date timestamp to start matching
+        :param endtime: date timestamp to end matching
+        :param host: Hostname
+        :type host: str
+        :returns: list of (timestamp, line) tuples or None on error
+        """
+        records = []
+        # lines older than an explicit starttime need not be returned
+        skipbefore = starttime
+        if endtime is None:
+            endtime = time.time()
+        if starttime is None:
+            starttime = self.ctime
+        if host is None:
+            host = self.hostname
+        try:
+            logdir, sudo = self._get_logdir(logtype)
+            daystart = time.strftime("%Y%m%d", time.localtime(starttime))
+            dayend = time.strftime("%Y%m%d", time.localtime(endtime))
+            firstday_obj = datetime.datetime.strptime(daystart, '%Y%m%d')
+            lastday_obj = datetime.datetime.strptime(dayend, '%Y%m%d')
+            while firstday_obj <= lastday_obj:
+                day = firstday_obj.strftime("%Y%m%d")
+                tailer = self._get_log_tailer(os.path.join(logdir, day),
+                                              host, sudo)
+                tailer.update()
+                day_records = tailer.get_records(n=n, tail=tail,
+                                                 starttime=skipbefore, id=id,
+                                                 trim=True)
+                records.extend(day_records)
+                firstday_obj = firstday_obj + datetime.timedelta(days=1)
+                if n == 'ALL':
+                    continue
+                n = n - len(day_records)
+                if n <= 0:
+                    break
+        except (Exception, IOError, PtlLogMatchError):
+            self.logger.error('error in log_records ')
+            self.logger.error(traceback.print_exc())
+            return None
+        return records
+
+    def _get_log_tailer(self, filename, host=None, sudo=False):
+        """
+        Return the PBSLogTailer of a log file, creating it on first use
+
+        :param filename: The path to the log file
+        :type filename: str
+        :param host: The host on which the log file resides
+        :type host: str or None
+        :param sudo: Whether to read the file as a privileged user
+        :type sudo: bool
+        """
+        from ptl.utils.pbs_logutils import PBSLogTailer
+        if host is None:
+            host = self.hostname
+        key = (host, filename)
+        if key not in self.log_tailers:
+            self.log_tailers[key] = PBSLogTailer(filename, host, sudo=sudo)
+        return self.log_tailers[key]
+
+    def clear_log_records(self):
+        """
+        Drop the log lines held in memory by log_records
+        """
+        self.log_tailers = {}
+
     def _log_match(self, logtype, msg, id=None, n=50, tail=True,
                    allmatch=False, regexp=False, max_attempts=None,
                    interval=None, starttime=None, endtime=None,
@@ -1071,6 +1177,10 @@ class PBSService(PBSObject):
 
         .. note:: The matching line number is relative to the record
                   number, not the absolute line number in the file.
+        .. note:: Unless ``log_index`` is disabled in ptl_conf, the
+                  server, scheduler, MoM and accounting logs are
+                  read incrementally and searched from memory, see
+                  log_records.
         """
         try:
             from ptl.utils.pbs_logutils import PBSLogUtils
@@ -1107,14 +1217,28 @@ class PBSService(PBSObject):
                 "%Y/%m/%d %H:%M:%S", time.localtime(endtime))
             infomsg += " - to %s" % endtimestr
         attemptmsg = ' - No match'
+        indexed = self.ptl_conf['log_index'] and logtype != 'tracejob'
         while attempt <= max_attempts:
             if attempt > 1:
                 attemptmsg = ' - attempt ' + str(attempt)
-            lines = self.log_lines(logtype, id, n=n, tail=tail,
-                                   starttime=starttime, endtime=endtime)
-            rv = self.logutils.match_msg(lines, msg, allmatch=allmatch,
-                                         regexp=regexp, starttime=starttime,
-                                         endtime=endtime)
+            if indexed:
+                records = self.log_records(logtype, n=n, tail=tail,
+                                           starttime=starttime,
+                                           endtime=endtime)
+                rv = None
+                if records:
+                    rv = self.logutils.match_records(records, msg,
+                                                     allmatch=allmatch,
+                                                     regexp=regexp,
+                                                     starttime=starttime,
+                                                     endtime=endtime)
+            else:
+                lines = self.log_lines(logtype, id, n=n, tail=tail,
+                                       starttime=starttime, endtime=endtime)
+                rv = self.logutils.match_msg(lines, msg, allmatch=allmatch,
+                                             regexp=regexp,
+                                             starttime=starttime,
+                                             endtime=endtime)
             if not existence:
                 if rv:
                     _msg = infomsg + ' - but exists'
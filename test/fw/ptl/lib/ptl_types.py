@@ -80,6 +80,17 @@ class PbsAttribute(object):
             except ValueError:
                 return False
 
+    # Decoded values of attribute strings, the same few values repeat
+    # across the many objects that are stat'ed and filtered so the
+    # decoding is memoized. The cache is flushed when it reaches
+    # decode_cache_max entries to keep its memory bounded.
+    _decode_cache = {}
+    _decode_hits = 0
+    _decode_misses = 0
+    decode_cache_max = 65536
+    _bool_values = frozenset(['True', 'False', 'true', 'false', 't', 'f',
+                              'T', 'F', 'y', 'n', 'Y', 'N'])
+
     @classmethod
     def decode_value(cls, value):
         """
@@ -90,20 +101,56 @@ class PbsAttribute(object):
         unit such as b,kb,mb,gb then return the converted size to
         kb without the unit
 
+        Decoded string values are memoized, see decode_cache_info()
+
         :param value: attribute/resource value
         :type value: str or int
         :returns: int or float or string
         """
+        if type(value) is not str:
+            if value is None or isinstance(value, collections.Callable):
+                return value
 
-        if value is None or isinstance(value, collections.Callable):
-            return value
+            if isinstance(value, (int, float)):
+                return value
 
-        if isinstance(value, (int, float)):
-            return value
+            if not isinstance(value, str):
+                return cls._decode_str(value)
 
+        try:
+            ret = cls._decode_cache[value]
+        except KeyError:
+            pass
+        else:
+            PbsAttribute._decode_hits += 1
+            return ret
+
+        PbsAttribute._decode_misses += 1
+        ret = cls._decode_str(value)
+        if len(cls._decode_cache) >= cls.decode_cache_max:
+            cls._decode_cache.clear()
+        cls._decode_cache[value] = ret
+        return ret
+
+    @classmethod
+    def _decode_str(cls, value):
+        """
+        Uncached decoding of a string value, see decode_value()
+        """
         if value.isdigit():
             return int(value)
 
+        # booleans are kept as is, no further decoding applies
+        if value in cls._bool_values:
+            return value
+
+        # sizes, such as 10gb or 512b, are never floats nor durations
+        if value[-1:] in ('b', 'B') and value[:1].isdigit():
+            try:
+                return PbsTypeSize(value).value
+            except (ValueError, TypeError):
+                return value
+
         if value.isalpha() or value == '':
             return value
 
@@ -130,6 +177,31 @@ class PbsAttribute(object):
 
         return value
 
+    @classmethod
+    def decode_cache_info(cls):
+        """
+        Statistics of the decode_value() cache
+
+        :returns: Dictionary of the number of cache hits, misses,
+                  the hit rate and the current size of the cache
+        """
+        hits = PbsAttribute._decode_hits
+        misses = PbsAttribute._decode_misses
+        rate = 0.0
+        if hits + misses > 0:
+            rate = float(hits) / (hits + misses)
+        return {'hits': hits, 'misses': misses, 'hit_rate': rate,
+                'size': len(cls._decode_cache)}
+
+    @classmethod
+    def clear_decode_cache(cls):
+        """
+        Empty the decode_value() cache and reset its statistics
+        """
+        cls._decode_cache.clear()
+        PbsAttribute._decode_hits = 0
+        PbsAttribute._decode_misses = 0
+
     @classmethod
     def random_str(cls, length=1, prefix=''):
         """
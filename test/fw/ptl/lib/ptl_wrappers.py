@@ -89,6 +89,7 @@ from ptl.lib.ptl_error import (PbsStatusError, PbsSubmitError,
                                PbsInitServicesError, PbsMessageError,
                                PtlLogMatchError)
 from ptl.lib.ptl_types import PbsAttribute
+from ptl.lib.ptl_batchutils import BatchStatusRecord, LazyObjectDict
 from ptl.lib.ptl_constants import *
 from ptl.lib.ptl_entities import (Hook, Queue, Entity, Limit,
                                   EquivClass, Resource)
@@ -119,6 +120,32 @@ class Wrappers(PBSService):
 
     actions = ExpectActions()
 
+    # watch mode of expect, see _expect_watch
+    expect_watch_types = (JOB, RESV, NODE, VNODE, QUEUE)
+    expect_watch_max_ids = 1000
+    expect_watch_max_backoff = 8
+    expect_watch_tick = 0.5
+    _watch_ops = (EQ, NE, LT, LE, GT, GE, SET, MATCH, MATCH_RE)
+
+    # objects stat'ed through the JSON output of qstat in CLI mode, set
+    # stat_json to False to always parse the text output. Nodes are not,
+    # the JSON output of pbsnodes differs from its text output: it drops
+    # the zero resources_assigned, the slots of the jobs, and reports
+    # unknown nodes as an "Error" object with a zero exit status
+    stat_json = True
+    stat_json_types = (JOB, QUEUE, SERVER)
+
+    # job filters pushed down to qselect in CLI mode, see _filter_select.
+    # Resource comparisons are only pushed down for numeric, size and
+    # duration values that PBS compares the same way as decode_value.
+    # The server has jobs that do not request a resource match its lt
+    # and le comparisons, whereas _filter skips them, so only eq, ge
+    # and gt are pushed down
+    filter_pushdown = True
+    _select_opts = {ATTR_state: '-s', ATTR_queue: '-q', ATTR_N: '-N',
+                    ATTR_project: '-P', ATTR_A: '-A'}
+    _select_ops = {EQ: 'eq', GE: 'ge', GT: 'gt'}
+
     # these server attributes revert back to default value when unset
     __special_attr_keys = {SERVER: [ATTR_scheduling, ATTR_logevents,
                                     ATTR_mailfrom, ATTR_queryother,
@@ -153,10 +180,12 @@ class Wrappers(PBSService):
     def __init__(self, name=None, attrs={}, defaults={}, pbsconf_file=None,
                  snapmap={}, snap=None, client=None, client_pbsconf_file=None,
                  db_access=None, stat=True):
-        self.jobs = {}
-        self.nodes = {}
-        self.reservations = {}
-        self.queues = {}
+        # jobs, nodes, reservations and queues can be created on first
+        # access, see status
+        self.jobs = LazyObjectDict(self.update_attributes)
+        self.nodes = LazyObjectDict(self.update_attributes)
+        self.reservations = LazyObjectDict(self.update_attributes)
+        self.queues = LazyObjectDict(self.update_attributes)
         self.resources = {}
         self.hooks = {}
         self.pbshooks = {}
@@ -370,6 +399,13 @@ class Wrappers(PBSService):
                 idonly=True, grandtotal=False, db_access=None, runas=None,
                 resolve_indirectness=False, level=logging.DEBUG):
 
+        if (bslist is None and self.filter_pushdown and
+                mode == PTL_FILTER and idonly):
+            total = self._filter_select(obj_type, attrib, id, extend, op,
+                                        attrop, db_access, runas, level)
+            if total is not None:
+                return total
+
         if bslist is None:
             try:
                 _a = resolve_indirectness
@@ -496,6 +532,110 @@ class Wrappers(PBSService):
                             total[k] += v
         return total
 
+    def _filter_select(self, obj_type, attrib, id, extend, op, attrop,
+                       db_access, runas, level):
+        """
+        Filter jobs by their ids through qselect instead of stat'ing
+        all jobs, only applies in CLI mode to jobs filtered on an
+        equality of their state, queue, name, project or account
+        and on eq, ge or gt comparisons of numeric resources, which
+        jobs that do not request the resource never satisfy, as in
+        _filter. All criteria have to be satisfied, i.e., a single
+        criterion or PTL_AND.
+
+        :returns: The filtered ids by attribute as _filter does, or
+                  None if the filter can not be pushed down or qselect
+                  failed, in which case the jobs are to be stat'ed.
+        """
+        if (obj_type != JOB or id is not None or db_access is not None or
+                not isinstance(attrib, dict) or len(attrib) == 0 or
+                op == SET or self.get_op_mode() != PTL_CLI):
+            return None
+        if len(attrib) > 1 and attrop != PTL_AND:
+            return None
+        if extend not in (None, 'x'):
+            return None
+
+        keys = []
+        opts = []
+        resources = []
+        for k, v in attrib.items():
+            _op = EQ
+            if isinstance(v, tuple):
+                _op, v = v
+            if v is None or isinstance(v, (list, dict, tuple)):
+                return None
+            val = PbsAttribute.decode_value(v)
+            if k.startswith(ATTR_l + '.'):
+                if (_op not in self._select_ops or
+                        not isinstance(val, (int, float)) or
+                        isinstance(val, bool)):
+                    return None
+                resources.append(k[len(ATTR_l) + 1:] + '.' +
+                                 self._select_ops[_op] + '.' + str(v))
+            elif k in self._select_opts and _op == EQ:
+                v = str(v)
+                if v == '' or ' ' in v or ',' in v:
+                    return None
+                if k == ATTR_state and len(v) != 1:
+                    return None
+                if k == ATTR_queue:
+                    if '@' in v:
+                        return None
+                    if not self._is_local:
+                        v += '@' + self.hostname
+                opts += [self._select_opts[k], v]
+            else:
+                return None
+            keys.append(k + PTL_OP_TO_STR[_op] + str(val))
+
+        pcmd = [os.path.join(self.client_conf['PBS_EXEC'], 'bin', 'qselect')]
+        if extend is not None:
+            pcmd += ['-' + extend]
+        if not self._is_local and ATTR_queue not in attrib:
+            pcmd += ['-q', '@' + self.hostname]
+        pcmd += opts
+        if resources:
+            pcmd += ['-l', ','.join(resources)]
+        if not self.default_client_pbs_conf:
+            pcmd = ['PBS_CONF_FILE=' + self.client_pbs_conf_file] + pcmd
+            as_script = True
+        else:
+            as_script = False
+        ret = self.du.run_cmd(self.client, pcmd, runas=runas,
+                              as_script=as_script, level=level,
+                              logerr=False)
+        if ret['rc'] != 0:
+            return None
+        ids = [j.strip() for j in ret['out'] if j.strip() != '']
+        if not ids:
+            return {}
+        return {k: list(ids) for k in keys}
+
+    def _status_json(self, tgt, pcmd, attrib, obj_type, runas, as_script):
+        """
+        Stat through the JSON output of a qstat or pbsnodes command
+
+        :returns: The dictlist of the objects, or None if the command
+                  failed or its output could not be parsed, in which
+                  case the text output is to be used. JSON stats are
+                  disabled on this object if the output is not JSON.
+        """
+        ret = self.du.run_cmd(tgt, pcmd, runas=runas, as_script=as_script,
+                              level=logging.INFOCLI, logerr=False)
+        if ret['rc'] != 0:
+            return None
+        try:
+            bsl = self.utils.convert_json_to_dictlist(ret['out'], attrib,
+                                                      obj_type=obj_type)
+        except ValueError:
+            self.logger.debug(self.logprefix + 'JSON stat output could '
+                              'not be parsed, using text output')
+            self.stat_json = False
+            return None
+        self.last_rc = ret['rc']
+        return bsl
+
     def _filter_helper(self, bs, k, v, amt, op, mode, total, idonly,
                        grandtotal):
         # default operation to '='
@@ -568,17 +708,28 @@ class Wrappers(PBSService):
             self._conn_timer = None
             self._conn = None
 
-    def update_attributes(self, obj_type, bs, overwrite=False):
+    def update_attributes(self, obj_type, bs, overwrite=False, lazy=False):
         """
         Populate objects from batch status data
+
+        :param lazy: If True, jobs, nodes, queues and reservations
+                     that do not exist yet are only created when first
+                     accessed
+        :type lazy: bool
         """
         if bs is None:
             return
 
+        cache = None
+        if lazy:
+            cache = self._object_cache(obj_type)
+
         for binfo in bs:
             if 'id' not in binfo:
                 continue
             id = binfo['id']
+            if cache is not None and cache.defer(obj_type, binfo, overwrite):
+                continue
             obj = None
             if obj_type == JOB:
                 if ATTR_owner in binfo:
@@ -587,7 +738,7 @@ class Wrappers(PBSService):
                     user = None
                 if id in self.jobs:
                     if overwrite:
-                        self.jobs[id].attributes = copy.deepcopy(binfo)
+                        self.jobs[id].attributes = BatchStatusRecord(binfo)
                     else:
                         self.jobs[id].attributes.update(binfo)
                     if self.jobs[id].username != user:
@@ -598,7 +749,7 @@ class Wrappers(PBSService):
             elif obj_type in (VNODE, NODE):
                 if id in self.nodes:
                     if overwrite:
-                        self.nodes[id].attributes = copy.deepcopy(binfo)
+                        self.nodes[id].attributes = BatchStatusRecord(binfo)
                     else:
                         self.nodes[id].attributes.update(binfo)
                 else:
@@ -611,14 +762,14 @@ class Wrappers(PBSService):
                 obj = self.nodes[id]
             elif obj_type == SERVER:
                 if overwrite:
-                    self.attributes = copy.deepcopy(binfo)
+                    self.attributes = BatchStatusRecord(binfo)
                 else:
                     self.attributes.update(binfo)
                 obj = self
             elif obj_type == QUEUE:
                 if id in self.queues:
                     if overwrite:
-                        self.queues[id].attributes = copy.deepcopy(binfo)
+                        self.queues[id].attributes = BatchStatusRecord(binfo)
                     else:
                         self.queues[id].attributes.update(binfo)
                 else:
@@ -627,7 +778,8 @@ class Wrappers(PBSService):
             elif obj_type == RESV:
                 if id in self.reservations:
                     if overwrite:
-                        self.reservations[id].attributes = copy.deepcopy(binfo)
+                        self.reservations[id].attributes = \
+                            BatchStatusRecord(binfo)
                     else:
                         self.reservations[id].attributes.update(binfo)
                 else:
@@ -636,7 +788,7 @@ class Wrappers(PBSService):
             elif obj_type == HOOK:
                 if id in self.hooks:
                     if overwrite:
-                        self.hooks[id].attributes = copy.deepcopy(binfo)
+                        self.hooks[id].attributes = BatchStatusRecord(binfo)
                     else:
                         self.hooks[id].attributes.update(binfo)
                 else:
@@ -645,7 +797,7 @@ class Wrappers(PBSService):
             elif obj_type == PBS_HOOK:
                 if id in self.pbshooks:
                     if overwrite:
-                        self.pbshooks[id].attributes = copy.deepcopy(binfo)
+                        self.pbshooks[id].attributes = BatchStatusRecord(binfo)
                     else:
                         self.pbshooks[id].attributes.update(binfo)
                 else:
@@ -654,7 +806,8 @@ class Wrappers(PBSService):
             elif obj_type == SCHED:
                 if id in self.schedulers:
                     if overwrite:
-                        self.schedulers[id].attributes = copy.deepcopy(binfo)
+                        self.schedulers[id].attributes = \
+                            BatchStatusRecord(binfo)
                     else:
                         self.schedulers[id].attributes.update(binfo)
                     if 'sched_priv' in binfo:
@@ -681,7 +834,8 @@ class Wrappers(PBSService):
                                                     id=id,
                                                     sched_priv=spriv)
                     if overwrite:
-                        self.schedulers[id].attributes = copy.deepcopy(binfo)
+                        self.schedulers[id].attributes = \
+                            BatchStatusRecord(binfo)
                     else:
                         self.schedulers[id].attributes.update(binfo)
                 obj = self.schedulers[id]
@@ -689,7 +843,8 @@ class Wrappers(PBSService):
             elif obj_type == RSC:
                 if id in self.resources:
                     if overwrite:
-                        self.resources[id].attributes = copy.deepcopy(binfo)
+                        self.resources[id].attributes = \
+                            BatchStatusRecord(binfo)
                     else:
                         self.resources[id].attributes.update(binfo)
                 else:
@@ -702,9 +857,31 @@ class Wrappers(PBSService):
                     self.resources[id] = Resource(id, rtype, rflag)
 
             if obj is not None:
+                # attributes of objects created off of a batch status are
+                # kept in compact records, see BatchStatusRecord
+                if not isinstance(obj.attributes, BatchStatusRecord):
+                    obj.attributes = BatchStatusRecord(obj.attributes)
+                if (hasattr(obj, 'custom_attrs') and
+                        not isinstance(obj.custom_attrs, BatchStatusRecord)):
+                    obj.custom_attrs = BatchStatusRecord(obj.custom_attrs)
                 self.utils.update_attributes_list(obj)
                 obj.__dict__.update(binfo)
 
+    def _object_cache(self, obj_type):
+        """
+        The dictionary of objects of the given type that can be
+        created on first access, or None
+        """
+        if obj_type == JOB:
+            return self.jobs
+        elif obj_type in (NODE, VNODE):
+            return self.nodes
+        elif obj_type == QUEUE:
+            return self.queues
+        elif obj_type == RESV:
+            return self.reservations
+        return None
+
     def pbs_api_as(self, cmd=None, obj=None, user=None, **kwargs):
         """
         Generic handler to run an ``API`` call impersonating
@@ -856,7 +1033,7 @@ class Wrappers(PBSService):
 
     def status(self, obj_type=SERVER, attrib=None, id=None,
                extend=None, level=logging.INFO, db_access=None, runas=None,
-               resolve_indirectness=False, logerr=True):
+               resolve_indirectness=False, logerr=True, objects=None):
         """
         Stat any PBS object ``[queue, server, node, hook, job,
         resv, sched]``.If the Server is setup from snap input,
@@ -873,8 +1050,11 @@ class Wrappers(PBSService):
                        list, a dictionary.Default is to query all
                        attributes.
         :type attrib: str or list or dictionary
-        :param id: An optional id, the name of the object to status
-        :type id: str
+        :param id: An optional id, the name of the object to status.
+                   Jobs, and in CLI mode queues, nodes and reservations,
+                   can also be given as a list of ids stat'ed at once,
+                   the ids that are unknown are then skipped.
+        :type id: str or list
         :param extend: Optional extension to the IFL call
         :param level: The logging level, defaults to INFO
         :type level: str
@@ -889,6 +1069,13 @@ class Wrappers(PBSService):
         :type resolve_indirectness: bool
         :param logerr: If True (default) logs run_cmd errors
         :type logerr: bool
+        :param objects: How the jobs, nodes, queues and reservations
+                        objects of this server are populated. If True
+                        they are created or updated, if False they are
+                        left untouched, if ``PTL_LAZY`` they are created
+                        on first access. Defaults to the
+                        ``update_attributes`` setting of ptl_conf
+        :type objects: bool or str or None
         In addition to standard IFL stat call, this wrapper handles
         a few cases that aren't implicitly offered by pbs_stat*,
         those are for Hooks,Resources, and a formula evaluation.
@@ -962,6 +1149,7 @@ class Wrappers(PBSService):
         # 6- Stat using PBS CLI commands
         elif self.get_op_mode() == PTL_CLI:
             tgt = self.client
+            ids = id if isinstance(id, list) else [id]
             if obj_type in (JOB, QUEUE, SERVER):
                 pcmd = [os.path.join(
                         self.client_conf['PBS_EXEC'],
@@ -974,16 +1162,17 @@ class Wrappers(PBSService):
                 if obj_type == JOB:
                     pcmd += ['-f']
                     if id:
-                        pcmd += [id]
+                        pcmd += ids
                     else:
                         pcmd += ['@' + self.hostname]
                 elif obj_type == QUEUE:
                     pcmd += ['-Qf']
                     if id:
-                        if '@' not in id:
-                            pcmd += [id + '@' + self.hostname]
-                        else:
-                            pcmd += [id]
+                        for i in ids:
+                            if '@' not in i:
+                                pcmd += [i + '@' + self.hostname]
+                            else:
+                                pcmd += [i]
                     else:
                         pcmd += ['@' + self.hostname]
                 elif obj_type == SERVER:
@@ -998,7 +1187,7 @@ class Wrappers(PBSService):
                 if obj_type == HOST:
                     pcmd += ['-H']
                 if id:
-                    pcmd += [id]
+                    pcmd += ids
                 else:
                     pcmd += ['-a']
             elif obj_type == RESV:
@@ -1006,7 +1195,7 @@ class Wrappers(PBSService):
                                      'pbs_rstat')]
                 pcmd += ['-f']
                 if id:
-                    pcmd += [id]
+                    pcmd += ids
             elif obj_type in (SCHED, PBS_HOOK, HOOK, RSC):
                 try:
                     rc = self.manager(MGR_CMD_LIST, obj_type, attrib, id,
@@ -1043,25 +1232,38 @@ class Wrappers(PBSService):
             # as_script is used to circumvent some shells that will not pass
             # along environment variables when invoking a command through sudo
             if not self.default_client_pbs_conf:
-                pcmd = ['PBS_CONF_FILE=' + self.client_pbs_conf_file] + pcmd
+                envs = ['PBS_CONF_FILE=' + self.client_pbs_conf_file]
                 as_script = True
             elif obj_type == RESV and not self._is_local:
-                pcmd = ['PBS_SERVER=' + self.hostname] + pcmd
+                envs = ['PBS_SERVER=' + self.hostname]
                 as_script = True
             else:
+                envs = []
                 as_script = False
 
-            ret = self.du.run_cmd(tgt, pcmd, runas=runas, as_script=as_script,
-                                  level=logging.INFOCLI, logerr=logerr)
-            o = ret['out']
-            if ret['err'] != ['']:
-                self.last_error = ret['err']
-            self.last_rc = ret['rc']
-            if ret['rc'] != 0:
-                raise PbsStatusError(rc=ret['rc'], rv=[], msg=self.geterrmsg())
+            bsl = None
+            if self.stat_json and obj_type in self.stat_json_types:
+                bsl = self._status_json(tgt, envs + pcmd[:1] +
+                                        ['-F', 'json'] + pcmd[1:], attrib,
+                                        obj_type, runas, as_script)
+
+            # the text output is parsed when the JSON one is not available
+            if bsl is None:
+                ret = self.du.run_cmd(tgt, envs + pcmd, runas=runas,
+                                      as_script=as_script,
+                                      level=logging.INFOCLI, logerr=logerr)
+                o = ret['out']
+                if ret['err'] != ['']:
+                    self.last_error = ret['err']
+                self.last_rc = ret['rc']
+                # with a list of ids, the known ones are still reported
+                if ret['rc'] != 0 and not (isinstance(id, list) and
+                                           ''.join(o).strip()):
+                    raise PbsStatusError(rc=ret['rc'], rv=[],
+                                         msg=self.geterrmsg())
 
-            bsl = self.utils.convert_to_dictlist(
-                o, attrib, mergelines=True, obj_type=obj_type)
+                bsl = self.utils.convert_to_dictlist(
+                    o, attrib, mergelines=True, obj_type=obj_type)
 
         # 7- Stat with impersonation over PBS IFL swig-wrapped API
         elif runas is not None:
@@ -1121,6 +1323,8 @@ class Wrappers(PBSService):
 
             a = self.utils.convert_to_attrl(attribcopy)
             c = self._connect(self.hostname)
+            if isinstance(id, list):
+                id = ','.join(id)
 
             if obj_type == JOB:
                 bs = pbs_statjob(c, id, a, extend)
@@ -1182,7 +1386,10 @@ class Wrappers(PBSService):
 
         # Update each object's dictionary with corresponding attributes and
         # values
-        self.update_attributes(obj_type, bsl)
+        if objects is None:
+            objects = self.ptl_conf['update_attributes']
+        if objects or self._object_cache(obj_type) is None:
+            self.update_attributes(obj_type, bsl, lazy=(objects == PTL_LAZY))
 
         # Hook stat is done through CLI, no need to free the batch_status
         if (not isinstance(bs, list) and freebs and
@@ -1236,7 +1443,8 @@ class Wrappers(PBSService):
     def expect(self, obj_type, attrib=None, id=None, op=EQ, attrop=PTL_AND,
                attempt=0, max_attempts=None, interval=None, count=None,
                extend=None, offset=0, runas=None, level=logging.INFO,
-               msg=None, trigger_sched_cycle=True):
+               msg=None, trigger_sched_cycle=True, watch=False,
+               watch_logs=False):
         """
         expect an attribute to match a given value as per an
         operation.
@@ -1277,6 +1485,14 @@ class Wrappers(PBSService):
         :param trigger_sched_cycle: True by default can be set to False if
                           kicksched_action is not supposed to be called
         :type trigger_sched_cycle: Boolean
+        :param watch: If True, poll only the objects that do not match
+                      yet, backing off while nothing changes. id may
+                      then be a list of ids. See _expect_watch.
+        :type watch: bool
+        :param watch_logs: In watch mode, also follow the server log
+                           and poll again as soon as one of the
+                           watched objects is logged about
+        :type watch_logs: bool
         :returns: True if attributes are as expected
         :raises: PtlExpectError if attributes are not as expected
         """
@@ -1330,6 +1546,12 @@ class Wrappers(PBSService):
                 attrop = PTL_AND
             del add_attribs, substate
 
+        if watch and attempt == 0 and self._can_watch(obj_type, attrib, op):
+            return self._expect_watch(obj_type, attrib, id, op, attrop,
+                                      max_attempts, interval, count, extend,
+                                      runas, level, watch_logs,
+                                      trigger_sched_cycle)
+
         prefix = 'expect on ' + self.logprefix
         msg = []
         attrs_to_ignore = []
@@ -1543,6 +1765,281 @@ class Wrappers(PBSService):
         self.logger.log(level, prefix + " ".join(msg) + ' ...  OK')
         return True
 
+    def _can_watch(self, obj_type, attrib, op):
+        """
+        Whether an expect on these attributes can be run in watch mode.
+        Callables, UNSET and version checks are left to the polling
+        implementation of expect.
+        """
+        if obj_type not in self.expect_watch_types:
+            return False
+        if op == UNSET or not attrib or ATTR_version in attrib:
+            return False
+        for v in attrib.values():
+            if isinstance(v, tuple):
+                if v[0] not in self._watch_ops or len(v) > 2:
+                    return False
+                v = v[1]
+            elif op not in self._watch_ops:
+                return False
+            if callable(v):
+                return False
+        return True
+
+    @staticmethod
+    def _watch_compare(op, got, val):
+        """
+        Compare a decoded attribute value to an expected one
+        """
+        if op == SET:
+            return True
+        got = PbsAttribute.decode_value(got)
+        val = PbsAttribute.decode_value(str(val))
+        try:
+            if op == EQ:
+                return got == val
+            elif op == NE:
+                return got != val
+            elif op == LT:
+                return got < val
+            elif op == LE:
+                return got <= val
+            elif op == GT:
+                return got > val
+            elif op == GE:
+                return got >= val
+            elif op == MATCH_RE:
+                return re.search(str(val), str(got)) is not None
+            elif op == MATCH:
+                return str(got).find(str(val)) != -1
+        except TypeError:
+            pass
+        return False
+
+    def _watch_match(self, bs, attrib, op, attrop):
+        """
+        Whether a batch status matches the attributes of a watch
+        """
+        rv = []
+        for k, v in attrib.items():
+            _op = op
+            if isinstance(v, tuple):
+                (_op, v) = v
+            rv.append(k in bs and self._watch_compare(_op, bs[k], v))
+        if attrop == PTL_OR:
+            return any(rv)
+        return all(rv)
+
+    def _watch_sleep(self, wait, tailer, pending):
+        """
+        Sleep for wait seconds, or less if a tailer is given and one of
+        the pending ids, all ids if pending is None, shows up in the
+        lines appended to its log file.
+        """
+        if tailer is None:
+            time.sleep(wait)
+            return
+        end = time.time() + wait
+        while True:
+            tailer.update()
+            if tailer.new_ids and (pending is None or
+                                   not tailer.new_ids.isdisjoint(pending)):
+                return
+            remaining = end - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, self.expect_watch_tick))
+
+    def _watch_status(self, obj_type, attrib, ids, extend, runas):
+        """
+        Stat the objects of the given ids for _expect_watch, in as few
+        calls as possible: up to expect_watch_max_ids ids are given to
+        each qstat, pbsnodes or pbs_rstat command in CLI mode, and to
+        each pbs_statjob or pbs_statque call over the API, where other
+        objects are stat'ed one by one. A batch in error, e.g. over the
+        API because one of its objects is gone, is stat'ed one by one.
+        Objects that cannot be stat'ed are skipped.
+        """
+        ids = sorted(ids)
+        if obj_type in self.snapmap:
+            batches = [[i] for i in ids]
+        elif self.get_op_mode() == PTL_CLI or (obj_type in (JOB, QUEUE) and
+                                               runas is None):
+            n = self.expect_watch_max_ids
+            batches = [ids[i:i + n] for i in range(0, len(ids), n)]
+        else:
+            batches = [[i] for i in ids]
+        bsl = []
+        for batch in batches:
+            try:
+                bsl += self.status(obj_type, attrib, id=batch, extend=extend,
+                                   runas=runas, level=logging.DEBUG,
+                                   logerr=False)
+                continue
+            except PbsStatusError:
+                if len(batch) == 1:
+                    continue
+            for i in batch:
+                try:
+                    bsl += self.status(obj_type, attrib, id=i, extend=extend,
+                                       runas=runas, level=logging.DEBUG,
+                                       logerr=False)
+                except PbsStatusError:
+                    pass
+        return bsl
+
+    def _expect_watch(self, obj_type, attrib, id, op, attrop, max_attempts,
+                      interval, count, extend, runas, level, watch_logs,
+                      trigger_sched_cycle=True):
+        """
+        Watch mode of expect, attributes are expected the same way as
+        expect does, but instead of re-querying every object at each
+        attempt:
+
+        - objects that match are retired and no longer queried, so
+          that each round only stats the objects that are left, in
+          batches of ids, see _watch_status. Without ids, the first
+          round stats all the objects, of which the ones left are
+          then watched. In count mode, e.g. {'job_state=F': 100}, an
+          object that
+          matched all the counted attributes keeps being counted
+          without being queried again, this assumes that the state
+          watched for is final (e.g. F or X for jobs)
+        - the wait between rounds is doubled, up to
+          expect_watch_max_backoff times the interval, while no
+          object changes and reset as soon as one does
+        - max_attempts * interval is the time budget of the call,
+          irrespective of the number of rounds
+        - with watch_logs, the server log is followed while waiting
+          and a new round starts as soon as a pending object is
+          logged about
+        - as in expect, the actions of the object type, e.g. kicking
+          a scheduling cycle, are run after each round that did not
+          match, unless trigger_sched_cycle is False
+        """
+        if max_attempts is None:
+            max_attempts = self.ptl_conf['max_attempts']
+        if interval is None:
+            interval = self.ptl_conf['attempt_interval']
+        if isinstance(id, str):
+            pending = set(id.split(','))
+        elif id is not None:
+            pending = set(id)
+        else:
+            pending = None
+
+        if count is None and self.utils.operator_in_attribute(attrib):
+            count = True
+        if count:
+            statattr = self.utils.convert_attributes_by_op(attrib)
+            if len(statattr) == 0:
+                statattr = attrib
+        else:
+            statattr = attrib
+
+        prefix = 'expect on ' + self.logprefix
+        msg = 'watch ' + PBS_OBJ_MAP[obj_type] + ' ' + str(attrib)
+        if id is not None:
+            msg += ' on ' + str(id)
+        self.logger.log(level, prefix + msg)
+
+        tailer = None
+        if watch_logs:
+            day = time.strftime('%Y%m%d')
+            (logdir, sudo) = self._get_logdir(self)
+            tailer = self._get_log_tailer(os.path.join(logdir, day),
+                                          self.hostname, sudo)
+            tailer.update()
+
+        # totals of the objects retired in count mode
+        retired = {}
+        deadline = time.time() + max_attempts * interval
+        wait = interval
+        rounds = 0
+        while True:
+            rounds += 1
+            if pending is not None:
+                bsl = self._watch_status(obj_type, statattr, pending, extend,
+                                         runas)
+            else:
+                try:
+                    bsl = self.status(obj_type, statattr, extend=extend,
+                                      runas=runas, level=logging.DEBUG,
+                                      logerr=False)
+                except PbsStatusError:
+                    bsl = []
+
+            done = set()
+            totals = dict(retired)
+            for bs in bsl:
+                oid = bs.get('id')
+                if pending is not None and oid not in pending:
+                    continue
+                if count:
+                    t = self._filter(obj_type, statattr, bslist=[bs], op=op,
+                                     attrop=attrop)
+                    if not t:
+                        continue
+                    for k, v in t.items():
+                        totals[k] = totals.get(k, 0) + v
+                    t = self._filter(obj_type, statattr, bslist=[bs], op=op,
+                                     attrop=PTL_AND)
+                    if t and len(t) == len(statattr) and all(t.values()):
+                        for k, v in t.items():
+                            retired[k] = retired.get(k, 0) + v
+                        done.add(oid)
+                elif self._watch_match(bs, attrib, op, attrop):
+                    done.add(oid)
+
+            if pending is None:
+                seen = set([bs.get('id') for bs in bsl])
+                if count:
+                    pending = seen - done
+                else:
+                    # every object has to match when no id is given
+                    pending = seen
+                    if not seen:
+                        pending = None
+            if pending is not None:
+                pending -= done
+
+            if count:
+                ok = True
+                for k, v in attrib.items():
+                    _op = op
+                    if isinstance(v, tuple):
+                        (_op, v) = v
+                    if not self._watch_compare(_op, totals.get(k, 0), v):
+                        ok = False
+                        break
+            else:
+                ok = pending is not None and len(pending) == 0
+            if ok:
+                self.logger.log(level, prefix + msg + ' rounds: ' +
+                                str(rounds) + ' ...  OK')
+                return True
+
+            now = time.time()
+            if now >= deadline:
+                _msg = 'expected on ' + self.logprefix + msg
+                if count:
+                    _msg += ' got: ' + str(totals)
+                elif pending:
+                    _msg += ' pending: ' + ','.join(sorted(pending))
+                raise PtlExpectError(rc=1, rv=False, msg=_msg)
+            if trigger_sched_cycle and self.actions:
+                for act_obj in self.actions.get_actions_by_type(obj_type):
+                    if act_obj.enabled:
+                        act_obj.action(self, obj_type, attrib, id, op, attrop)
+            if done:
+                wait = interval
+            else:
+                wait = min(wait * 2, interval * self.expect_watch_max_backoff)
+            self.logger.log(logging.DEBUG, prefix + msg + ' pending: ' +
+                            str(len(pending or [])) + ' next round in ' +
+                            str(wait) + 's')
+            self._watch_sleep(min(wait, deadline - now), tailer, pending)
+
     def submit(self, obj, script=None, extend=None, submit_dir=None,
                env=None):
         """
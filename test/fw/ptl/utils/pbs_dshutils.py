@@ -51,7 +51,9 @@ import sys
 import tempfile
 import traceback
 import inspect
-from subprocess import PIPE, Popen
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import PIPE, Popen, TimeoutExpired
 
 from ptl.utils.pbs_testusers import PBS_ALL_USERS, PbsUser, PbsGroup
 
@@ -142,6 +144,11 @@ class DshUtils(object):
     sudo_cmd = DFLT_SUDO_CMD
     copy_cmd = DFLT_COPY_CMD
     tmpfilelist = []
+    # number of hosts run_cmd and run_copy act on concurrently
+    max_parallel = 1
+    # when non-zero, ssh and scp share a master connection per host
+    # that persists for this many seconds after its last use
+    ssh_control_persist = 0
 
     def __init__(self):
 
@@ -812,7 +819,8 @@ class DshUtils(object):
     def run_cmd(self, hosts=None, cmd=None, sudo=False, stdin=None,
                 stdout=PIPE, stderr=PIPE, input=None, cwd=None, env=None,
                 runas=None, logerr=True, as_script=False, wait_on_script=True,
-                level=logging.INFOCLI2, port=None):
+                level=logging.INFOCLI2, port=None, timeout=None,
+                parallel=None):
         """
         Run a command on a host or list of hosts.
 
@@ -851,8 +859,18 @@ class DshUtils(object):
         :type port: str
         :param port: port number used with remote host IP address
                      for ssh
+        :param timeout: number of seconds after which the command is
+                        killed on a host, with sudo if it was run
+                        through sudo, its rc is then that of the
+                        killed process. Defaults to no timeout.
+        :type timeout: int or None
+        :param parallel: number of hosts to run the command on
+                         concurrently, defaults to max_parallel
+        :type parallel: int or None
         :returns: error, output, return code as a dictionary:
-                  ``{'out':...,'err':...,'rc':...}``
+                  ``{'out':...,'err':...,'rc':...}`` of the last
+                  host. When run on more than one host, the
+                  dictionary of each host is under 'hosts', by host
         """
 
         rshcmd = []
@@ -892,6 +910,14 @@ class DshUtils(object):
             self.logger.error(err_msg)
             return {'out': '', 'err': err_msg, 'rc': 1}
 
+        if len(hosts) > 1:
+            def _run(hostname):
+                return self.run_cmd(hostname, cmd, sudo, stdin, stdout,
+                                    stderr, input, cwd, env, runas, logerr,
+                                    as_script, wait_on_script, level, port,
+                                    timeout)
+            return self._fanout(self.foreach_host(hosts, _run, parallel))
+
         ret = {'out': '', 'err': '', 'rc': 0}
 
         for hostname in hosts:
@@ -911,9 +937,10 @@ class DshUtils(object):
                         user = _user
                     else:
                         user = _runas_user.name
-                    rshcmd = self.rsh_cmd + ['-p', port, user + '@' + hostname]
+                    rshcmd = self.get_rsh_cmd() + ['-p', port,
+                                                   user + '@' + hostname]
                 else:
-                    rshcmd = self.rsh_cmd + [hostname]
+                    rshcmd = self.get_rsh_cmd() + [hostname]
             if platform != "shasta":
                 if sudo or ((runas is not None) and (runas != _user)):
                     sudocmd = copy.copy(self.sudo_cmd)
@@ -959,9 +986,13 @@ class DshUtils(object):
             if input:
                 self.logger.log(level, input)
 
+            # a command run through a local sudo is not ours to kill on
+            # timeout, it runs in its own process group killed with sudo
+            sudokill = bool(islocal and sudocmd and timeout)
             try:
                 p = Popen(runcmd, bufsize=-1, stdin=stdin, stdout=stdout,
-                          stderr=stderr, cwd=cwd, env=env)
+                          stderr=stderr, cwd=cwd, env=env,
+                          start_new_session=sudokill)
             except Exception as e:
                 self.logger.error("Error running command " + str(runcmd))
                 if as_script:
@@ -976,7 +1007,15 @@ class DshUtils(object):
                 ret['rc'] = 0
             else:
                 try:
-                    (o, e) = p.communicate(input)
+                    (o, e) = p.communicate(input, timeout=timeout)
+                except TimeoutExpired:
+                    (o, e) = self._kill_cmd(p, sudokill)
+                    _msg = 'timed out after %s seconds' % str(timeout)
+                    self.logger.error(hostname + ': ' + _msg + ', cmd:' +
+                                      str(runcmd))
+                    e = (e or b'') + _msg.encode()
+                    if p.returncode is None:
+                        p.returncode = 1
                 except TimeOut:
                     self.logger.error("TimeOut Exception, cmd:%s" %
                                       str(runcmd))
@@ -1021,10 +1060,90 @@ class DshUtils(object):
 
         return ret
 
+    def _kill_cmd(self, p, sudo=False):
+        """
+        Kill a command started by run_cmd that timed out
+
+        :param p: The process of the command
+        :type p: Popen
+        :param sudo: Whether the command was started through sudo, in
+                     its own process group, which is then killed with
+                     sudo
+        :type sudo: bool
+        :returns: (stdout, stderr) of the command, None if the command
+                  could not be killed
+        """
+        try:
+            if sudo:
+                kcmd = self.sudo_cmd + ['kill', '-KILL', '--',
+                                        '-' + str(p.pid)]
+                Popen(kcmd, stdout=PIPE, stderr=PIPE).communicate()
+            else:
+                p.kill()
+        except OSError as e:
+            self.logger.error('could not kill pid %d: %s' % (p.pid, str(e)))
+        try:
+            return p.communicate(timeout=10)
+        except TimeoutExpired:
+            self.logger.error('pid %d still running' % p.pid)
+            return (None, None)
+
+    def foreach_host(self, hosts, func, parallel=None):
+        """
+        Call func on each host, on up to parallel hosts concurrently
+
+        :param hosts: The hosts
+        :type hosts: list
+        :param func: The function to call with a host as argument
+        :param parallel: The maximum number of concurrent calls,
+                         defaults to max_parallel
+        :type parallel: int or None
+        :returns: The results of func by host, in the order of hosts
+        """
+        if parallel is None:
+            parallel = self.max_parallel
+        parallel = min(parallel, len(hosts))
+        if parallel <= 1:
+            return OrderedDict([(h, func(h)) for h in hosts])
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            futures = [(h, pool.submit(func, h)) for h in hosts]
+            return OrderedDict([(h, f.result()) for (h, f) in futures])
+
+    @staticmethod
+    def _fanout(results):
+        """
+        The result of a command run on several hosts, that of the
+        last host, with the results of every host under 'hosts'
+        """
+        ret = list(results.values())[-1]
+        if isinstance(ret, dict):
+            ret = dict(ret)
+            ret['hosts'] = results
+        return ret
+
+    def get_rsh_cmd(self):
+        """
+        The remote shell command, with the options to share a master
+        connection per host when ssh_control_persist is set
+        """
+        return self._add_ssh_control(self.rsh_cmd, 'ssh')
+
+    def _add_ssh_control(self, cmd, exe):
+        if (not self.ssh_control_persist or not cmd or
+                os.path.basename(cmd[0]) != exe or
+                any('ControlPath' in c for c in cmd)):
+            return list(cmd)
+        path = os.path.join(tempfile.gettempdir(), 'ptl-ssh-%C')
+        return [cmd[0], '-o', 'ControlMaster=auto',
+                '-o', 'ControlPath=' + path,
+                '-o', 'ControlPersist=' + str(self.ssh_control_persist)] + \
+            list(cmd[1:])
+
     def run_copy(self, hosts=None, srchost=None, src=None, dest=None,
                  sudo=False, uid=None, gid=None, mode=None, env=None,
                  logerr=True, recursive=False, runas=None,
-                 preserve_permission=True, level=logging.INFOCLI2):
+                 preserve_permission=True, level=logging.INFOCLI2,
+                 parallel=None):
         """
         copy a file or directory to specified target hosts.
 
@@ -1060,8 +1179,13 @@ class DshUtils(object):
         :type preserve_permission:boolean
         :param level: logging level, defaults to DEBUG
         :type level: int
+        :param parallel: number of hosts to copy to concurrently,
+                         defaults to max_parallel
+        :type parallel: int or None
         :returns: {'out':<outdata>, 'err': <errdata>, 'rc':<retcode>}
-                  upon and None if no source file specified
+                  upon and None if no source file specified. When
+                  copying to more than one host, that of the last
+                  host with the results of each host under 'hosts'
         """
 
         if src is None:
@@ -1078,6 +1202,13 @@ class DshUtils(object):
             self.logger.error('destination must be a string or a list')
             return 1
 
+        if len(hosts) > 1:
+            def _copy(targethost):
+                return self.run_copy(targethost, srchost, src, dest, sudo,
+                                     uid, gid, mode, env, logerr, recursive,
+                                     runas, preserve_permission, level)
+            return self._fanout(self.foreach_host(hosts, _copy, parallel))
+
         if dest is None:
             dest = src
 
@@ -1127,7 +1258,7 @@ class DshUtils(object):
             if srchost:
                 srchost = socket.getfqdn(srchost)
             if ((not islocal) or (srchost)):
-                copy_cmd = copy.deepcopy(self.copy_cmd)
+                copy_cmd = self._add_ssh_control(self.copy_cmd, 'scp')
                 targethost = socket.getfqdn(targethost)
                 if (srchost == targethost):
                     cmd += [self.which(targethost, 'cp', level=level)]
@@ -1266,6 +1397,24 @@ class DshUtils(object):
         cls.logger.infocli('setting remote shell command to ' + cmd)
         cls.rsh_cmd = cmd.split()
 
+    @classmethod
+    def set_max_parallel(cls, num):
+        """
+        set the number of hosts commands and copies run on
+        concurrently
+        """
+        cls.logger.infocli('setting max parallel hosts to ' + str(num))
+        cls.max_parallel = max(1, int(num))
+
+    @classmethod
+    def set_ssh_control_persist(cls, seconds):
+        """
+        set the number of seconds ssh master connections persist,
+        0 to not use master connections
+        """
+        cls.logger.infocli('setting ssh control persist to ' + str(seconds))
+        cls.ssh_control_persist = int(seconds)
+
     def is_localhost(self, host=None):
         """
         :param host: Hostname of machine
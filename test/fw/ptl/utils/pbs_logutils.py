@@ -38,11 +38,17 @@
 # subject to Altair's trademark licensing policies.
 
 
+import array
+import bisect
 import collections
 import copy
+import json
 import logging
 import math
+import multiprocessing
+import os
 import re
+import shlex
 import sys
 import time
 import traceback
@@ -224,6 +230,13 @@ class PBSLogUtils(object):
     logger = logging.getLogger(__name__)
     du = DshUtils()
 
+    tm_tag = re.compile(tm_re)
+
+    # seconds since epoch of the start of each minute converted so far,
+    # keyed by its 'mm/dd/YYYY HH:MM' prefix, see convert_date_time
+    _minute_cache = {}
+    _minute_cache_size = 100000
+
     @classmethod
     def convert_date_time(cls, dt=None, fmt=None):
         """
@@ -232,6 +245,11 @@ class PBSLogUtils(object):
         it considers the current system's timezone to convert
         the datetime to epoch time
 
+        Date times in the PBS log format, %m/%d/%Y %H:%M:%S with
+        optional microseconds, are converted by slicing the string
+        and adding the seconds to the memoized epoch time of their
+        minute, other strings go through strptime.
+
         :param dt: the datetime string to convert
         :type dt: str or None
         :param fmt: Format to which datetime is to be converted
@@ -242,6 +260,21 @@ class PBSLogUtils(object):
         if dt is None:
             return None
 
+        if fmt is None and (len(dt) == 19 or (len(dt) == 26 and
+                                              dt[19] == '.')):
+            base = cls._minute_cache.get(dt[:16])
+            if base is None:
+                base = cls._convert_minute(dt[:16])
+            sec = dt[17:19]
+            if base is not None and dt[16] == ':' and sec.isdecimal():
+                sec = int(sec)
+                if sec < 60:
+                    if len(dt) == 19:
+                        return base + sec
+                    usec = dt[20:]
+                    if usec.isdecimal():
+                        return (base + sec) + int(usec) / 1e6
+
         micro = False
         if fmt is None:
             if '.' in dt:
@@ -264,6 +297,23 @@ class PBSLogUtils(object):
         else:
             return int(tm)
 
+    @classmethod
+    def _convert_minute(cls, minute):
+        """
+        Seconds since epoch of a 'mm/dd/YYYY HH:MM' minute in the
+        local timezone, memoized
+
+        :returns: The number of seconds or None if minute is invalid
+        """
+        try:
+            tm = int(datetime.strptime(minute, "%m/%d/%Y %H:%M").timestamp())
+        except ValueError:
+            return None
+        if len(cls._minute_cache) >= cls._minute_cache_size:
+            cls._minute_cache.clear()
+        cls._minute_cache[minute] = tm
+        return tm
+
     def get_num_lines(self, log, hostname=None, sudo=False):
         """
         Get the number of lines of particular log
@@ -325,7 +375,7 @@ class PBSLogUtils(object):
             return
 
         rec_times = []
-        tm_tag = re.compile(tm_re)
+        tm_tag = self.tm_tag
         num_rec = 0
         for record in records:
             num_rec += 1
@@ -385,6 +435,49 @@ class PBSLogUtils(object):
             return ret
         return None
 
+    def match_records(self, records, msg, allmatch=False, regexp=False,
+                      starttime=None, endtime=None):
+        """
+        Same as match_msg, but operates on a list of (timestamp, line)
+        tuples, such as returned by PBSLogTailer.get_records, so that
+        the timestamp of each line does not need to be converted again.
+
+        :param records: list of (timestamp, line) tuples
+        :type records: list
+        :param allmatch: If True (False by default), return a list
+                         of matching tuples.
+        :type allmatch: boolean
+        :param regexp: If True, msg is a Python regular expression.
+                       Defaults to False.
+        :type regexp: bool
+        :param starttime: If set ignore matches that occur before
+                          specified time
+        :param endtime: If set ignore matches that occur after
+                        specified time
+        """
+        linecount = 0
+        ret = []
+        if regexp:
+            msg_re = re.compile(msg)
+        for (tm, line) in records:
+            if starttime is not None:
+                if tm is None or tm < starttime:
+                    continue
+            if endtime is not None:
+                if tm is None or tm > endtime:
+                    continue
+            if ((regexp and msg_re.search(line)) or
+                    (not regexp and line.find(msg) != -1)):
+                m = (linecount, line)
+                if allmatch:
+                    ret.append(m)
+                else:
+                    return m
+            linecount += 1
+        if len(ret) > 0:
+            return ret
+        return None
+
     @staticmethod
     def convert_resv_date_time(date_time):
         """
@@ -563,6 +656,389 @@ class PBSLogUtils(object):
         return paths
 
 
+class PBSLogTailer(object):
+
+    """
+    Incremental reader of a single log file
+
+    The first update only reads the end of the file, the byte offset
+    of the data already read is then remembered so that each update
+    only transfers the lines appended to the file since the previous
+    one. The lines read are kept in memory along with their timestamp,
+    and indexed by time and by the id of the object (job, reservation,
+    node...) they refer to, so that repeated matches do not require
+    the file to be read again. Older lines are read backwards from the
+    file only when get_records needs them, and lines that are no longer
+    needed are dropped, see trim.
+
+    :param filename: the path to the log file
+    :type filename: str
+    :param hostname: the host on which the log file resides
+    :type hostname: str or None
+    :param sudo: Whether to access log file as a privileged user.
+    :type sudo: boolean
+    """
+
+    logger = logging.getLogger(__name__)
+    du = DshUtils()
+
+    # number of bytes first read from the end of the file, doubled
+    # each time the file is read further backwards
+    chunk_size = 65536
+    # most lines held, the oldest ones are dropped past this
+    max_lines = 100000
+
+    def __init__(self, filename, hostname=None, sudo=False):
+        self.filename = filename
+        self.hostname = hostname
+        self.sudo = sudo
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything read so far
+        """
+        # byte offsets of the first line held and of the end of the
+        # data read, None until the first update
+        self.start = None
+        self.offset = None
+        self.inode = None
+        self.lines = []
+        self.times = []
+        self.offsets = []
+        # running maximum of the timestamps, used to bisect by time
+        self.maxtimes = []
+        self.ids = {}
+        # ids of the objects referred to by the last update
+        self.new_ids = set()
+
+    def _read(self, start, length=None):
+        """
+        Read the data of the file from byte offset start, to the end
+        of the file or for length bytes. If start is None, the last
+        length bytes of the file are read.
+
+        :returns: (size, inode, start, data) where size and inode are
+                  those of the file and start the offset of the data,
+                  size is None if the file can not be read
+        """
+        islocal = (self.hostname is None or
+                   self.du.is_localhost(self.hostname))
+        if islocal and not self.sudo:
+            try:
+                with open(self.filename, 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    if start is None:
+                        start = max(0, st.st_size - length)
+                    if (st.st_size < start or
+                            (self.inode is not None and
+                             st.st_ino != self.inode)):
+                        return (st.st_size, st.st_ino, start, b'')
+                    if length is None:
+                        length = st.st_size - start
+                    f.seek(start)
+                    return (st.st_size, st.st_ino, start, f.read(length))
+            except (IOError, OSError):
+                return (None, None, start, b'')
+        fn = shlex.quote(self.filename)
+        if start is None:
+            rd = 'tail -c %d %s' % (length, fn)
+        elif length is None:
+            rd = 'tail -c +%d %s' % (start + 1, fn)
+        else:
+            rd = 'tail -c +%d %s | head -c %d' % (start + 1, fn, length)
+        script = 'stat -c "%%s %%i" %s && %s' % (fn, rd)
+        cmd = []
+        if not islocal:
+            cmd += self.du.rsh_cmd + [self.hostname]
+            script = shlex.quote(script)
+        if self.sudo:
+            cmd += self.du.sudo_cmd
+        cmd += ['sh', '-c', script]
+        self.logger.debug('running ' + ' '.join(cmd))
+        try:
+            p = Popen(cmd, stdout=PIPE, stderr=PIPE)
+            (o, e) = p.communicate()
+        except Exception:
+            self.logger.error('Problem processing file ' + self.filename)
+            return (None, None, start, b'')
+        if p.returncode != 0:
+            return (None, None, start, b'')
+        (st, _, data) = o.partition(b'\n')
+        try:
+            (size, inode) = [int(x) for x in st.split()]
+        except ValueError:
+            return (None, None, start, b'')
+        if start is None:
+            start = size - len(data)
+        if self.inode is not None and inode != self.inode:
+            data = b''
+        return (size, inode, start, data)
+
+    @staticmethod
+    def _split(data, offset):
+        """
+        Return the (offset, line) tuples of the complete lines of the
+        data read at the given offset
+        """
+        recs = []
+        for line in data.split(b'\n')[:-1]:
+            recs.append((offset, line.decode('utf-8', 'backslashreplace')))
+            offset += len(line) + 1
+        return recs
+
+    @staticmethod
+    def _object_id(line):
+        """
+        Return the id of the object a line refers to, or None
+        """
+        fields = line.split(';', 5)
+        # Accounting records are of the form date;type;id;msg and
+        # daemon log records of the form date;event;source;objtype;id;msg
+        if len(fields) > 3 and len(fields[1]) == 1:
+            return fields[2] or None
+        elif len(fields) > 5:
+            return fields[4] or None
+        return None
+
+    def _add_line(self, line, offset):
+        """
+        Add a line read at the given byte offset to the in-memory index
+
+        :returns: The id of the object the line refers to, or None
+        """
+        tm = PBSLogUtils.convert_date_time(line.split(';', 1)[0])
+        idx = len(self.lines)
+        self.lines.append(line)
+        self.times.append(tm)
+        self.offsets.append(offset)
+        if self.maxtimes:
+            prev = self.maxtimes[-1]
+        else:
+            prev = float('-inf')
+        if tm is not None and tm > prev:
+            self.maxtimes.append(tm)
+        else:
+            self.maxtimes.append(prev)
+        oid = self._object_id(line)
+        if oid:
+            self.ids.setdefault(oid, []).append(idx)
+        return oid
+
+    def _reindex(self):
+        """
+        Rebuild the time and id indexes once lines were added before,
+        or dropped from, the start of the lines held
+        """
+        self.maxtimes = []
+        self.ids = {}
+        prev = float('-inf')
+        for (idx, line) in enumerate(self.lines):
+            tm = self.times[idx]
+            if tm is not None and tm > prev:
+                prev = tm
+            self.maxtimes.append(prev)
+            oid = self._object_id(line)
+            if oid:
+                self.ids.setdefault(oid, []).append(idx)
+
+    def _prime(self):
+        """
+        Position the reader at the end of the file on first use, only
+        the lines in its last chunk_size bytes are held
+        """
+        length = self.chunk_size
+        while True:
+            (size, inode, start, data) = self._read(None, length)
+            if size is None:
+                # Not there yet, all of its lines will be new
+                self.start = self.offset = 0
+                return
+            cut = 0
+            if start > 0:
+                cut = data.find(b'\n') + 1
+                if cut == 0:
+                    # no complete line, the first one is partial
+                    length *= 2
+                    continue
+            end = data.rfind(b'\n') + 1
+            self.inode = inode
+            self.start = start + cut
+            self.offset = start + max(cut, end)
+            for (off, line) in self._split(data[cut:end], self.start):
+                self._add_line(line, off)
+            return
+
+    def _extend(self, n='ALL', starttime=None, id=None):
+        """
+        Read the lines that precede the first line held, backwards
+        from the file, until n lines, of the object id if given, are
+        held, or with n set to 'ALL', until a line older than
+        starttime is held. Stops at the start of the file.
+        """
+        length = self.chunk_size
+        while self.start:
+            if n != 'ALL':
+                if id is not None:
+                    have = len(self.ids.get(id, []))
+                else:
+                    have = len(self.lines)
+                if have >= n:
+                    return
+            elif (starttime is not None and self.times and
+                  self.times[0] is not None and
+                  self.times[0] < starttime):
+                return
+            begin = max(0, self.start - length)
+            (size, inode, _, data) = self._read(begin, self.start - begin)
+            length *= 2
+            if size is None or inode != self.inode:
+                return
+            cut = 0
+            if begin > 0:
+                cut = data.find(b'\n') + 1
+                if cut == 0:
+                    continue
+            recs = self._split(data[cut:], begin + cut)
+            self.lines[:0] = [r[1] for r in recs]
+            self.offsets[:0] = [r[0] for r in recs]
+            self.times[:0] = [PBSLogUtils.convert_date_time(
+                r[1].split(';', 1)[0]) for r in recs]
+            self.start = begin + cut
+            self._reindex()
+
+    def trim(self, first):
+        """
+        Drop the lines held before index first, they are read again
+        from the file if a later get_records needs them
+        """
+        if first <= 0:
+            return
+        if first < len(self.lines):
+            self.start = self.offsets[first]
+        else:
+            self.start = self.offset
+        del self.lines[:first]
+        del self.times[:first]
+        del self.offsets[:first]
+        self._reindex()
+
+    def update(self):
+        """
+        Read the lines appended to the file since the last update.
+        Only complete lines are consumed, a partially written last
+        line is read again on the next update. The first update only
+        positions the reader at the end of the file.
+
+        :returns: The number of new lines read
+        """
+        self.new_ids = set()
+        if self.offset is None:
+            self._prime()
+            return 0
+        (size, inode, _, data) = self._read(self.offset)
+        if size is None:
+            return 0
+        if size < self.offset or (self.inode is not None and
+                                  inode != self.inode):
+            # The file was truncated or replaced, start over
+            self.logger.debug('log file %s changed, re-reading it' %
+                              self.filename)
+            self.reset()
+            self.start = self.offset = 0
+            self.inode = inode
+            (size, inode, _, data) = self._read(self.offset)
+            if size is None:
+                return 0
+        self.inode = inode
+        end = data.rfind(b'\n')
+        if end == -1:
+            return 0
+        recs = self._split(data[:end + 1], self.offset)
+        self.offset += end + 1
+        for (off, line) in recs:
+            oid = self._add_line(line, off)
+            if oid:
+                self.new_ids.add(oid)
+        if len(self.lines) > self.max_lines:
+            self.trim(len(self.lines) - self.max_lines)
+        return len(recs)
+
+    def get_records(self, n='ALL', tail=True, starttime=None, id=None,
+                    trim=False):
+        """
+        Return (timestamp, line) tuples of the lines of the file,
+        reading the lines that precede those held if needed
+
+        :param n: 'ALL' or the number of lines to return, counted
+                  from the end of the file if tail is True and from
+                  its start otherwise
+        :type n: str or int
+        :param tail: Whether to count n lines from the end
+        :type tail: bool
+        :param starttime: If set, lines known to be older than
+                          starttime are skipped. Only used when
+                          n is 'ALL'
+        :param id: If set, only return the lines of the object
+                   with this id
+        :type id: str or None
+        :param trim: If True, drop the lines held that precede the
+                     lines looked at
+        :type trim: bool
+        """
+        if self.offset is None:
+            self.update()
+        if not tail:
+            self._extend()
+        elif n == 'ALL':
+            self._extend(starttime=starttime)
+        else:
+            self._extend(n=n, id=id)
+        if id is not None:
+            indexes = self.ids.get(id, [])
+        else:
+            indexes = None
+        first = 0
+        if n == 'ALL':
+            if starttime is not None:
+                first = bisect.bisect_left(self.maxtimes, starttime)
+            if indexes is None:
+                indexes = range(first, len(self.lines))
+            else:
+                indexes = indexes[bisect.bisect_left(indexes, first):]
+        else:
+            if indexes is None:
+                indexes = range(len(self.lines))
+            if tail:
+                indexes = indexes[-n:] if n > 0 else []
+                if indexes:
+                    first = indexes[0]
+                else:
+                    first = len(self.lines)
+            else:
+                indexes = indexes[:n]
+        ret = [(self.times[i], self.lines[i]) for i in indexes]
+        if trim and tail:
+            self.trim(first)
+        return ret
+
+
+def _parse_log_part(args):
+    """
+    Parse a single log file on behalf of PBSLogAnalyzer._parallel_parse
+
+    :param args: (analyzer class, attributes, filename, start, end,
+                 hostname, sudo)
+    :returns: The analyzer instance holding the partial results
+    """
+    (cls, attrs, filename, start, end, hostname, sudo) = args
+    part = cls(filename, hostname)
+    part.__dict__.update(attrs)
+    part._partial = True
+    part._log_parser(filename, start, end, hostname, sudo=sudo)
+    return part
+
+
 class PBSLogAnalyzer(object):
     """
     Utility to analyze the PBS logs
@@ -570,6 +1046,13 @@ class PBSLogAnalyzer(object):
     logger = logging.getLogger(__name__)
     logutils = PBSLogUtils()
 
+    # number of processes parsing the files of a log directory
+    nprocs = 1
+    # set on the instances that parse a single file of a parallel
+    # parse, their results are partial until merged
+    _partial = False
+    _last_rec = None
+
     generic_tag = re.compile(tm_re + ".*")
     node_type_tag = re.compile(tm_re + ".*" + "Type 58 request.*")
     queue_type_tag = re.compile(tm_re + ".*" + "Type 20 request.*")
@@ -578,9 +1061,10 @@ class PBSLogAnalyzer(object):
 
     def __init__(self, schedlog=None, serverlog=None,
                  momlog=None, acctlog=None, genericlog=None,
-                 hostname=None, show_progress=False):
+                 hostname=None, show_progress=False, nprocs=1):
 
         self.hostname = hostname
+        self.nprocs = nprocs
         self.schedlog = schedlog
         self.serverlog = serverlog
         self.acctlog = acctlog
@@ -618,6 +1102,10 @@ class PBSLogAnalyzer(object):
             self.accounting = PBSAccountingLog(acctlog, hostname,
                                                show_progress)
 
+        for a in (self.scheduler, self.server, self.mom, self.accounting):
+            if a is not None:
+                a.nprocs = nprocs
+
     def set_custom_match(self, pattern, frequency=None):
         """
         Set the custome matching
@@ -659,6 +1147,7 @@ class PBSLogAnalyzer(object):
         """
         if self.scheduler is None:
             self.scheduler = PBSSchedulerLog(filename, hostname=hostname)
+            self.scheduler.nprocs = self.nprocs
         return self.scheduler.analyze(filename, start, end, hostname,
                                       summarize)
 
@@ -669,6 +1158,7 @@ class PBSLogAnalyzer(object):
         """
         if self.server is None:
             self.server = PBSServerLog(filename, hostname=hostname)
+            self.server.nprocs = self.nprocs
 
         return self.server.analyze(filename, start, end, hostname,
                                    summarize)
@@ -680,6 +1170,7 @@ class PBSLogAnalyzer(object):
         """
         if self.accounting is None:
             self.accounting = PBSAccountingLog(filename, hostname=hostname)
+            self.accounting.nprocs = self.nprocs
 
         return self.accounting.analyze(filename, start, end, hostname,
                                        summarize=summarize, sudo=True)
@@ -691,6 +1182,7 @@ class PBSLogAnalyzer(object):
         """
         if self.mom is None:
             self.mom = PBSMoMLog(filename, hostname=hostname)
+            self.mom.nprocs = self.nprocs
 
         return self.mom.analyze(filename, start, end, hostname, summarize)
 
@@ -777,13 +1269,68 @@ class PBSLogAnalyzer(object):
         if hostname is None and self.hostname is not None:
             hostname = self.hostname
 
-        for f in self.logutils.get_log_files(hostname, path, start, end,
-                                             sudo=sudo):
-            self._log_parser(f, start, end, hostname, sudo=sudo)
+        files = self.logutils.get_log_files(hostname, path, start, end,
+                                            sudo=sudo)
+        if self.nprocs > 1 and len(files) > 1 and self._can_parallelize():
+            self._parallel_parse(files, start, end, hostname, sudo=sudo)
+        else:
+            for f in files:
+                self._log_parser(f, start, end, hostname, sudo=sudo)
 
         if summarize:
             return self.summary()
 
+    def _can_parallelize(self):
+        """
+        Whether the files of this log can be parsed independently of
+        each other and their results merged, see merge
+        """
+        return False
+
+    def _parallel_parse(self, files, start, end, hostname=None, sudo=False):
+        """
+        Parse log files in a pool of up to nprocs processes. Each file
+        is parsed by a new instance of this analyzer, and the partial
+        results are merged in the order of the files, so that they are
+        the same as those of parsing the files one after the other.
+        """
+        attrs = self._part_attrs()
+        args = [(self.__class__, attrs, f, start, end, hostname, sudo)
+                for f in files]
+        pool = multiprocessing.Pool(min(self.nprocs, len(files)))
+        try:
+            for (f, part) in zip(files, pool.imap(_parse_log_part, args)):
+                self.merge(part, start, end)
+                if self.show_progress:
+                    sys.stderr.write('Parsed ' + f + '\n')
+                    sys.stderr.flush()
+        finally:
+            pool.close()
+            pool.join()
+
+    def _part_attrs(self):
+        """
+        The attributes of this analyzer to set on the analyzers of
+        the files of a parallel parse
+        """
+        return {}
+
+    def merge(self, other, start=None, end=None):
+        """
+        Merge the results of the next log file, parsed by another
+        instance of this analyzer, as if this instance had parsed it
+
+        :param other: The analyzer that parsed the next log file
+        :param start: The start time of the analysis
+        :param end: The end time of the analysis
+        """
+        raise NotImplementedError
+
+    def _merge_versions(self, other):
+        for version in other.version:
+            if version not in self.version:
+                self.version.append(version)
+
     def _log_parser(self, filename, start, end, hostname=None, sudo=False):
         if filename is not None:
             records = self.logutils.open_log(filename, hostname, sudo=sudo)
@@ -820,6 +1367,7 @@ class PBSLogAnalyzer(object):
             sys.stderr.flush()
         records.close()
 
+        self._last_rec = last_rec
         if last_rec is not None:
             self.epilogue(last_rec)
 
@@ -827,7 +1375,10 @@ class PBSLogAnalyzer(object):
                      acctlog=None, genericlog=None, start=None, end=None,
                      hostname=None, showjob=False):
         """
-        Analyze logs
+        Analyze logs. The files of a log directory are parsed by up
+        to nprocs processes, except for the analysis that can not
+        be split by file, such as conditional matches, start time
+        estimates or utilization.
         """
         if hostname is None and self.hostname is not None:
             hostname = self.hostname
@@ -971,6 +1522,9 @@ class PBSServerLog(PBSLogAnalyzer):
                 self.server_job_run[jobid] = [tm]
             if jobid in self.server_job_queued:
                 self.wait_time.append(tm - self.server_job_queued[jobid])
+            elif self._partial:
+                # the job may have been queued in a previous file
+                self.wait_time.append((jobid, tm))
 
     def parse_endjob(self, line):
         """
@@ -989,6 +1543,9 @@ class PBSServerLog(PBSLogAnalyzer):
                 self.server_job_end[jobid] = [tm]
             if jobid in self.server_job_run:
                 self.run_time.append(tm - self.server_job_run[jobid][-1:][0])
+            elif self._partial:
+                # the job may have been run in a previous file
+                self.run_time.append((jobid, tm))
 
     def parse_nodeup(self, line):
         """
@@ -1031,6 +1588,36 @@ class PBSServerLog(PBSLogAnalyzer):
 
         return PARSER_OK_CONTINUE
 
+    def _can_parallelize(self):
+        return True
+
+    def merge(self, other, start=None, end=None):
+        # times of jobs queued or run in a previous file are resolved
+        # against the state prior to merging the other file
+        for wt in other.wait_time:
+            if isinstance(wt, tuple):
+                if wt[0] not in self.server_job_queued:
+                    continue
+                wt = wt[1] - self.server_job_queued[wt[0]]
+            self.wait_time.append(wt)
+        for rt in other.run_time:
+            if isinstance(rt, tuple):
+                if rt[0] not in self.server_job_run:
+                    continue
+                rt = rt[1] - self.server_job_run[rt[0]][-1]
+            self.run_time.append(rt)
+        self.server_job_queued.update(other.server_job_queued)
+        for jobid, tms in other.server_job_run.items():
+            self.server_job_run.setdefault(jobid, []).extend(tms)
+        for jobid, tms in other.server_job_end.items():
+            self.server_job_end.setdefault(jobid, []).extend(tms)
+        self.record_tm.extend(other.record_tm)
+        self.nodeup.extend(other.nodeup)
+        self.enquejob.extend(other.enquejob)
+        self.jobsrun.extend(other.jobsrun)
+        self.jobsend.extend(other.jobsend)
+        self._merge_versions(other)
+
     def summary(self):
         self.info[JSR] = self.logutils.get_rate(self.enquejob)
         self.info[NJE] = len(self.server_job_end.keys())
@@ -1157,6 +1744,9 @@ class PBSSchedulerLog(PBSLogAnalyzer):
         self.info = {}
         self.summary_info = {}
 
+        # records preceding the first cycle of a partial parse
+        self._prefix = []
+
     def _parse_line(self, line):
         """
         Parse scheduling cycle Starting, Leaving, and alarm records
@@ -1298,6 +1888,15 @@ class PBSSchedulerLog(PBSLogAnalyzer):
         return self.scheduler_parsing(rec, start, end)
 
     def scheduler_parsing(self, rec, start, end):
+        if self._partial and self.cycle is None:
+            # until a cycle starts, records may belong to a cycle of a
+            # previous file, they are parsed when merged
+            m = self.startcycle_tag.match(rec)
+            if m is None or not self.logutils.in_range(
+                    self.logutils.convert_date_time(m.group('datetime')),
+                    start, end):
+                self._prefix.append(rec)
+                return PARSER_OK_CONTINUE
         m = self.tm_tag.match(rec)
         if m:
             tm = self.logutils.convert_date_time(m.group('datetime'))
@@ -1315,6 +1914,23 @@ class PBSSchedulerLog(PBSLogAnalyzer):
 
         return PARSER_OK_CONTINUE
 
+    def _can_parallelize(self):
+        return not self.estimated_parsing_enabled
+
+    def merge(self, other, start=None, end=None):
+        for rec in other._prefix:
+            self.scheduler_parsing(rec, start, end)
+        if other.cycles:
+            if self.cycle is not None and self.cycle.end == -1:
+                self.cycle.end = other.cycles[0].start
+            self.cycles.extend(other.cycles)
+            self.cycle = other.cycle
+        elif other._last_rec is not None:
+            # the other file only continues the current cycle
+            self.epilogue(other._last_rec)
+        self.record_tm.extend(other.record_tm)
+        self._merge_versions(other)
+
     def estimated_info_parsing(self, line):
         """
         Parse Estimated start time information for a job
@@ -1662,6 +2278,15 @@ class PBSMoMLog(PBSLogAnalyzer):
 
         return PARSER_OK_CONTINUE
 
+    def _can_parallelize(self):
+        return True
+
+    def merge(self, other, start=None, end=None):
+        self.start.extend(other.start)
+        self.end.extend(other.end)
+        self.queued.extend(other.queued)
+        self._merge_versions(other)
+
     def summary(self):
         """
         Mom log summary
@@ -1786,6 +2411,18 @@ class PBSAccountingLog(PBSLogAnalyzer):
 
         self.info = {}
 
+        # jobs whose user or end time were set by an S or E record, as
+        # opposed to only defaulted, during a partial parse
+        self._users_set = set()
+        self._job_end_set = set()
+        # during a partial parse, the jobs with an S record and, when
+        # computing utilization, the E record fields accounted for at
+        # merge time, once the first record of the analysis is known
+        self._started_set = set()
+        self._ends = []
+
+        self.store = None
+
     def enable_running_jobs_parsing(self):
         """
         Enable parsing for running jobs
@@ -1822,6 +2459,17 @@ class PBSAccountingLog(PBSLogAnalyzer):
         """
         self.accounting_workload_parsing = True
 
+    def enable_columnar_store(self, path):
+        """
+        Read the accounting log files already ingested into the
+        columnar store at path from the store instead of parsing
+        their text, see PBSAccountingStore
+
+        :param path: The directory of the store
+        :type path: str
+        """
+        self.store = PBSAccountingStore(path)
+
     def process_nodes_data(self, hostname=None, nodesfile=None, jobsfile=None):
         """
         Get job and node information by stat'ing and parsing node
@@ -1866,6 +2514,33 @@ class PBSAccountingLog(PBSLogAnalyzer):
                 running_jobids.append(j.split('/')[0].strip())
         self._running_jobids = list(set(running_jobids))
 
+    def _log_parser(self, filename, start, end, hostname=None, sudo=False):
+        day = None
+        if (self.store is not None and not self.job_info_parsing and
+                not self.accounting_workload_parsing):
+            day = self.store.load(filename, hostname, sudo=sudo)
+        if day is None:
+            return PBSLogAnalyzer._log_parser(self, filename, start, end,
+                                              hostname, sudo=sudo)
+        for i in range(len(day)):
+            rv = self.account_record(day.fields(i), start, end)
+            if rv in (PARSER_OK_STOP, PARSER_ERROR_STOP):
+                break
+        # the epilogue does not depend on the last record itself
+        self._last_rec = None
+        if day.nlines > 0:
+            self._last_rec = ''
+            self.epilogue(self._last_rec)
+
+    def _part_attrs(self):
+        attrs = {'store': self.store,
+                 'utilization_parsing': self.utilization_parsing,
+                 'running_jobs_parsing': self.running_jobs_parsing,
+                 'job_info_parsing': self.job_info_parsing}
+        if hasattr(self, 'jobid'):
+            attrs['jobid'] = self.jobid
+        return attrs
+
     def comp_analyze(self, rec, start, end, **kwargs):
         if self.job_info_parsing:
             return self.job_info(rec)
@@ -1876,41 +2551,89 @@ class PBSAccountingLog(PBSLogAnalyzer):
         """
         Parsing accounting log
         """
-        r = self.record_tag.match(rec.decode("utf-8"))
+        if isinstance(rec, bytes):
+            rec = rec.decode("utf-8")
+        r = self.record_tag.match(rec)
         if not r:
             return PARSER_ERROR_CONTINUE
+        return self.account_record(self.record_fields(r), start, end,
+                                   r.group('msg'))
 
-        tm = self.logutils.convert_date_time(r.group('date') +
-                                             ' ' + r.group('time'))
+    @classmethod
+    def record_fields(cls, r):
+        """
+        Extract the fields used by the accounting analysis from a
+        matched accounting record
+
+        :param r: A match of record_tag
+        :returns: A tuple (time, type, id, user, qtime, start, ncpus,
+                  exec_host, walltime), where user and the fields
+                  after it are None unless the S or E record details
+                  could be parsed, and walltime is None unless it
+                  could be converted to seconds
+        """
+        tm = cls.logutils.convert_date_time(r.group('date') +
+                                            ' ' + r.group('time'))
+        rec_type = r.group('type')
+        m = None
+        if rec_type == 'S':
+            m = cls.S_sub_record_tag.match(r.group('msg'))
+        elif rec_type == 'E':
+            m = cls.E_sub_record_tag.match(r.group('msg'))
+        if not m:
+            return (tm, rec_type, r.group('id'), None, None, None, None,
+                    None, None)
+        walltime = None
+        if rec_type == 'E':
+            try:
+                walltime = int(cls.logutils.convert_hhmmss_time(
+                    m.group('walltime').strip()))
+            except Exception:
+                pass
+        return (tm, rec_type, r.group('id'), m.group('user'),
+                int(m.group('qtime')), int(m.group('start')),
+                int(m.group('ncpus')), m.group('exechost'), walltime)
+
+    def account_record(self, fields, start, end, msg=None):
+        """
+        Account for an accounting record
+
+        :param fields: The fields of the record, see record_fields
+        :type fields: tuple
+        :param start: Time from which records are accounted for
+        :param end: Time after which parsing stops
+        :param msg: The message of the record, required to parse the
+                    accounting workload
+        :type msg: str or None
+        """
+        (tm, rec_type, jobid, user, qtime, starttime, ncpus, ehost,
+         walltime) = fields
         if ((start is None and end is None) or
                 self.logutils.in_range(tm, start, end)):
             self.record_tm.append(tm)
-            rec_type = r.group('type')
-            jobid = r.group('id')
 
             if not self.accounting_workload_parsing and rec_type == 'S':
                 # Precompute metrics about the S record just in case
                 # it does not have an E record. The differences are
                 # resolved after all records are processed
-                if jobid in self._running_jobids:
+                if self._partial:
+                    self._started_set.add(jobid)
+                elif jobid in self._running_jobids:
                     self._running_jobids.remove(jobid)
-                m = self.S_sub_record_tag.match(r.group('msg'))
-                if m:
-                    self.users[jobid] = m.group('user')
-                    qtime = int(m.group('qtime'))
-                    starttime = int(m.group('start'))
-                    ncpus = int(m.group('ncpus'))
+                if user is not None:
+                    self.users[jobid] = user
+                    if self._partial:
+                        self._users_set.add(jobid)
                     self.job_cpus[jobid] = ncpus
 
                     if starttime != 0 and qtime != 0:
                         self.tmp_wait_time[jobid] = starttime - qtime
                         self.job_start[jobid] = starttime
-                    ehost = m.group('exechost')
                     self.job_nodes[jobid] = ResourceResv.get_hosts(ehost)
             elif rec_type == 'E':
                 if self.accounting_workload_parsing:
                     try:
-                        msg = r.group('msg').split()
+                        msg = msg.split()
                         attrs = dict([l.split('=', 1) for l in msg])
                     except Exception:
                         self.parser_errors += 1
@@ -1923,48 +2646,25 @@ class PBSAccountingLog(PBSLogAnalyzer):
                     if 'euser' not in attrs:
                         attrs['euser'] = 'unknown_user'
 
-                    attrs['id'] = r.group('id')
-                    self.job_attrs[r.group('id')] = attrs
+                    attrs['id'] = jobid
+                    self.job_attrs[jobid] = attrs
 
-                m = self.E_sub_record_tag.match(r.group('msg'))
-                if m:
+                if user is not None:
                     if jobid not in self.users:
-                        self.users[jobid] = m.group('user')
-                    ehost = m.group('exechost')
+                        self.users[jobid] = user
                     self.job_nodes[jobid] = ResourceResv.get_hosts(ehost)
-                    ncpus = int(m.group('ncpus'))
                     self.job_cpus[jobid] = ncpus
                     self.job_end[jobid] = tm
+                    if self._partial:
+                        self._job_end_set.add(jobid)
 
-                    qtime = int(m.group('qtime'))
-                    starttime = int(m.group('start'))
                     if starttime != 0 and qtime != 0:
-                        # jobs enqueued prior to start of time range
-                        # considered should be reset to start of time
-                        # range. Only matters when computing
-                        # utilization
-                        if (self.utilization_parsing and
-                                qtime < self.record_tm[0]):
-                            qtime = self.record_tm[0]
-                            if starttime < self.record_tm[0]:
-                                starttime = self.record_tm[0]
-                        self.wait_time.append(starttime - qtime)
-                        if m.group('walltime'):
-                            try:
-                                walltime = self.logutils.convert_hhmmss_time(
-                                    m.group('walltime').strip())
-                                self.run_time.append(walltime)
-                            except Exception:
-                                pass
+                        end = (qtime, starttime, ncpus,
+                               len(self.job_nodes[jobid]), walltime)
+                        if self._partial and self.utilization_parsing:
+                            self._ends.append(end)
                         else:
-                            walltime = tm - starttime
-                            self.run_time.append(walltime)
-
-                        if self.utilization_parsing:
-                            self.used_cph += ncpus * (walltime / 60)
-                            if self.utils:
-                                self.used_nph += (len(self.job_nodes[jobid]) *
-                                                  (walltime / 60))
+                            self.account_end(*end)
             elif rec_type == 'Q':
                 self.queue.append(tm)
             elif rec_type == 'D':
@@ -1976,9 +2676,73 @@ class PBSAccountingLog(PBSLogAnalyzer):
 
         return PARSER_OK_CONTINUE
 
+    def account_end(self, qtime, starttime, ncpus, nnodes, walltime):
+        """
+        Account for the wait time, run time and utilization of a job
+        that ended
+
+        :param qtime: The time the job was queued
+        :param starttime: The time the job started
+        :param ncpus: The number of cpus of the job
+        :param nnodes: The number of nodes of the job
+        :param walltime: The walltime used in seconds, or None
+        """
+        # jobs enqueued prior to start of time range
+        # considered should be reset to start of time
+        # range. Only matters when computing
+        # utilization
+        if self.utilization_parsing and qtime < self.record_tm[0]:
+            qtime = self.record_tm[0]
+            if starttime < self.record_tm[0]:
+                starttime = self.record_tm[0]
+        self.wait_time.append(starttime - qtime)
+        if walltime is not None:
+            self.run_time.append(walltime)
+
+        if self.utilization_parsing and walltime is not None:
+            self.used_cph += ncpus * (walltime / 60)
+            if self.utils:
+                self.used_nph += nnodes * (walltime / 60)
+
+    def _can_parallelize(self):
+        return True
+
+    def merge(self, other, start=None, end=None):
+        self.record_tm.extend(other.record_tm)
+        self.queue.extend(other.queue)
+        self.wait_time.extend(other.wait_time)
+        self.run_time.extend(other.run_time)
+        for jobid, user in other.users.items():
+            if jobid in other._users_set or jobid not in self.users:
+                self.users[jobid] = user
+        for jobid, tm in other.job_end.items():
+            if jobid in other._job_end_set or jobid not in self.job_end:
+                self.job_end[jobid] = tm
+        self.job_start.update(other.job_start)
+        self.job_nodes.update(other.job_nodes)
+        self.job_cpus.update(other.job_cpus)
+        self.tmp_wait_time.update(other.tmp_wait_time)
+        self.job_attrs.update(other.job_attrs)
+        self.parser_errors += other.parser_errors
+        for jobid in other._started_set:
+            if jobid in self._running_jobids:
+                self._running_jobids.remove(jobid)
+        # the utilization of the file depends on the first record of
+        # all the files, which is the first one of record_tm by now
+        for e in other._ends:
+            self.account_end(*e)
+        if self.job_info_parsing:
+            self.job_info_res.update(getattr(other, 'job_info_res', {}))
+        # the epilogue of a partial parse is deferred to here, as it
+        # depends on the records of all the previous files
+        if other._last_rec is not None:
+            self.epilogue(other._last_rec)
+
     def epilogue(self, line):
         if self.running_jobs_parsing or self.accounting_workload_parsing:
             return
+        if self._partial:
+            return
 
         if len(self.record_tm) > 0:
             last_record_tm = self.record_tm[len(self.record_tm) - 1]
@@ -2143,3 +2907,449 @@ class PBSAccountingLog(PBSLogAnalyzer):
         self.info[USRS] = len(set(self.users.values()))
 
         return self.info
+
+
+class PBSAccountingDay(object):
+
+    """
+    The records of an accounting log file, as held by a
+    PBSAccountingStore, one array per column
+
+    :param header: The header of the stored file
+    :type header: dict
+    :param columns: The arrays of the columns by name
+    :type columns: dict
+    """
+
+    def __init__(self, header, columns):
+        self.name = header['name']
+        self.nlines = header['nlines']
+        self.strings = header['strings']
+        self.columns = columns
+        self._index = None
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def string_id(self, s):
+        """
+        The index of a string in the dictionary of this day, -2 if
+        the string is not used by any record
+        """
+        if self._index is None:
+            self._index = dict([(v, i) for i, v in enumerate(self.strings)])
+        return self._index.get(s, -2)
+
+    def get_time(self, i):
+        tm = self.columns['time'][i]
+        if self.columns['flags'][i] & PBSAccountingStore.F_INT_TIME:
+            return int(tm)
+        return tm
+
+    def get_string(self, name, i):
+        v = self.columns[name][i]
+        if v < 0:
+            return None
+        return self.strings[v]
+
+    def get_int(self, name, i):
+        v = self.columns[name][i]
+        if v < 0:
+            return None
+        return v
+
+    def fields(self, i):
+        """
+        The fields of record i as returned by
+        PBSAccountingLog.record_fields
+        """
+        c = self.columns
+        tm = self.get_time(i)
+        rec_type = chr(c['type'][i])
+        jobid = self.strings[c['id'][i]]
+        if not c['flags'][i] & PBSAccountingStore.F_DETAILS:
+            return (tm, rec_type, jobid, None, None, None, None, None, None)
+        walltime = None
+        if rec_type == 'E':
+            walltime = self.get_int('walltime', i)
+        return (tm, rec_type, jobid, self.get_string('user', i),
+                c['qtime'][i], c['start'][i], c['ncpus'][i],
+                self.get_string('exec_host', i), walltime)
+
+    def select(self, start=None, end=None, user=None, queue=None,
+               rec_type=None):
+        """
+        The indexes of the records matching all the given criteria
+
+        :param start: Only records at or after this time
+        :param end: Only records at or before this time
+        :param user: Only records of this user
+        :type user: str or None
+        :param queue: Only records of this queue
+        :type queue: str or None
+        :param rec_type: Only records of this type, e.g. 'E'
+        :type rec_type: str or None
+        """
+        c = self.columns
+        rows = range(len(self))
+        if user is not None:
+            uid = self.string_id(user)
+            rows = [i for i in rows if c['user'][i] == uid]
+        if queue is not None:
+            qid = self.string_id(queue)
+            rows = [i for i in rows if c['queue'][i] == qid]
+        if rec_type is not None:
+            t = ord(rec_type)
+            rows = [i for i in rows if c['type'][i] == t]
+        if start is not None:
+            rows = [i for i in rows if c['time'][i] >= start]
+        if end is not None:
+            rows = [i for i in rows if c['time'][i] <= end]
+        return list(rows)
+
+    def row(self, i, columns=None):
+        """
+        Record i as a dictionary of its set columns
+
+        :param columns: The names of the columns to return, all by
+                        default
+        :type columns: list or None
+        """
+        if columns is None:
+            columns = [n for n, _ in PBSAccountingStore.columns
+                       if n != 'flags']
+        d = {}
+        for n in columns:
+            if n == 'time':
+                v = self.get_time(i)
+            elif n == 'type':
+                v = chr(self.columns['type'][i])
+            elif n in PBSAccountingStore.str_columns:
+                v = self.get_string(n, i)
+            else:
+                v = self.get_int(n, i)
+            if v is not None:
+                d[n] = v
+        return d
+
+
+class PBSAccountingStore(object):
+
+    """
+    Columnar store of accounting records, so that the same accounting
+    logs can be analyzed or queried repeatedly without parsing their
+    text again
+
+    Each ingested accounting log file is stored in the store
+    directory under its name with a .pac suffix. It holds a JSON
+    header line, with the dictionary of the strings (job ids, users,
+    queues, exec_hosts) referenced by the records, followed by one
+    fixed width array per column. A stored file is used in place of
+    its log file by PBSAccountingLog for as long as the size and
+    modification time of the log file match those recorded at
+    ingestion.
+
+    :param path: The directory of the store, created if needed
+    :type path: str
+    """
+
+    logger = logging.getLogger(__name__)
+    du = DshUtils()
+
+    version = 1
+    suffix = '.pac'
+
+    # (name, array typecode) of the columns. String columns hold an
+    # index in the string dictionary and unset values are -1
+    columns = (('time', 'd'), ('type', 'B'), ('flags', 'B'), ('id', 'q'),
+               ('user', 'q'), ('queue', 'q'), ('exec_host', 'q'),
+               ('qtime', 'q'), ('start', 'q'), ('end', 'q'),
+               ('ncpus', 'q'), ('walltime', 'q'), ('cput', 'q'),
+               ('mem', 'q'))
+    str_columns = ('id', 'user', 'queue', 'exec_host')
+
+    # the user, times, ncpus and exec_host are those parsed from the S
+    # or E record by the accounting analysis
+    F_DETAILS = 1
+    # the record time has no microseconds
+    F_INT_TIME = 2
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _day_path(self, filename):
+        return os.path.join(self.path, os.path.basename(filename) +
+                            self.suffix)
+
+    def _source_stat(self, filename, hostname=None, sudo=False):
+        """
+        The [size, modification time] of a log file, or None
+        """
+        if not sudo and (hostname is None or self.du.is_localhost(hostname)):
+            try:
+                st = os.stat(filename)
+            except OSError:
+                return None
+            return [st.st_size, int(st.st_mtime)]
+        ret = self.du.run_cmd(hostname, ['stat', '-c', '%s %Y', filename],
+                              sudo=sudo, logerr=False, level=logging.DEBUG)
+        if ret['rc'] != 0 or not ret['out']:
+            return None
+        try:
+            return [int(x) for x in ret['out'][0].split()]
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _to_int(val):
+        """
+        Convert an accounting value, a number, a duration or a size,
+        to an int (seconds or kb), -1 if unset or not convertible
+        """
+        if val is None:
+            return -1
+        val = PbsAttribute.decode_value(val)
+        if isinstance(val, (int, float)):
+            return int(val)
+        return -1
+
+    def ingest(self, filename, hostname=None, sudo=False):
+        """
+        Convert an accounting log file into the columnar format
+
+        :param filename: The path to the accounting log file
+        :type filename: str
+        :param hostname: The host on which the file resides
+        :type hostname: str or None
+        :param sudo: Whether to read the file as a privileged user
+        :type sudo: bool
+        :returns: The path to the stored file, None on error
+        """
+        src = self._source_stat(filename, hostname, sudo)
+        if src is None:
+            return None
+        f = PBSLogUtils().open_log(filename, hostname, sudo=sudo)
+        if f is None:
+            return None
+        cols = dict([(n, array.array(t)) for n, t in self.columns])
+        strings = []
+        index = {}
+
+        def _str(s):
+            if s is None:
+                return -1
+            i = index.get(s)
+            if i is None:
+                i = index[s] = len(strings)
+                strings.append(s)
+            return i
+
+        nlines = 0
+        for rec in f:
+            nlines += 1
+            if isinstance(rec, bytes):
+                rec = rec.decode('utf-8', 'backslashreplace')
+            r = PBSAccountingLog.record_tag.match(rec)
+            if not r:
+                continue
+            (tm, rec_type, jobid, user, qtime, starttime, ncpus, ehost,
+             walltime) = PBSAccountingLog.record_fields(r)
+            if tm is None:
+                continue
+            attrs = {}
+            for a in r.group('msg').split():
+                (k, _, v) = a.partition('=')
+                attrs[k] = v
+            flags = 0
+            if user is not None:
+                flags |= self.F_DETAILS
+            else:
+                user = attrs.get('user')
+                qtime = self._to_int(attrs.get('qtime'))
+                starttime = self._to_int(attrs.get('start'))
+                ncpus = self._to_int(attrs.get('Resource_List.ncpus'))
+                ehost = attrs.get('exec_host')
+            if walltime is None:
+                walltime = self._to_int(attrs.get('resources_used.walltime'))
+            if isinstance(tm, int):
+                flags |= self.F_INT_TIME
+            cols['time'].append(tm)
+            cols['type'].append(ord(rec_type))
+            cols['flags'].append(flags)
+            cols['id'].append(_str(jobid))
+            cols['user'].append(_str(user))
+            cols['queue'].append(_str(attrs.get('queue')))
+            cols['exec_host'].append(_str(ehost))
+            cols['qtime'].append(qtime)
+            cols['start'].append(starttime)
+            cols['end'].append(self._to_int(attrs.get('end')))
+            cols['ncpus'].append(ncpus)
+            cols['walltime'].append(walltime)
+            cols['cput'].append(self._to_int(attrs.get('resources_used.cput')))
+            cols['mem'].append(self._to_int(attrs.get('resources_used.mem')))
+        f.close()
+
+        header = {'version': self.version,
+                  'name': os.path.basename(filename),
+                  'source': src,
+                  'nlines': nlines,
+                  'nrows': len(cols['time']),
+                  'byteorder': sys.byteorder,
+                  'columns': [[n, t] for n, t in self.columns],
+                  'strings': strings}
+        path = self._day_path(filename)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as fd:
+            fd.write(json.dumps(header).encode('utf-8') + b'\n')
+            for n, _ in self.columns:
+                cols[n].tofile(fd)
+        os.rename(tmp, path)
+        self.logger.debug('ingested %d accounting records of %s into %s' %
+                          (header['nrows'], filename, path))
+        return path
+
+    def _read_header(self, fd):
+        try:
+            header = json.loads(fd.readline().decode('utf-8'))
+        except ValueError:
+            return None
+        if header.get('version') != self.version:
+            return None
+        return header
+
+    def _read_day(self, path, source=None):
+        """
+        Read a stored file, None if it can not be read or if source,
+        the [size, mtime] of its log file, is not the one it was
+        ingested from
+        """
+        try:
+            with open(path, 'rb') as fd:
+                header = self._read_header(fd)
+                if header is None:
+                    return None
+                if source is not None and header['source'] != source:
+                    return None
+                cols = {}
+                for n, t in header['columns']:
+                    a = array.array(t)
+                    a.fromfile(fd, header['nrows'])
+                    if header['byteorder'] != sys.byteorder:
+                        a.byteswap()
+                    cols[n] = a
+        except (IOError, OSError, EOFError):
+            return None
+        return PBSAccountingDay(header, cols)
+
+    def is_current(self, filename, hostname=None, sudo=False):
+        """
+        Whether an accounting log file is ingested and unchanged since
+        """
+        path = self._day_path(filename)
+        if not os.path.isfile(path):
+            return False
+        with open(path, 'rb') as fd:
+            header = self._read_header(fd)
+        if header is None:
+            return False
+        return header['source'] == self._source_stat(filename, hostname,
+                                                     sudo)
+
+    def load(self, filename, hostname=None, sudo=False):
+        """
+        The stored records of an accounting log file, None if it was
+        not ingested or has changed since
+        """
+        path = self._day_path(filename)
+        if not os.path.isfile(path):
+            return None
+        src = self._source_stat(filename, hostname, sudo)
+        if src is None:
+            return None
+        return self._read_day(path, src)
+
+    def days(self, start=None, end=None):
+        """
+        The stored days, restricted to those between start and end
+        when the files are named after their day, as accounting
+        logs are
+        """
+        d1 = d2 = None
+        if start is not None:
+            d1 = time.strftime("%Y%m%d", time.localtime(start))
+        if end is not None:
+            d2 = time.strftime("%Y%m%d", time.localtime(end))
+        days = []
+        for f in sorted(os.listdir(self.path)):
+            if not f.endswith(self.suffix):
+                continue
+            name = f[:-len(self.suffix)]
+            if len(name) == 8 and name.isdigit():
+                if ((d1 is not None and name < d1) or
+                        (d2 is not None and name > d2)):
+                    continue
+            day = self._read_day(os.path.join(self.path, f))
+            if day is not None:
+                days.append(day)
+        return days
+
+    def query(self, start=None, end=None, user=None, queue=None,
+              rec_type='E', columns=None):
+        """
+        Query the stored records
+
+        :param start: Only records at or after this time
+        :param end: Only records at or before this time
+        :param user: Only records of this user
+        :type user: str or None
+        :param queue: Only records of this queue
+        :type queue: str or None
+        :param rec_type: Only records of this type, all if None.
+                         Defaults to 'E'
+        :type rec_type: str or None
+        :param columns: The columns to return, all by default
+        :type columns: list or None
+        :returns: A list of dictionaries, one per record
+        """
+        rows = []
+        for day in self.days(start, end):
+            for i in day.select(start, end, user, queue, rec_type):
+                rows.append(day.row(i, columns))
+        return rows
+
+    def aggregate(self, start=None, end=None, user=None, queue=None,
+                  groupby=None):
+        """
+        Aggregate the resources used by the jobs ended (E records)
+        between start and end
+
+        :param groupby: One of 'user', 'queue' or None
+        :type groupby: str or None
+        :returns: A dictionary of njobs, walltime and cput in seconds,
+                  mem in kb and cpu_hours, by value of groupby if set
+        """
+        res = {}
+        for day in self.days(start, end):
+            c = day.columns
+            for i in day.select(start, end, user, queue, 'E'):
+                key = None
+                if groupby is not None:
+                    key = day.get_string(groupby, i)
+                if key not in res:
+                    res[key] = {'njobs': 0, 'walltime': 0, 'cput': 0,
+                                'mem': 0, 'cpu_hours': 0}
+                agg = res[key]
+                agg['njobs'] += 1
+                for n in ('walltime', 'cput', 'mem'):
+                    if c[n][i] > 0:
+                        agg[n] += c[n][i]
+                if c['walltime'][i] > 0 and c['ncpus'][i] > 0:
+                    agg['cpu_hours'] += c['ncpus'][i] * c['walltime'][i]
+        for agg in res.values():
+            agg['cpu_hours'] = agg['cpu_hours'] / 3600.0
+        if groupby is None:
+            return res.get(None, {'njobs': 0, 'walltime': 0, 'cput': 0,
+                                  'mem': 0, 'cpu_hours': 0})
+        return res
@@ -39,24 +39,27 @@
 
 
 import collections
+import hashlib
+import hmac
 import logging
 import os
 import pprint
-import random
 import re
 import shlex
 import shutil
 import socket
+import string
 import tarfile
+import threading
 import time
 import platform
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import STDOUT
 from pathlib import Path
-from multiprocessing import Process
+from multiprocessing import Pool
 
 from ptl.lib.pbs_ifl_mock import *
-from ptl.lib.pbs_testlib import (SCHED, BatchUtils, Scheduler, Server,
-                                 PbsAttribute)
+from ptl.lib.pbs_testlib import SCHED, BatchUtils, Scheduler, Server
 from ptl.utils.pbs_dshutils import DshUtils
 from ptl.utils.pbs_logutils import PBSLogUtils
 
@@ -232,6 +235,11 @@ PBS_HOSTN_CMD = os.path.join("bin", "pbs_hostn")
 class ObfuscateSnapshot(object):
     val_obf_map = {}
     vals_to_del = []
+    # Obfuscated values are derived from the original values with this
+    # key, so that every process obfuscates a value the same way
+    obf_key = os.urandom(32)
+    map_re = None
+    del_re = None
     bu = BatchUtils()
     du = DshUtils()
     num_bad_acct_records = 0
@@ -254,6 +262,55 @@ class ObfuscateSnapshot(object):
     queue_attrs_obf = [ATTR_acluser, ATTR_aclgroup, ATTR_aclhost]
     skip_vals = ["_pbs_project_default", "*", "pbsadmin", "pbsuser"]
 
+    @classmethod
+    def _obf_value(cls, val):
+        """
+        Get the obfuscated string for a value, a string of 8 to 30
+        letters which only depends on the value and obf_key
+
+        :param val - the value to obfuscate
+        :type val - str
+        """
+        digest = hmac.new(cls.obf_key, val.encode("utf-8", "replace"),
+                          hashlib.sha256).digest()
+        letters = string.ascii_letters
+        length = 8 + digest[0] % 23
+        return "".join([letters[b % len(letters)]
+                        for b in digest[1:length + 1]])
+
+    @classmethod
+    def _init_worker(cls, obf_key, val_obf_map, vals_to_del):
+        """
+        Set up the obfuscation state of a worker process and compile
+        the obfuscation map and the values to delete into a regular
+        expression each, so that a file is obfuscated in a single pass
+        """
+        cls.obf_key = obf_key
+        cls.val_obf_map = val_obf_map
+        cls.vals_to_del = vals_to_del
+        keys = sorted(val_obf_map, key=len, reverse=True)
+        if keys:
+            cls.map_re = re.compile(r'\b(?:' +
+                                    "|".join(map(re.escape, keys)) + r')\b')
+        else:
+            cls.map_re = None
+        dels = sorted(set([v for v in vals_to_del if v]), key=len,
+                      reverse=True)
+        if dels:
+            cls.del_re = re.compile("|".join(map(re.escape, dels)))
+        else:
+            cls.del_re = None
+
+    def _pool(self, nfiles):
+        """
+        Get a pool of worker processes set up with the current
+        obfuscation state, limited to 10 processes
+        """
+        ncpus = min(os.cpu_count() or 1, 10, max(nfiles, 1))
+        return Pool(ncpus, initializer=self._init_worker,
+                    initargs=(self.obf_key, self.val_obf_map,
+                              self.vals_to_del))
+
     def _obfuscate_stat(self, file_path, attrs_to_obf, attrs_to_del):
         """
         Helper function to obfuscate qstat/rstat -f & pbsnodes -av outputs
@@ -298,8 +355,7 @@ class ObfuscateSnapshot(object):
                             if _val in self.skip_vals:
                                 obf = _val
                             elif _val not in self.val_obf_map:
-                                obf = PbsAttribute.random_str(
-                                    length=random.randint(8, 30))
+                                obf = self._obf_value(_val)
                                 self.val_obf_map[_val] = obf
                             else:
                                 obf = self.val_obf_map[_val]
@@ -347,15 +403,21 @@ class ObfuscateSnapshot(object):
 
     def _obfuscate_acct_file(self, attrs_obf, file_path):
         """
-        Helper function to anonymize
+        Helper function to anonymize an accounting log file, one record
+        at a time
 
         :param attrs_obf - set of attributes to obfuscate
         :type attrs_obf - set
         :param file_path - path of acct log file
         :type file_path - str
+
+        :returns tuple of the values obfuscated that were not in
+                 val_obf_map, and the number of bad records found
         """
-        newcontent = []
-        with open(file_path, "r") as fd:
+        new_obf = {}
+        num_bad = 0
+        fout = self.du.create_temp_file()
+        with open(file_path, "r") as fd, open(fout, "w") as fdout:
             for record in fd:
                 # accounting log format is
                 # %Y/%m/%d %H:%M:%S;<Key>;<Id>;<key1=val1> <key2=val2> ...
@@ -363,22 +425,17 @@ class ObfuscateSnapshot(object):
                 if record_list is None or len(record_list) < 4:
                     continue
                 if record_list[1] in ("A", "L"):
-                    newcontent.append(record)
+                    fdout.write(record)
                     continue
                 content_list = shlex.split(record_list[3].strip())
 
                 skip_record = False
                 kvl_list = [kv.split("=", 1) for kv in content_list]
-                if kvl_list is None:
-                    self.num_bad_acct_records += 1
-                    self.logger.debug("Bad accounting record found:\n" +
-                                      record)
-                    continue
                 for kvl in kvl_list:
                     try:
                         k, v = kvl
                     except ValueError:
-                        self.num_bad_acct_records += 1
+                        num_bad += 1
                         self.logger.debug("Bad accounting record found:\n" +
                                           record)
                         skip_record = True
@@ -390,22 +447,22 @@ class ObfuscateSnapshot(object):
                         for _val in val:
                             if _val == "_pbs_project_default":
                                 obf.append(_val)
-                            elif _val not in self.val_obf_map:
-                                obf_v = PbsAttribute.random_str(
-                                    length=random.randint(8, 30))
-                                self.val_obf_map[_val] = obf_v
-                                obf.append(obf_v)
-                            else:
+                            elif _val in self.val_obf_map:
                                 obf.append(self.val_obf_map[_val])
+                            else:
+                                if _val not in new_obf:
+                                    new_obf[_val] = self._obf_value(_val)
+                                obf.append(new_obf[_val])
                         kvl[1] = "@".join(obf)
 
                 if not skip_record:
                     record = ";".join(record_list[:3]) + ";" + \
                         " ".join(["=".join(n) for n in kvl_list])
-                    newcontent.append(record + "\n")
+                    fdout.write(record + "\n")
 
-        with open(file_path, "w") as fd:
-            fd.write("".join(newcontent))
+        shutil.move(fout, file_path)
+
+        return (new_obf, num_bad)
 
     def obfuscate_acct_logs(self, snap_dir, sudo_val):
         """
@@ -427,25 +484,17 @@ class ObfuscateSnapshot(object):
         if not os.path.isdir(acct_path):
             return
         acct_fpaths = self.du.listdir(path=acct_path, sudo=sudo_val)
+        if not acct_fpaths:
+            return
 
-        # Limit the number of cores used to 10
-        ncpus = os.cpu_count()
-        ncpus = min(ncpus, 10)
-        nfiles = len(acct_fpaths)
-        i = 0
-        while i < nfiles:
-            plist = []
-            for _ in range(ncpus):
-                acct_fpath = acct_fpaths[i]
-                p = Process(target=self._obfuscate_acct_file,
-                            args=(attrs_to_obf, acct_fpath))
-                p.start()
-                plist.append(p)
-                i += 1
-                if i >= nfiles:
-                    break
-            for p in plist:
-                p.join()
+        # Obfuscated values only depend on the original values, so the
+        # values found by each process can simply be merged
+        args = [(attrs_to_obf, fpath) for fpath in acct_fpaths]
+        with self._pool(len(args)) as pool:
+            for new_obf, num_bad in pool.starmap(self._obfuscate_acct_file,
+                                                 args):
+                self.val_obf_map.update(new_obf)
+                self.num_bad_acct_records += num_bad
 
         if self.num_bad_acct_records > 0:
             self.logger.info("Total bad records found: " +
@@ -453,7 +502,8 @@ class ObfuscateSnapshot(object):
 
     def _obfuscate_with_map(self, fpath, sudo=False):
         """
-        Helper function to obfuscate a file with obfuscation map
+        Helper function to obfuscate a file with obfuscation map, the
+        map must have been compiled with _init_worker
 
         :param filepath - path to the file
         :type filepath - str
@@ -467,19 +517,23 @@ class ObfuscateSnapshot(object):
         fname = pathobj.name
         fparent = pathobj.parent
         newfpath = fpath
+        obf_map = self.val_obf_map
+        map_re = self.map_re
+        del_re = self.del_re
+        for key, val in obf_map.items():
+            if key in fname:
+                fname = fname.replace(key, val)
+                newfpath = os.path.join(fparent, fname)
         with open(fpath, "r", encoding="latin-1") as fd, \
                 open(fout, "w") as fdout:
-            alltext = fd.read()
-            # Obfuscate values from val_obf_map
-            for key, val in self.val_obf_map.items():
-                alltext = re.sub(r'\b' + key + r'\b', val, alltext)
-                if key in fname:
-                    fname = fname.replace(key, val)
-                    newfpath = os.path.join(fparent, fname)
-            # Remove the attr values from vals_to_del list
-            for val in self.vals_to_del:
-                alltext = alltext.replace(val, "")
-            fdout.write(alltext)
+            for line in fd:
+                # Obfuscate values from val_obf_map
+                if map_re is not None:
+                    line = map_re.sub(lambda m: obf_map[m.group(0)], line)
+                # Remove the attr values from vals_to_del list
+                if del_re is not None:
+                    line = del_re.sub("", line)
+                fdout.write(line)
 
         self.du.rm(path=fpath, sudo=sudo)
         shutil.move(fout, newfpath)
@@ -531,8 +585,7 @@ class ObfuscateSnapshot(object):
                     custom_rscs.append(rscs_name.strip())
         for rscs in custom_rscs:
             if rscs not in self.val_obf_map:
-                obf = PbsAttribute.random_str(length=random.randint(8, 30))
-                self.val_obf_map[rscs] = obf
+                self.val_obf_map[rscs] = self._obf_value(rscs)
 
         # Obfuscate accounting logs
         # Note: We can't rely on sed to do this because there might be logs
@@ -595,10 +648,12 @@ class ObfuscateSnapshot(object):
 
         # Now, go through the obfuscation map and replace all other instances
         # of the sensitive values in the snapshot with their obfuscated values
+        args = []
         for root, _, fnames in os.walk(snap_dir):
             for fname in fnames:
-                fpath = os.path.join(root, fname)
-                self._obfuscate_with_map(fpath, sudo=sudo_val)
+                args.append((os.path.join(root, fname), sudo_val))
+        with self._pool(len(args)) as pool:
+            pool.starmap(self._obfuscate_with_map, args)
 
         with open(map_file, "w") as fd:
             fd.write("Attributes Obfuscated:\n")
@@ -615,7 +670,7 @@ class PBSSnapUtils(object):
 
     def __init__(self, out_dir, basic=None, acct_logs=None,
                  daemon_logs=None, create_tar=False, log_path=None,
-                 with_sudo=False):
+                 with_sudo=False, nprocs=1, log_size_limit=None):
         self.out_dir = out_dir
         self.basic = basic
         self.acct_logs = acct_logs
@@ -623,13 +678,16 @@ class PBSSnapUtils(object):
         self.create_tar = create_tar
         self.log_path = log_path
         self.with_sudo = with_sudo
+        self.nprocs = nprocs
+        self.log_size_limit = log_size_limit
         self.utils_obj = None
 
     def __enter__(self):
         self.utils_obj = _PBSSnapUtils(self.out_dir, self.basic,
                                        self.acct_logs, self.srvc_logs,
                                        self.create_tar, self.log_path,
-                                       self.with_sudo)
+                                       self.with_sudo, self.nprocs,
+                                       self.log_size_limit)
         return self.utils_obj
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -647,7 +705,7 @@ class _PBSSnapUtils(object):
 
     def __init__(self, out_dir, basic=None, acct_logs=None,
                  daemon_logs=None, create_tar=False, log_path=None,
-                 with_sudo=False):
+                 with_sudo=False, nprocs=1, log_size_limit=None):
         """
         Initialize a PBSSnapUtils object with the arguments specified
 
@@ -665,6 +723,13 @@ class _PBSSnapUtils(object):
         :type log_path: str or None
         :param with_sudo: Capture relevant information with sudo?
         :type with_sudo: bool
+        :param nprocs: number of captures to run concurrently in
+                       capture_all
+        :type nprocs: int
+        :param log_size_limit: maximum number of bytes of logs to
+                               capture, the most recent logs of all
+                               directories are kept first. No limit if None
+        :type log_size_limit: int or None
         """
         self.logger = logging.getLogger(__name__)
         self.du = DshUtils()
@@ -687,6 +752,15 @@ class _PBSSnapUtils(object):
         self.outtar_path = None
         self.outtar_fd = None
         self.create_tar = create_tar
+        self.compress_level = 6
+        self.tar_lock = threading.Lock()
+        self.nprocs = max(1, int(nprocs))
+        self.log_size_left = log_size_limit
+        self.log_size_lock = threading.Lock()
+        # (log file, snapshot log dir, sudo) of the logs whose capture
+        # waits for the log size budget to be shared, see
+        # __capture_queued_logs
+        self.log_queue = None
         self.snapshot_name = None
         self.with_sudo = with_sudo
         self.log_path = log_path
@@ -935,7 +1009,8 @@ class _PBSSnapUtils(object):
         os.mkdir(self.snapdir)
 
         if self.create_tar:
-            self.outtar_fd = tarfile.open(self.outtar_path, "w:gz")
+            self.outtar_fd = tarfile.open(self.outtar_path, "w:gz",
+                                          compresslevel=self.compress_level)
 
         dirs_in_snapshot = [SYS_DIR, CORE_DIR]
         if self.server_up:
@@ -1107,7 +1182,8 @@ quit()
     def __capture_logs(self, pbs_logdir, snap_logdir, num_days_logs,
                        sudo=False):
         """
-        Capture specific logs for the days mentioned
+        Capture specific logs for the days mentioned, or only queue
+        them while log_queue is set
 
         :param pbs_logdir: path to the PBS logs directory (source)
         :type pbs_logdir: str
@@ -1141,23 +1217,121 @@ quit()
         if not os.path.isdir(snap_logdir):
             os.makedirs(snap_logdir)
 
-        # Go over the list and copy over each log file
-        for pbs_logfile in pbs_logfiles:
-            snap_logfile = os.path.join(snap_logdir,
-                                        os.path.basename(pbs_logfile))
-            pbs_logfile = pbs_logfile
-            self.du.run_copy(src=pbs_logfile, dest=snap_logfile,
-                             recursive=False,
-                             preserve_permission=False,
-                             sudo=sudo)
-            if sudo:
-                # Copying files with sudo makes root the owner, set it to the
-                # current user
-                self.du.chown(path=snap_logfile, uid=os.getuid(),
-                              gid=os.getgid(), sudo=self.with_sudo)
-
-            if self.create_tar:
-                self.__add_to_archive(snap_logfile)
+        if self.log_queue is not None:
+            with self.log_size_lock:
+                self.log_queue.extend([(f, snap_logdir, sudo)
+                                       for f in pbs_logfiles])
+            return
+
+        # Go over the list, most recent first, and copy over each log file
+        for pbs_logfile in sorted(pbs_logfiles, reverse=True):
+            if not self.__reserve_log_size(pbs_logfile, sudo):
+                self.logger.info("Log size limit reached, skipping " +
+                                 pbs_logfile)
+                continue
+            self.__capture_log(pbs_logfile, snap_logdir, sudo)
+
+    def __capture_log(self, pbs_logfile, snap_logdir, sudo=False):
+        """
+        Capture a single log file
+
+        :param pbs_logfile: path to the log file
+        :type pbs_logfile: str
+        :param snap_logdir: path to the snapshot logs directory
+        :type snap_logdir: str
+        :param sudo: copy the log with sudo?
+        :type sudo: bool
+        """
+        snap_logfile = os.path.join(snap_logdir,
+                                    os.path.basename(pbs_logfile))
+        if (self.create_tar and not sudo and
+                os.access(pbs_logfile, os.R_OK)):
+            # Stream the log straight into the tarball
+            self.__add_to_archive(snap_logfile, pbs_logfile,
+                                  remove=False)
+            return
+        self.du.run_copy(src=pbs_logfile, dest=snap_logfile,
+                         recursive=False,
+                         preserve_permission=False,
+                         sudo=sudo)
+        if sudo:
+            # Copying files with sudo makes root the owner, set it to the
+            # current user
+            self.du.chown(path=snap_logfile, uid=os.getuid(),
+                          gid=os.getgid(), sudo=self.with_sudo)
+
+        if self.create_tar:
+            self.__add_to_archive(snap_logfile)
+
+    def __queue_logs(self):
+        """
+        Have __capture_logs queue the log files instead of capturing
+        them, when there is a log size budget to share between several
+        log directories
+        """
+        if self.log_size_left is not None:
+            self.log_queue = []
+
+    def __capture_queued_logs(self, pool=None):
+        """
+        Capture the queued log files, the budget being reserved for the
+        most recent logs first across all the log directories, so that
+        what is kept does not depend on the order in which the
+        directories were listed
+
+        :param pool: if set, the executor copying the logs concurrently
+        :type pool: ThreadPoolExecutor or None
+        """
+        if self.log_queue is None:
+            return
+        queue = self.log_queue
+        self.log_queue = None
+        # Log files are named after their day
+        queue.sort(key=lambda q: (os.path.basename(q[0]), q[0]),
+                   reverse=True)
+        kept = []
+        for (pbs_logfile, snap_logdir, sudo) in queue:
+            if not self.__reserve_log_size(pbs_logfile, sudo):
+                self.logger.info("Log size limit reached, skipping " +
+                                 pbs_logfile)
+                continue
+            kept.append((pbs_logfile, snap_logdir, sudo))
+        if pool is None:
+            for args in kept:
+                self.__capture_log(*args)
+            return
+        futures = [pool.submit(self.__capture_log, *args) for args in kept]
+        for future in futures:
+            future.result()
+
+    def __reserve_log_size(self, pbs_logfile, sudo=False):
+        """
+        Take the size of a log file out of the log size budget
+
+        :param pbs_logfile: path to the log file
+        :type pbs_logfile: str
+        :param sudo: stat the log file with sudo?
+        :type sudo: bool
+
+        :returns: False if the log file does not fit in what is left of
+                  the budget, True otherwise
+        """
+        if self.log_size_left is None:
+            return True
+        try:
+            size = os.path.getsize(pbs_logfile)
+        except OSError:
+            ret = self.du.run_cmd(cmd=["stat", "-c", "%s", pbs_logfile],
+                                  sudo=sudo, logerr=False,
+                                  level=logging.DEBUG)
+            if ret['rc'] != 0 or not ret['out']:
+                return True
+            size = int(ret['out'][0])
+        with self.log_size_lock:
+            if size > self.log_size_left:
+                return False
+            self.log_size_left -= size
+        return True
 
     def __evaluate_core_file(self, file_path, core_dir):
         """
@@ -1321,7 +1495,7 @@ quit()
         self.__copy_dir_with_core(pbs_mom_priv, snap_mom_priv, core_dir,
                                   sudo=self.with_sudo)
 
-    def __add_to_archive(self, dest_path, src_path=None):
+    def __add_to_archive(self, dest_path, src_path=None, remove=True):
         """
         Add a file to the output tarball and delete the original file
 
@@ -1329,6 +1503,8 @@ quit()
         :type dest_path: str
         :param src_path: path to the file to add, if different than dest_path
         :type src_path: str
+        :param remove: delete the original file?
+        :type remove: bool
         """
         if src_path is None:
             src_path = dest_path
@@ -1340,10 +1516,12 @@ quit()
         dest_relpath = os.path.relpath(dest_path, self.snapdir)
         path_in_tar = os.path.join(self.snapshot_name, dest_relpath)
         try:
-            self.outtar_fd.add(src_path, arcname=path_in_tar)
+            with self.tar_lock:
+                self.outtar_fd.add(src_path, arcname=path_in_tar)
 
             # Remove original file
-            os.remove(src_path)
+            if remove:
+                os.remove(src_path)
         except OSError:
             self.logger.error(
                 "File %s could not be added to tarball" % (src_path))
@@ -1860,6 +2038,7 @@ quit()
         :returns: name of the output directory/tarfile containing the snapshot
         """
         self.logger.info("capturing PBS logs")
+        self.__queue_logs()
 
         if self.num_daemon_logs > 0:
             # Capture server logs
@@ -1899,6 +2078,7 @@ quit()
         if self.num_acct_logs > 0:
             # Capture accounting logs
             self.__capture_acct_logs()
+        self.__capture_queued_logs()
 
         if self.create_tar:
             return self.outtar_path
@@ -1909,28 +2089,47 @@ quit()
         """
         Capture a snapshot from the PBS system
 
+        The captures are independent of each other, when nprocs is
+        more than 1 they run concurrently. With a log size limit, the
+        logs are captured once all the log directories are known.
+
         :returns: name of the output directory/tarfile containing the snapshot
         """
-        # Capture Server related information
-        self.capture_server(with_svr_logs=True, with_acct_logs=True)
-        # Capture scheduler information
-        self.capture_scheduler(with_sched_logs=True)
-        # Capture jobs related information
-        self.capture_jobs()
-        # Capture nodes relateed information
-        self.capture_nodes(with_mom_logs=True)
-        # Capture comm related information
-        self.capture_comms(with_comm_logs=True)
-        # Capture hooks related information
-        self.capture_hooks()
-        # Capture reservations related information
-        self.capture_reservations()
-        # Capture datastore related information
-        self.capture_datastore(with_db_logs=True)
-        # Capture pbs.conf
-        self.capture_pbs_conf()
-        # Capture system related information
-        self.capture_system_info()
+        captures = [
+            # Capture Server related information
+            (self.capture_server, {"with_svr_logs": True,
+                                   "with_acct_logs": True}),
+            # Capture scheduler information
+            (self.capture_scheduler, {"with_sched_logs": True}),
+            # Capture jobs related information
+            (self.capture_jobs, {}),
+            # Capture nodes relateed information
+            (self.capture_nodes, {"with_mom_logs": True}),
+            # Capture comm related information
+            (self.capture_comms, {"with_comm_logs": True}),
+            # Capture hooks related information
+            (self.capture_hooks, {}),
+            # Capture reservations related information
+            (self.capture_reservations, {}),
+            # Capture datastore related information
+            (self.capture_datastore, {"with_db_logs": True}),
+            # Capture pbs.conf
+            (self.capture_pbs_conf, {}),
+            # Capture system related information
+            (self.capture_system_info, {})
+        ]
+        self.__queue_logs()
+        if self.nprocs > 1:
+            with ThreadPoolExecutor(max_workers=self.nprocs) as pool:
+                futures = [pool.submit(func, **kwargs)
+                           for (func, kwargs) in captures]
+                for future in futures:
+                    future.result()
+                self.__capture_queued_logs(pool)
+        else:
+            for (func, kwargs) in captures:
+                func(**kwargs)
+            self.__capture_queued_logs()
 
         if self.create_tar:
             return self.outtar_path
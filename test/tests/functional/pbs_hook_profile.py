@@ -0,0 +1,119 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+import json
+
+from tests.functional import *
+
+
+class TestHookProfile(TestFunctional):
+    """
+    This test suite tests the opt-in profiling of the hook scripts
+    """
+
+    hook_content = """
+import pbs
+e = pbs.event()
+e.job.Resource_List['ncpus'] = 1
+pbs.logmsg(pbs.LOG_DEBUG, "hook called for %s" % e.hook_name)
+e.accept()
+"""
+
+    def setUp(self):
+        TestFunctional.setUp(self)
+        self.env_file = os.path.join(self.server.pbs_conf['PBS_HOME'],
+                                     'pbs_environment')
+        self.profile = os.path.join(self.server.pbs_conf['PBS_HOME'],
+                                    'hook_profile', 'phook.json')
+        self.du.rm(self.server.hostname, self.profile, sudo=True,
+                   force=True)
+
+    def restart_server(self, environ):
+        """
+        Set the given environment in pbs_environment and restart the
+        server so that it is taken into account
+        """
+        if environ:
+            self.du.set_pbs_environment(self.server.hostname,
+                                        fin=self.env_file, environ=environ)
+        else:
+            self.du.unset_pbs_environment(self.server.hostname,
+                                          fin=self.env_file,
+                                          environ=['PBS_HOOK_PROFILE'])
+        self.server.restart()
+
+    def test_queuejob_hook_profile(self):
+        """
+        Test that with PBS_HOOK_PROFILE set, the runs of a queuejob hook
+        and the calls they make are added to the summary file of the hook
+        """
+        self.restart_server({'PBS_HOOK_PROFILE': '1'})
+        self.addCleanup(self.restart_server, None)
+        hook_attr = {'enabled': 'true', 'event': 'queuejob'}
+        self.server.create_import_hook('phook', hook_attr,
+                                       self.hook_content)
+        for _ in range(3):
+            self.server.submit(Job(TEST_USER))
+
+        ret = self.du.cat(self.server.hostname, self.profile, sudo=True)
+        self.assertEqual(ret['rc'], 0)
+        summary = json.loads('\n'.join(ret['out']))
+        self.assertEqual(summary['hook'], 'phook')
+        s = summary['events']['queuejob']
+        self.assertEqual(s['runs'], 3)
+        self.assertGreater(s['wall'], 0)
+        self.assertGreaterEqual(s['wall'], s['max_wall'])
+        for p in ('_event.accept', 'PbsAttributeDescriptor.__get__',
+                  'PbsAttributeDescriptor.__set__', '_IS_SETTABLE',
+                  '_pbs_v1.event', '_pbs_v1.logmsg'):
+            self.assertIn(p, s['calls'])
+        self.assertEqual(s['calls']['_event.accept'][0], 3)
+        self.assertGreater(s['c_calls'], 0)
+
+    def test_hook_profile_disabled(self):
+        """
+        Test that hooks are not profiled when PBS_HOOK_PROFILE is not set
+        """
+        hook_attr = {'enabled': 'true', 'event': 'queuejob'}
+        self.server.create_import_hook('phook', hook_attr,
+                                       self.hook_content)
+        self.server.submit(Job(TEST_USER))
+        self.assertFalse(self.du.isfile(self.server.hostname,
+                                        path=self.profile, sudo=True))
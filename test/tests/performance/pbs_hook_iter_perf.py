@@ -0,0 +1,97 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from tests.performance import *
+
+
+class TestHookIterPerf(TestPerformance):
+    """
+    Performance of walking the vnodes of a large complex from an
+    exechost_periodic hook
+    """
+
+    hook_body = """
+import pbs
+import time
+
+s = pbs.server()
+t = time.time()
+n = [v.name for v in s.vnodes()
+     if (v.resources_available['ncpus'] or 0) >= 8]
+t1 = time.time() - t
+t = time.time()
+m = [v.name for v in s.vnodes(attribs=['resources_available.ncpus'],
+                              select={'resources_available.ncpus':
+                                      ('ge', 8)})]
+t2 = time.time() - t
+pbs.logmsg(pbs.LOG_DEBUG, 'vnodes walk %d %f selected %d %f' %
+           (len(n), t1, len(m), t2))
+pbs.event().accept()
+"""
+
+    @timeout(3600)
+    def test_hook_vnodes_select(self):
+        """
+        Measure the time an exechost_periodic hook takes to find a
+        handful of vnodes, walking all the vnodes and with selection
+        criteria
+        Test Params: 'No_of_vnodes': 5000
+        """
+        nvnodes = int(self.conf.get('No_of_vnodes', 5000))
+
+        a = {'resources_available.ncpus': 1}
+        self.mom.create_vnodes(a, nvnodes, expect=False, sharednode=False)
+        self.server.expect(NODE, {'state=free': (GE, nvnodes)})
+        vn = self.mom.shortname + '[0]'
+        self.server.manager(MGR_CMD_SET, NODE,
+                            {'resources_available.ncpus': 8}, id=vn)
+
+        now = time.time()
+        a = {'event': 'exechost_periodic', 'enabled': 'True', 'freq': 30}
+        self.server.create_import_hook('hkiter', a, self.hook_body)
+        msg = self.mom.log_match('vnodes walk', starttime=now,
+                                 max_attempts=120, interval=2)
+        f = msg[1].split()
+        self.assertEqual(f[-5], f[-2])
+        t1, t2 = float(f[-4]), float(f[-1])
+        self.logger.info('%d vnodes walked in %f sec, selected in %f sec'
+                         % (nvnodes, t1, t2))
+        self.perf_test_result(t1, 'hook_vnodes_walk_time', 'sec')
+        self.perf_test_result(t2, 'hook_vnodes_select_time', 'sec')
@@ -0,0 +1,112 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+import os
+
+from tests.performance import *
+
+
+class TestHookMemoryPerf(TestPerformance):
+    """
+    Memory usage of the server hook interpreter over many hook events
+    """
+
+    hook_body = """
+import pbs
+
+e = pbs.event()
+j = e.job
+j.comment = 'altered %s' % (j.Priority,)
+j.Resource_List['walltime'] = pbs.duration('00:10:00')
+j.Resource_List['ncpus'] = 1
+e.accept()
+"""
+
+    def server_rss(self):
+        """
+        Resident set size of the server in kB
+        """
+        pid = self.server.get_pid()
+        ret = self.du.run_cmd(self.server.hostname,
+                              ['ps', '-o', 'rss=', '-p', str(pid)])
+        return int(ret['out'][0].strip())
+
+    @timeout(14400)
+    def test_modifyjob_hook_memory(self):
+        """
+        Test that the memory of the server stays flat across 100k
+        modifyjob hook events that set job attributes and resources
+        Test Params: 'No_of_hook_events': 100000,
+                     'No_of_samples': 10
+        """
+        num = int(self.conf.get('No_of_hook_events', 100000))
+        samples = int(self.conf.get('No_of_samples', 10))
+
+        # keep the hook interpreter from being restarted, so that any
+        # growth is seen rather than reset
+        a = {'python_restart_max_hooks': 2 ** 30,
+             'python_restart_max_objects': 2 ** 30}
+        self.server.manager(MGR_CMD_SET, SERVER, a)
+        a = {'event': 'modifyjob', 'enabled': 'True'}
+        self.server.create_import_hook('hkmem', a, self.hook_body)
+
+        j = Job(TEST_USER, attrs={ATTR_h: None})
+        jid = self.server.submit(j)
+        qalter = os.path.join(self.server.pbs_conf['PBS_EXEC'], 'bin',
+                              'qalter')
+        batch = num // samples
+        cmd = 'for i in $(seq %d); do %s -p $((i %% 1000)) %s; done' % (
+            batch, qalter, jid)
+
+        rss = []
+        for _ in range(samples):
+            self.du.run_cmd(self.server.hostname, cmd, runas=TEST_USER,
+                            as_script=True, level=logging.DEBUG)
+            rss.append(self.server_rss())
+            self.logger.info('server rss after %d hook events: %d kB' %
+                             (batch * len(rss), rss[-1]))
+        self.server.expect(JOB, {ATTR_comment: (MATCH, 'altered')}, id=jid)
+
+        # the first batch warms the interpreter up, the rest must not grow
+        growth = rss[-1] - rss[0]
+        self.perf_test_result(rss[0], 'server_rss_warm', 'kB')
+        self.perf_test_result(rss[-1], 'server_rss_end', 'kB')
+        self.perf_test_result(growth, 'server_rss_growth', 'kB')
+        self.assertLess(growth, max(rss[0] // 10, 10240))
@@ -0,0 +1,91 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from tests.performance import *
+
+
+class TestHookResourcePerf(TestPerformance):
+    """
+    Performance of resource assignments in hooks on a server with
+    many custom resources
+    """
+
+    hook_body = """
+import pbs
+import time
+
+e = pbs.event()
+rl = e.job.Resource_List
+t = time.time()
+for i in range(%d):
+    rl['ncpus'] = 1
+    rl['WALLTIME'] = pbs.duration(600)
+    rl['hkres%%d' %% (i %% %d)] = i
+t = time.time() - t
+pbs.logmsg(pbs.LOG_DEBUG, 'resource assignment time %%f' %% t)
+e.accept()
+"""
+
+    @timeout(3600)
+    def test_hook_resource_assignment(self):
+        """
+        Measure the time a queuejob hook takes to assign resources
+        with hundreds of custom resources defined
+        Test Params: 'No_of_resources': 500,
+                     'No_of_assignments': 10000
+        """
+        nres = int(self.conf.get('No_of_resources', 500))
+        nset = int(self.conf.get('No_of_assignments', 10000))
+
+        for i in range(nres):
+            self.server.manager(MGR_CMD_CREATE, RSC, {'type': 'long'},
+                                id='hkres%d' % i)
+        a = {'event': 'queuejob', 'enabled': 'True'}
+        self.server.create_import_hook('hkres', a,
+                                       self.hook_body % (nset, nres))
+
+        now = time.time()
+        self.server.submit(Job(TEST_USER))
+        msg = self.server.log_match('resource assignment time',
+                                    starttime=now)
+        t = float(msg[1].split()[-1])
+        self.logger.info('%d resource assignments with %d custom '
+                         'resources: %f sec' % (3 * nset, nres, t))
+        self.perf_test_result(t, 'hook_resource_assignment_time', 'sec')
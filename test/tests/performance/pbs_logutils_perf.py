@@ -0,0 +1,84 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from datetime import datetime
+
+from tests.performance import *
+from ptl.utils.pbs_logutils import PBSLogUtils
+
+
+class TestLogUtilsPerf(TestPerformance):
+
+    """
+    Performance of the PTL log utilities
+    """
+
+    def test_convert_date_time_perf(self):
+        """
+        Compare the time taken by PBSLogUtils.convert_date_time to
+        convert the timestamps of a day of log records, with and
+        without microseconds, to that of datetime.strptime
+        """
+        num = 200000
+        start = int(time.time()) - 86400
+        dts = [time.strftime('%m/%d/%Y %H:%M:%S',
+                             time.localtime(start + i * 86400 // num))
+               for i in range(num)]
+        for fmt, dtl in (('%m/%d/%Y %H:%M:%S', dts),
+                         ('%m/%d/%Y %H:%M:%S.%f',
+                          [dt + '.%06d' % (i % 1000000)
+                           for i, dt in enumerate(dts)])):
+            t = time.time()
+            slow = [datetime.strptime(dt, fmt).timestamp() for dt in dtl]
+            slow_time = time.time() - t
+            t = time.time()
+            fast = [PBSLogUtils.convert_date_time(dt) for dt in dtl]
+            fast_time = time.time() - t
+            if '.' not in dtl[0]:
+                slow = [int(tm) for tm in slow]
+            self.assertEqual(slow, fast)
+            name = 'convert_date_time'
+            if '.' in dtl[0]:
+                name += '_microsec'
+            self.logger.info('%s: strptime %.2fs, convert_date_time %.2fs' %
+                             (name, slow_time, fast_time))
+            self.perf_test_result(slow_time, name + '_strptime', 'sec')
+            self.perf_test_result(fast_time, name, 'sec')
+            self.assertLess(fast_time, slow_time)
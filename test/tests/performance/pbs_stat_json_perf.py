@@ -0,0 +1,176 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+
+
+import json
+
+from tests.performance import *
+
+
+class TestStatJsonPerf(TestPerformance):
+
+    """
+    Performance of parsing the text and JSON outputs of qstat and
+    pbsnodes
+    """
+
+    def gen_qstat_outputs(self, num):
+        """
+        Generate the ``qstat -f`` and ``qstat -f -F json`` outputs of
+        num synthetic running jobs
+        """
+        text = []
+        jobs = {}
+        for i in range(num):
+            jid = '%d.pbsserver' % i
+            user = 'user%d' % (i % 100)
+            job = {
+                'Job_Name': 'STDIN',
+                'Job_Owner': user + '@pbsclient',
+                'job_state': 'R',
+                'queue': 'workq',
+                'ctime': 'Mon Oct 12 10:00:00 2026',
+                'exec_host': 'node%d/0*2' % (i % 1000),
+                'exec_vnode': '(node%d:ncpus=2:mem=1048576kb)' % (i % 1000),
+                'Resource_List': {'ncpus': 2, 'mem': '1gb', 'nodect': 1,
+                                  'select': '1:ncpus=2:mem=1gb'},
+                'resources_used': {'cput': '00:00:01', 'cpupercent': 0},
+                'Variable_List': {'PBS_O_HOME': '/home/' + user,
+                                  'PBS_O_LOGNAME': user,
+                                  'PBS_O_QUEUE': 'workq',
+                                  'PBS_O_HOST': 'pbsclient',
+                                  'HOSTS': 'node1,node2',
+                                  'FACTOR': '1.50'},
+                'euser': user,
+                'egroup': 'users',
+                'substate': 42,
+            }
+            jobs[jid] = job
+            text.append('Job Id: ' + jid)
+            for k, v in job.items():
+                if k == 'Variable_List':
+                    # qstat escapes the commas of the values and wraps
+                    # long values on lines that start with a tab
+                    v = ','.join([n + '=' + s.replace(',', '\\,')
+                                  for n, s in v.items()])
+                    text.append('    %s = %s' % (k, v[:40]))
+                    text.append('\t' + v[40:])
+                elif isinstance(v, dict):
+                    for r, rv in v.items():
+                        text.append('    %s.%s = %s' % (k, r, rv))
+                else:
+                    text.append('    %s = %s' % (k, v))
+            text.append('')
+        out = json.dumps({'timestamp': int(time.time()),
+                          'pbs_version': '20.0.0',
+                          'pbs_server': 'pbsserver',
+                          'Jobs': jobs}, indent=4)
+        # qstat prints numeric values as numbers, as they are given
+        out = out.replace('"1.50"', '1.50')
+        return text, out.split('\n')
+
+    def gen_pbsnodes_outputs(self, num):
+        """
+        Generate the ``pbsnodes -av`` and ``pbsnodes -av -F json``
+        outputs of num synthetic nodes each running a job on 2 slots
+        """
+        text = []
+        nodes = {}
+        for i in range(num):
+            name = 'node%d' % i
+            jid = '%d.pbsserver' % i
+            text += [name,
+                     '     Mom = ' + name,
+                     '     state = job-busy',
+                     '     pcpus = 2',
+                     '     jobs = %s/0, %s/1' % (jid, jid),
+                     '     resources_available.ncpus = 2',
+                     '     resources_available.mem = 4gb',
+                     '     resources_assigned.ncpus = 2',
+                     '     resources_assigned.mem = 0kb',
+                     '']
+            # pbsnodes drops the slots of the jobs and the zero
+            # resources_assigned from its JSON output
+            nodes[name] = {'Mom': name, 'state': 'job-busy', 'pcpus': 2,
+                           'jobs': [jid],
+                           'resources_available': {'ncpus': 2,
+                                                   'mem': '4gb'},
+                           'resources_assigned': {'ncpus': 2}}
+        out = json.dumps({'timestamp': int(time.time()),
+                          'pbs_version': '20.0.0',
+                          'pbs_server': 'pbsserver',
+                          'nodes': nodes}, indent=4)
+        return text, out.split('\n')
+
+    def test_stat_json_perf(self):
+        """
+        Compare the time taken to convert the text and JSON outputs
+        of a 100k jobs qstat -f into the same dictlist
+        """
+        text, out = self.gen_qstat_outputs(100000)
+        utils = self.server.utils
+        t = time.time()
+        text_bsl = utils.convert_to_dictlist(text, mergelines=True,
+                                             obj_type=JOB)
+        text_time = time.time() - t
+        t = time.time()
+        json_bsl = utils.convert_json_to_dictlist(out, obj_type=JOB)
+        json_time = time.time() - t
+        self.assertEqual(text_bsl, json_bsl)
+        self.logger.info('convert 100k jobs: text %.2fs, JSON %.2fs' %
+                         (text_time, json_time))
+        self.perf_test_result(text_time, 'convert_to_dictlist_text', 'sec')
+        self.perf_test_result(json_time, 'convert_json_to_dictlist', 'sec')
+        self.assertLess(json_time, text_time)
+
+    def test_stat_json_nodes(self):
+        """
+        Check that nodes are stat'ed through the text output of
+        pbsnodes, its JSON output not holding the zero
+        resources_assigned nor the slots of the jobs
+        """
+        self.assertNotIn(NODE, self.server.stat_json_types)
+        self.assertNotIn(VNODE, self.server.stat_json_types)
+        text, out = self.gen_pbsnodes_outputs(1000)
+        utils = self.server.utils
+        text_bsl = utils.convert_to_dictlist(text, obj_type=NODE)
+        json_bsl = utils.convert_json_to_dictlist(out, obj_type=NODE)
+        self.assertNotEqual(text_bsl, json_bsl)
+        self.assertEqual(text_bsl[0]['jobs'],
+                         '0.pbsserver/0, 0.pbsserver/1')
+        self.assertEqual(json_bsl[0]['jobs'], '0.pbsserver')
+        self.assertNotIn('resources_assigned.mem', json_bsl[0])
+        self.assertEqual(text_bsl[0]['pcpus'], json_bsl[0]['pcpus'])
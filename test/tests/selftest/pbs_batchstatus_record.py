@@ -0,0 +1,106 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+import copy
+
+from tests.selftest import *
+from ptl.lib.ptl_batchutils import BatchStatusRecord
+
+
+class TestBatchStatusRecord(TestSelf):
+    """
+    Test the compact batch status records of PTL objects
+    """
+
+    def test_record_access(self):
+        """
+        Test that a BatchStatusRecord behaves like a dictionary and
+        that records with the same attributes share their layout
+        """
+        r1 = BatchStatusRecord({'id': '1.svr', 'job_state': 'R'})
+        r2 = BatchStatusRecord({'id': '2.svr', 'job_state': 'Q'})
+        self.assertIs(r1._layout, r2._layout)
+        self.assertEqual(r1, {'id': '1.svr', 'job_state': 'R'})
+        r1['queue'] = 'workq'
+        r2['queue'] = 'workq'
+        self.assertIs(r1._layout, r2._layout)
+        self.assertEqual(list(r1.keys()), ['id', 'job_state', 'queue'])
+        del r1['job_state']
+        self.assertNotIn('job_state', r1)
+        self.assertEqual(r1.get('job_state', 'X'), 'X')
+        self.assertEqual(len(r1), 2)
+        r3 = copy.deepcopy(r2)
+        r3['job_state'] = 'R'
+        self.assertEqual(r2['job_state'], 'Q')
+
+    def test_update_attributes_record(self):
+        """
+        Test that the attributes of the jobs stat'ed by the server
+        are kept in records that are updated in place
+        """
+        j = Job(TEST_USER)
+        jid = self.server.submit(j)
+        self.server.expect(JOB, {'job_state': 'R'}, id=jid)
+        self.server.status(JOB, id=jid)
+        attrs = self.server.jobs[jid].attributes
+        self.assertIsInstance(attrs, BatchStatusRecord)
+        self.assertEqual(attrs['job_state'], 'R')
+        self.server.holdjob(jid, USER_HOLD)
+        self.server.rerunjob(jid)
+        self.server.expect(JOB, {'job_state': 'H'}, id=jid)
+        self.server.status(JOB, id=jid)
+        self.assertEqual(self.server.jobs[jid].attributes['job_state'], 'H')
+
+    def test_status_objects(self):
+        """
+        Test that status can leave the job objects untouched or only
+        create them on first access
+        """
+        j = Job(TEST_USER)
+        jid = self.server.submit(j)
+        self.server.expect(JOB, {'job_state': 'R'}, id=jid)
+        del self.server.jobs[jid]
+        self.server.status(JOB, id=jid, objects=False)
+        self.assertNotIn(jid, self.server.jobs)
+        self.server.status(JOB, id=jid, objects=PTL_LAZY)
+        self.assertIn(jid, self.server.jobs)
+        self.assertTrue(self.server.jobs.is_pending(jid))
+        self.assertEqual(self.server.jobs[jid].attributes['job_state'], 'R')
+        self.assertFalse(self.server.jobs.is_pending(jid))
@@ -0,0 +1,69 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from tests.selftest import *
+from ptl.lib.ptl_types import PbsAttribute
+
+
+class TestDecodeValue(TestSelf):
+    """
+    Test the memoized decoding of attribute values
+    """
+
+    def test_decode_value_cache(self):
+        """
+        Test that decoded values are the same whether they come from
+        the cache or not and that the cache hits are counted
+        """
+        PbsAttribute.clear_decode_cache()
+        exp = {'10': 10, '4gb': 4194304, '2048b': 2, '1.5': 1.5,
+               'True': 'True', '01:00:00': 3600, 'workq': 'workq',
+               '1.5gb': '1.5gb', '': ''}
+        for _ in range(2):
+            for v, d in exp.items():
+                self.assertEqual(PbsAttribute.decode_value(v), d)
+        info = PbsAttribute.decode_cache_info()
+        self.assertEqual(info['misses'], len(exp))
+        self.assertEqual(info['hits'], len(exp))
+        self.assertEqual(info['size'], len(exp))
+        self.assertEqual(PbsAttribute.decode_value(None), None)
+        self.assertEqual(PbsAttribute.decode_value(3), 3)
+        PbsAttribute.clear_decode_cache()
+        self.assertEqual(PbsAttribute.decode_cache_info()['size'], 0)
@@ -185,3 +185,28 @@ class TestDshUtils(TestSelf):
                                          asgroup=TSTGRP3)
         self.check_access(tmpdir, mode=0o770, user=TEST_USER2, group=TSTGRP3,
                           host=remote)
+
+    def test_run_cmd_parallel(self):
+        """
+        Test running a command on several hosts concurrently and
+        with a timeout, including a command run through sudo
+        """
+        # two names of the local host, results are keyed by name
+        other = 'localhost'
+        if other == self.server.hostname:
+            other = '127.0.0.1'
+        hosts = [self.server.hostname, other]
+        st = time.time()
+        ret = self.du.run_cmd(hosts, ['sleep', '2'], parallel=2)
+        self.assertLess(time.time() - st, 4)
+        self.assertEqual(ret['rc'], 0)
+        self.assertEqual(list(ret['hosts']), hosts)
+        ret = self.du.run_cmd(self.server.hostname, ['sleep', '10'],
+                              timeout=1)
+        self.assertNotEqual(ret['rc'], 0)
+        self.assertNotIn('hosts', ret)
+        st = time.time()
+        ret = self.du.run_cmd(self.server.hostname, ['sleep', '10'],
+                              sudo=True, timeout=1)
+        self.assertLess(time.time() - st, 10)
+        self.assertNotEqual(ret['rc'], 0)
@@ -0,0 +1,131 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from tests.selftest import *
+from ptl.lib.ptl_types import PbsAttribute
+
+
+class TestEquivClassIndex(TestSelf):
+    """
+    Test the incrementally updated index of equivalence classes
+    """
+
+    def nodes(self):
+        """
+        Synthetic node status, with resources partly assigned
+        """
+        nodes = []
+        for i in range(10):
+            nodes.append({'id': 'n%d' % i,
+                          'state': ('free', 'job-busy')[i % 2],
+                          'resources_available.ncpus': str(4 * (i % 3 + 1)),
+                          'resources_available.mem': '%dgb' % (i % 2 + 1),
+                          'resources_assigned.ncpus': str(i % 2 * 2),
+                          'resources_assigned.mem': '%dmb' % (i % 2 * 512)})
+        # more assigned than available counts as none available
+        nodes[9]['resources_assigned.ncpus'] = '20'
+        return nodes
+
+    def classes(self, eq):
+        """
+        Comparable form of a list of equivalence classes
+        """
+        return sorted([(c.name, c.attributes, sorted(c.entities))
+                       for c in eq])
+
+    def totals(self, nodes, op):
+        """
+        Totals of the ncpus and mem of the nodes, computed directly
+        """
+        totals = {}
+        for n in nodes:
+            for r in ('ncpus', 'mem'):
+                amt = PbsAttribute.decode_value(
+                    n['resources_available.' + r])
+                if op == RESOURCES_AVAILABLE:
+                    amt -= PbsAttribute.decode_value(
+                        n['resources_assigned.' + r])
+                totals[r] = totals.get(r, 0) + max(amt, 0)
+        return totals
+
+    def test_index_updates(self):
+        """
+        Test that an index updated with the nodes that changed has the
+        classes and totals of one built from all the nodes
+        """
+        nodes = self.nodes()
+        index = self.server.equivalence_class_index(NODE, bslist=nodes)
+        self.assertEqual(self.classes(index.classes()),
+                         self.classes(self.server.equivalence_classes(
+                             NODE, bslist=nodes)))
+        self.assertEqual(index.totals(),
+                         self.totals(nodes, RESOURCES_AVAILABLE))
+        # nodes change state, get jobs or lose them
+        changed = [dict(nodes[1], **{'state': 'free',
+                                     'resources_assigned.ncpus': '0',
+                                     'resources_assigned.mem': '0kb'}),
+                   dict(nodes[2], **{'state': 'job-busy',
+                                     'resources_assigned.ncpus': '12'}),
+                   dict(nodes[4], **{'resources_available.mem': '8gb'})]
+        for n in changed:
+            nodes[int(n['id'][1:])] = n
+        index.update(changed)
+        # a node goes away and a node is added
+        index.remove(['n0'])
+        del nodes[0]
+        new = dict(nodes[0], id='n10')
+        nodes.append(new)
+        index.update([new])
+        self.assertEqual(self.classes(index.classes()),
+                         self.classes(self.server.equivalence_classes(
+                             NODE, bslist=nodes)))
+        self.assertEqual(sum(index.counts().values()), len(nodes))
+        self.assertEqual(index.totals(),
+                         self.totals(nodes, RESOURCES_AVAILABLE))
+        self.assertEqual(index.totals(RESOURCES_AVAILABLE),
+                         self.totals(nodes, RESOURCES_AVAILABLE))
+        # static totals, whatever the op of the index
+        self.assertEqual(index.totals(None), self.totals(nodes, None))
+        static = self.server.equivalence_class_index(NODE, bslist=nodes,
+                                                     op=None)
+        self.assertEqual(static.totals(), self.totals(nodes, None))
+        self.assertEqual(self.classes(static.classes()),
+                         self.classes(self.server.equivalence_classes(
+                             NODE, bslist=nodes, op=None)))
@@ -119,3 +119,52 @@ class TestExpect(TestSelf):
                             id=self.mom.shortname)
         self.server.expect(NODE, 'resources_available.ncpus',
                            op=UNSET, id=self.mom.shortname)
+
+    def test_expect_watch(self):
+        """
+        Test that expect() in watch mode matches a list of jobs and
+        counts of finished jobs, retiring the jobs as they match
+        """
+        a = {'resources_available.ncpus': 4}
+        self.server.manager(MGR_CMD_SET, NODE, a, self.mom.shortname)
+        jids = []
+        for _ in range(4):
+            j = Job(TEST_USER, {'Resource_List.walltime': 5})
+            j.set_sleep_time(2)
+            jids.append(self.server.submit(j))
+        self.server.expect(JOB, {'job_state': 'R'}, id=jids, watch=True,
+                           watch_logs=True)
+        self.server.expect(JOB, {'job_state=F': 4}, extend='x', id=jids,
+                           watch=True, interval=1)
+        with self.assertRaises(PtlExpectError):
+            self.server.expect(JOB, {'job_state': 'Q'}, id=jids[0],
+                               extend='x', watch=True, max_attempts=2,
+                               interval=1)
+
+    def test_expect_watch_batches(self):
+        """
+        Test that expect() in watch mode stats the pending jobs in
+        batches of ids, and that status() reports the known jobs of a
+        list of ids
+        """
+        a = {'resources_available.ncpus': 4}
+        self.server.manager(MGR_CMD_SET, NODE, a, self.mom.shortname)
+        jids = []
+        for _ in range(5):
+            j = Job(TEST_USER)
+            j.set_sleep_time(2)
+            jids.append(self.server.submit(j))
+        bsl = self.server.status(JOB, 'job_state', id=jids)
+        self.assertEqual(sorted([b['id'] for b in bsl]), sorted(jids))
+        if self.server.get_op_mode() == PTL_CLI:
+            unknown = '999999.' + jids[0].split('.', 1)[1]
+            bsl = self.server.status(JOB, 'job_state',
+                                     id=jids[:2] + [unknown])
+            self.assertEqual(sorted([b['id'] for b in bsl]),
+                             sorted(jids[:2]))
+        self.server.expect_watch_max_ids = 2
+        try:
+            self.server.expect(JOB, {'job_state=F': 5}, extend='x', id=jids,
+                               watch=True, interval=1)
+        finally:
+            del self.server.expect_watch_max_ids
@@ -0,0 +1,76 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from tests.selftest import *
+
+
+class TestFilterPushdown(TestSelf):
+    """
+    Test that filtering jobs through qselect gives the same jobs as
+    filtering the stat'ed jobs
+    """
+
+    def test_filter_pushdown_resources(self):
+        """
+        Test resource comparisons with the filter pushdown on and off,
+        including on a job that does not request the resource
+        """
+        self.server.add_resource('foo', 'long')
+        self.server.manager(MGR_CMD_SET, SERVER, {'scheduling': 'False'})
+        jids = []
+        for foo in (1, 2, 4, 8):
+            j = Job(TEST_USER, {'Resource_List.foo': foo})
+            jids.append(self.server.submit(j))
+        nofoo = self.server.submit(Job(TEST_USER))
+        for op in (LT, LE, EQ, GE, GT, NE):
+            a = {'Resource_List.foo': (op, 4)}
+            try:
+                self.server.filter_pushdown = True
+                pushed = self.server.filter(JOB, a)
+                self.server.filter_pushdown = False
+                stated = self.server.filter(JOB, a)
+            finally:
+                del self.server.filter_pushdown
+            self.assertEqual(pushed, stated, PTL_OP_TO_STR[op])
+            for ids in pushed.values():
+                self.assertNotIn(nofoo, ids)
+            if op == LT:
+                self.assertEqual(sorted(pushed['Resource_List.foo<4']),
+                                 sorted(jids[:2]))
@@ -0,0 +1,200 @@
+# coding: utf-8
+
+# Copyright (C) 1994-2021 Altair Engineering, Inc.
+# For more information, contact Altair at www.altair.com.
+#
+# This file is part of both the OpenPBS software ("OpenPBS")
+# and the PBS Professional ("PBS Pro") software.
+#
+# Open Source License Information:
+#
+# OpenPBS is free software. You can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# OpenPBS is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Commercial License Information:
+#
+# PBS Pro is commercially licensed software that shares a common core with
+# the OpenPBS software.  For a copy of the commercial license terms and
+# conditions, go to: (http://www.pbspro.com/agreement.html) or contact the
+# Altair Legal Department.
+#
+# Altair's dual-license business model allows companies, individuals, and
+# organizations to create proprietary derivative works of OpenPBS and
+# distribute them - whether embedded or bundled with other software -
+# under a commercial license agreement.
+#
+# Use of Altair's trademarks, including but not limited to "PBS™",
+# "OpenPBS®", "PBS Professional®", and "PBS Pro™" and Altair's logos is
+# subject to Altair's trademark licensing policies.
+
+
+from tests.selftest import *
+from ptl.lib.ptl_types import PbsAttribute
+
+
+class TestLimitsInfo(TestSelf):
+    """
+    Test the usage reported by Server.limits_info
+    """
+
+    # server and queue limits on all entity types, named and generic
+    server_limits = [{'id': 'svr',
+                      'max_run': '[u:PBS_GENERIC=2],[o:PBS_ALL=10],'
+                                 '[g:g1=3],[p:p1=1]',
+                      'max_run_res.ncpus': '[u:u1=4],[o:PBS_ALL=20],'
+                                           '[p:PBS_GENERIC=3]',
+                      'max_run_res.mem': '[g:PBS_GENERIC=2gb],[u:u3=1gb]'}]
+    queue_limits = [{'id': 'workq',
+                     'max_run': '[u:u2=1],[p:p2=3],[g:PBS_GENERIC=1]',
+                     'max_run_res.ncpus': '[g:PBS_GENERIC=8],'
+                                          '[o:PBS_ALL=6]'},
+                    {'id': 'q2',
+                     'max_run': '[o:PBS_ALL=5],[u:PBS_GENERIC=1]',
+                     'max_run_res.mem': '[p:p1=1gb]'}]
+
+    def jobs(self):
+        """
+        Synthetic jobs, some of which are not to be accounted for
+        """
+        jobs = []
+        for i in range(12):
+            jobs.append({'id': '%d.svr' % i, 'job_state': 'R',
+                         'substate': '42',
+                         'queue': ('workq', 'q2')[i % 2],
+                         'euser': 'u%d' % (i % 3 + 1),
+                         'egroup': 'g%d' % (i % 2 + 1),
+                         'project': 'p%d' % (i % 4 + 1),
+                         'Resource_List.ncpus': str(i % 3 + 1),
+                         'Resource_List.mem': '%dmb' % (512 * (i % 2 + 1))})
+        # not running, not in the running substate
+        jobs[0]['job_state'] = 'Q'
+        jobs[1]['substate'] = '41'
+        # resources not requested or of no amount
+        jobs[2]['Resource_List.ncpus'] = '0'
+        del jobs[3]['Resource_List.mem']
+        # entity attributes not set
+        del jobs[4]['project']
+        del jobs[5]['egroup']
+        del jobs[6]['euser']
+        return jobs
+
+    def old_limits_info(self, etype=None, ename=None, jobs=None,
+                        over=False):
+        """
+        limits_info as it used to be computed, filtering the jobs for
+        every limit and adding their usage up with calc_usage
+        """
+        def create_linfo(lim, entity_type, id, used):
+            tmp = {}
+            tmp['id'] = entity_type + ':' + id
+            c = [PBS_OBJ_MAP[lim.container]]
+            if lim.container_id:
+                c += [':', lim.container_id]
+            tmp['container'] = "".join(c)
+            s = [str(lim.limit_type)]
+            if lim.resource:
+                s += ['.', lim.resource]
+            tmp['limit_type'] = "".join(s)
+            tmp['usage/limit'] = "".join([str(used), '/', str(lim.value)])
+            tmp['remainder'] = int(lim.value) - int(used)
+            return tmp
+
+        def calc_usage(jobs, attr, name=None, resource=None):
+            usage = {}
+            if name is not None and name not in ('PBS_GENERIC', 'PBS_ALL'):
+                usage[name] = 0
+            for j in jobs:
+                entity = j[attr]
+                if resource:
+                    amt = int(PbsAttribute.decode_value(
+                        j['Resource_List.' + resource]))
+                else:
+                    amt = 1
+                usage[entity] = usage.get(entity, 0) + amt
+            return usage
+
+        self.server.parse_all_limits(self.server_limits, self.queue_limits)
+        linfo = []
+        entities = sorted(self.server.entities.values(), key=lambda e: e.name)
+        for entity in entities:
+            for lim in entity.limits:
+                _t = entity.type
+                if (_t != 'o') and (etype is not None and etype != _t):
+                    continue
+                _n = entity.name
+                a = {}
+                if lim.container == QUEUE and lim.container_id is not None:
+                    a['queue'] = (EQ, lim.container_id)
+                if lim.resource:
+                    a['Resource_List.' + lim.resource] = (GT, 0)
+                a['job_state'] = (EQ, 'R')
+                a['substate'] = (EQ, 42)
+                for (t, attr) in (('u', 'euser'), ('g', 'egroup'),
+                                  ('p', 'project')):
+                    if etype == t and ename is not None:
+                        a[attr] = (EQ, ename)
+                    else:
+                        a[attr] = (SET, '')
+                d = self.server.filter(JOB, a, bslist=jobs, attrop=PTL_AND,
+                                       idonly=False)
+                if not d or 'job_state=R' not in d:
+                    if ename is not None:
+                        _u = {ename: 0}
+                    else:
+                        _u = {_n: 0}
+                else:
+                    attr = {'u': 'euser', 'o': 'euser', 'g': 'egroup',
+                            'p': 'project'}[_t]
+                    _u = calc_usage(d['job_state=R'], attr, _n,
+                                    lim.resource)
+                    if _t == 'o':
+                        all_used = sum(_u.values())
+                        for k in _u.keys():
+                            _u[k] = all_used
+                for k, used in _u.items():
+                    if not over or (int(used) > int(lim.value)):
+                        if ename is not None and k != ename:
+                            continue
+                        if _n in ('PBS_GENERIC', 'PBS_ALL'):
+                            if k not in ('PBS_GENERIC', 'PBS_ALL'):
+                                k += '/' + _n
+                        elif _n != k:
+                            continue
+                        linfo.append(create_linfo(lim, _t, k, used))
+        return linfo
+
+    def test_limits_usage(self):
+        """
+        Test that the usage aggregated in a single scan of the jobs is
+        the one computed by filtering the jobs for every limit, for
+        user, group, project and overall limits at the server and
+        queue levels
+        """
+        jobs = self.jobs()
+        args = [(None, None, False), (None, None, True), ('u', None, False),
+                ('u', 'u1', False), ('u', 'u3', False), ('g', None, False),
+                ('g', 'g1', False), ('g', 'g2', True), ('p', None, False),
+                ('p', 'p1', False), ('p', 'p4', False), ('o', None, False),
+                ('u', 'nosuchuser', False)]
+        for (etype, ename, over) in args:
+            exp = self.old_limits_info(etype, ename, jobs, over)
+            got = self.server.limits_info(etype, ename, self.server_limits,
+                                          self.queue_limits, jobs,
+                                          over=over)
+            self.assertEqual(got, exp, 'etype=%s ename=%s over=%s' %
+                             (etype, ename, over))
+        # the synthetic jobs do use some of the limits
+        linfo = self.server.limits_info(server=self.server_limits,
+                                        queues=self.queue_limits, jobs=jobs)
+        self.assertTrue([li for li in linfo
+                         if not li['usage/limit'].startswith('0/')])
@@ -39,7 +39,9 @@
 
 
 from tests.selftest import *
-from ptl.utils.pbs_logutils import PBSLogUtils
+from ptl.utils.pbs_logutils import (PBSLogUtils, PBSLogAnalyzer,
+                                    PBSAccountingLog, PBSAccountingStore,
+                                    PBSLogTailer)
 
 
 class TestLogUtils(TestSelf):
@@ -111,3 +113,205 @@ class TestLogUtils(TestSelf):
                                sudo=True)
         self.assertIsNotNone(tm)
         self.assertEqual(len(tm), 1)
+
+    def test_log_match_indexed(self):
+        """
+        Test that log_match reads the server log incrementally when
+        the log index is enabled and that log_records can return the
+        records of a given job
+        """
+        self.server.clear_log_records()
+        st = time.time()
+        j = Job(TEST_USER)
+        j.set_sleep_time(1)
+        jid = self.server.submit(j)
+        self.server.expect(JOB, 'queue', op=UNSET, id=jid, offset=1)
+        self.server.log_match(jid + ";Exit_status=0", starttime=st)
+        key = (self.server.hostname, self.server.logfile)
+        tailer = self.server.log_tailers[key]
+        offset = tailer.offset
+        self.assertGreater(offset, 0)
+        self.assertIn(jid, tailer.ids)
+        # A second match only reads what was appended to the log
+        self.server.log_match(jid + ";Job Queued", starttime=st)
+        self.assertIs(self.server.log_tailers[key], tailer)
+        self.assertGreaterEqual(tailer.offset, offset)
+        recs = self.server.log_records(self.server, id=jid, n='ALL',
+                                       starttime=st)
+        self.assertTrue(recs)
+        self.assertTrue(all(r[1].find(jid) != -1 for r in recs))
+        recs = self.server.log_records(self.server, id=jid + '0',
+                                       n='ALL', starttime=st)
+        self.assertEqual(recs, [])
+
+    def test_log_tailer(self):
+        """
+        Test that a PBSLogTailer starts at the end of the log file,
+        reads older lines only when asked for them and drops the lines
+        that precede those returned
+        """
+        logdir = self.du.create_temp_dir()
+        logfile = os.path.join(logdir, '20240110')
+        t0 = int(time.mktime((2024, 1, 10, 0, 0, 0, 0, 0, -1)))
+
+        def line(i):
+            tm = time.strftime('%m/%d/%Y %H:%M:%S', time.localtime(t0 + i))
+            return '%s;0100;Server@svr;Job;%d.svr;msg %d' % (tm, i % 7, i)
+        with open(logfile, 'w') as f:
+            for i in range(5000):
+                f.write(line(i) + '\n')
+        tailer = PBSLogTailer(logfile)
+        tailer.chunk_size = 4096
+        self.assertEqual(tailer.update(), 0)
+        self.assertGreater(tailer.start, 0)
+        self.assertLess(len(tailer.lines), 5000)
+        recs = tailer.get_records(n=50, trim=True)
+        self.assertEqual([r[1] for r in recs],
+                         [line(i) for i in range(4950, 5000)])
+        self.assertEqual(len(tailer.lines), 50)
+        recs = tailer.get_records(starttime=t0 + 100, trim=True)
+        self.assertEqual([r[1] for r in recs],
+                         [line(i) for i in range(100, 5000)])
+        self.assertLess(len(tailer.lines), 5000)
+        recs = tailer.get_records(n=2, id='3.svr', trim=True)
+        self.assertEqual([r[1] for r in recs], [line(4987), line(4994)])
+        with open(logfile, 'a') as f:
+            f.write(line(5000) + '\n')
+        self.assertEqual(tailer.update(), 1)
+        self.assertEqual(tailer.new_ids, {'2.svr'})
+        recs = tailer.get_records(n=3, tail=False)
+        self.assertEqual([r[1] for r in recs], [line(i) for i in range(3)])
+        self.du.rm(path=logdir, recursive=True, force=True)
+
+    def test_log_analyzer_parallel(self):
+        """
+        Test that analyzing log directories with several processes
+        gives the same results as a serial analysis, including for
+        jobs and scheduling cycles spanning log files
+        """
+        logdir = self.du.create_temp_dir()
+        days = {'20240110': ('01/10/2024', ['23:58:00', '23:59:00']),
+                '20240111': ('01/11/2024', ['00:00:01', '00:01:00'])}
+        srv = [';0100;Server@svr;Job;1.svr;enqueuing into workq, state Q '
+               'hop 1', ';0008;Server@svr;Job;2.svr;enqueuing into workq, '
+               'state Q hop 1', ';0008;Server@svr;Job;1.svr;Job Run at '
+               'request of Scheduler@svr', ';0010;Server@svr;Job;1.svr;'
+               'Exit_status=0']
+        sched = [';0080;pbs_sched;Svr;pbs_sched;Starting Scheduling Cycle',
+                 ';0400;pbs_sched;Job;1.svr;Considering job to run',
+                 ';0040;pbs_sched;Job;1.svr;Job run',
+                 ';0080;pbs_sched;Svr;pbs_sched;Leaving Scheduling Cycle']
+        for name, recs in (('server', srv), ('sched', sched)):
+            os.mkdir(os.path.join(logdir, name))
+            i = 0
+            for day, (date, tms) in sorted(days.items()):
+                with open(os.path.join(logdir, name, day), 'w') as f:
+                    for tm in tms:
+                        f.write(date + ' ' + tm + recs[i] + '\n')
+                        i += 1
+        info = []
+        for nprocs in (1, 2):
+            pla = PBSLogAnalyzer(os.path.join(logdir, 'sched'),
+                                 os.path.join(logdir, 'server'),
+                                 nprocs=nprocs)
+            info.append(pla.analyze_logs(showjob=True))
+        self.assertEqual(info[0], info[1])
+        self.assertEqual(info[1]['scheduler']['summary']['num_cycles'], 1)
+        self.assertIn('job_wait_time_max', info[1]['server'])
+        self.du.rm(path=logdir, recursive=True, force=True)
+
+    def test_accounting_utilization_parallel(self):
+        """
+        Test that the utilization computed from accounting logs with
+        several processes is the same as that of a serial analysis,
+        for jobs queued before the first record and jobs spanning
+        log files
+        """
+        logdir = self.du.create_temp_dir()
+        nodesfile = os.path.join(logdir, 'nodes')
+        with open(nodesfile, 'w') as f:
+            for n in ('node1', 'node2'):
+                f.write(n + '\n     Mom = ' + n + '\n'
+                        '     resources_available.ncpus = 4\n')
+                if n == 'node1':
+                    f.write('     jobs = 9.svr/0\n')
+                f.write('\n')
+        jobsfile = os.path.join(logdir, 'jobs')
+        with open(jobsfile, 'w') as f:
+            f.write('Job Id: 9.svr\n    job_state = R\n'
+                    '    Resource_List.ncpus = 1\n'
+                    '    exec_host = node1/0\n    stime = 1704934800\n\n')
+
+        def rec(day, tm, rtype, jid, qtime, start, walltime=None):
+            msg = ('user=u%s group=g qtime=%d start=%d '
+                   'exec_host=node1/0*2 Resource_List.ncpus=2 ' %
+                   (jid[0], qtime, start))
+            if walltime is not None:
+                msg += 'resources_used.walltime=' + walltime + ' '
+            return '01/%d/2024 %s;%s;%s;%send=1\n' % (
+                day, tm, rtype, jid, msg)
+        # 01/10/2024 00:00:00 local time, and hours
+        t0 = int(time.mktime((2024, 1, 10, 0, 0, 0, 0, 0, -1)))
+        h = 3600
+        recs = {10: [rec(10, '10:00:00', 'S', '1.svr', t0 - h, t0 + 10 * h),
+                     rec(10, '12:00:00', 'S', '2.svr', t0 + 11 * h,
+                         t0 + 12 * h)],
+                11: [rec(11, '01:00:00', 'E', '1.svr', t0 - h, t0 - h // 2,
+                         '15:00:00'),
+                     rec(11, '02:00:00', 'S', '9.svr', t0 + 25 * h,
+                         t0 + 26 * h)],
+                12: [rec(12, '03:00:00', 'E', '2.svr', t0 + 11 * h,
+                         t0 + 12 * h, '39:00:00'),
+                     rec(12, '04:00:00', 'S', '3.svr', t0 + 51 * h,
+                         t0 + 52 * h)]}
+        acctdir = os.path.join(logdir, 'accounting')
+        os.mkdir(acctdir)
+        for day, lines in recs.items():
+            with open(os.path.join(acctdir, '202401%d' % day), 'w') as f:
+                f.writelines(lines)
+        info = []
+        for nprocs in (1, 3):
+            a = PBSAccountingLog()
+            a.nprocs = nprocs
+            a.enable_utilization_parsing(nodesfile=nodesfile,
+                                         jobsfile=jobsfile)
+            info.append(a.analyze(acctdir))
+        self.assertEqual(info[0], info[1])
+        self.assertIn('cpu_hours', info[1])
+        self.du.rm(path=logdir, recursive=True, force=True)
+
+    def test_accounting_store(self):
+        """
+        Test that accounting logs ingested into the columnar store can
+        be queried and give the same analysis as their text
+        """
+        j = Job(TEST_USER)
+        j.set_sleep_time(1)
+        jid = self.server.submit(j)
+        self.server.expect(JOB, 'queue', op=UNSET, id=jid, offset=1)
+        self.server.accounting_match(';E;' + jid + ';', regexp=False)
+        acctpath = os.path.join(self.server.pbs_conf['PBS_HOME'],
+                                'server_priv', 'accounting')
+        logs = self.du.listdir(self.server.hostname, acctpath, sudo=True)
+        acctlog = sorted(logs)[-1]
+        storedir = self.du.create_temp_dir()
+        store = PBSAccountingStore(storedir)
+        self.assertFalse(store.is_current(acctlog, self.server.hostname,
+                                          sudo=True))
+        self.assertIsNotNone(store.ingest(acctlog, self.server.hostname,
+                                          sudo=True))
+        self.assertTrue(store.is_current(acctlog, self.server.hostname,
+                                         sudo=True))
+        recs = store.query(user=str(TEST_USER), columns=['id', 'queue'])
+        self.assertIn({'id': jid, 'queue': 'workq'}, recs)
+        agg = store.aggregate(user=str(TEST_USER), groupby='queue')
+        self.assertGreaterEqual(agg['workq']['njobs'], 1)
+        info = []
+        for path in (None, storedir):
+            a = PBSAccountingLog(hostname=self.server.hostname)
+            if path is not None:
+                a.enable_columnar_store(path)
+            a.analyze(acctlog, sudo=True, summarize=False)
+            info.append(a.summary())
+        self.assertEqual(info[0], info[1])
+        self.du.rm(path=storedir, recursive=True, force=True)